@@ -1,4 +1,4 @@
-from python import ANN, ANN2, Basic_Evolve_ANN
+from python import ANN, ANN2, Basic_Evolve_ANN, PopulationANN
 
 from logging import ANN_logging
 
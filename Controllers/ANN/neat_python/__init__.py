@@ -1,3 +1,3 @@
 from config import Config
 from genome import Genome
-from population import Population
+from population import Population, EvaluationTimeout
@@ -3,11 +3,23 @@
 """
 
 import math
+import mmap
 import random
+import struct
 import sys
 
 from config import Config
 
+# Binary genome format: header, node table, then connection records sorted by innovation number.
+# Records are fixed size and 8 byte aligned so archives can be read in place from a memory map.
+# Several genomes can be written one after the other in the same file.
+BINARY_MAGIC = b"NEGB"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<4siiiiii4x")  # magic, version, id, inputs, outputs, nodes, connections
+BINARY_NODE = struct.Struct("<ii")            # id, type
+BINARY_CONNECTION = struct.Struct("<iiiid")   # innovation, source, target, enabled, weight
+BINARY_NODE_TYPES = ['INPUT', 'OUTPUT', 'HIDDEN']
+
 class Genome(object):
     _id = 0 # Global genome identifier
 
@@ -39,6 +51,57 @@ class Genome(object):
 
         return new_genome
 
+    @classmethod
+    def genome_from_binary(cls,buf,offset=0):
+        """ Build a genome from the binary format.
+
+        Args:
+            buf: string, buffer or mmap containing the genome
+            offset: byte offset of the genome in buf
+        Returns:
+            the genome and the offset just past it
+        """
+        magic, version, genome_id, num_inp, num_out, num_nodes, num_conns = BINARY_HEADER.unpack_from(buf, offset)
+        assert magic == BINARY_MAGIC and version == BINARY_VERSION, "Data does not conform to a binary genome!"
+        offset += BINARY_HEADER.size
+
+        new_genome = cls(-1,-1)
+        new_genome._id = genome_id
+        new_genome._input_nodes = num_inp
+        new_genome._output_nodes = num_out
+
+        for i in xrange(num_nodes):
+            node_id, node_type = BINARY_NODE.unpack_from(buf, offset)
+            new_genome._node_genes.append(NodeGene(node_id, BINARY_NODE_TYPES[node_type]))
+            offset += BINARY_NODE.size
+
+        for i in xrange(num_conns):
+            innov, src, trg, enabled, weight = BINARY_CONNECTION.unpack_from(buf, offset)
+            cg = ConnectionGene(src, trg, weight, enabled == 1, innov_number = innov)
+            new_genome._connection_genes[cg.key] = cg
+            offset += BINARY_CONNECTION.size
+
+        return new_genome, offset
+
+    @classmethod
+    def genomes_from_binary_file(cls,filename):
+        """ Read all genomes in a binary genome file.
+
+        Args:
+            filename: file written with to_binary/append_binary
+        Returns:
+            list of the genomes in the file
+        """
+        genomes = []
+        with open(filename,"rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            offset = 0
+            while offset < len(buf):
+                genome, offset = cls.genome_from_binary(buf, offset)
+                genomes.append(genome)
+            buf.close()
+        return genomes
+
     @classmethod
     def __get_new_id(cls):
         cls._id += 1
@@ -52,6 +115,7 @@ class Genome(object):
 
         self._connection_genes = {} # dictionary of connection genes
         self._node_genes = []
+        self._gene_arrays = None # innovation sorted view of the connection genes, see gene_arrays
 
         self.fitness = None
         self.species_id = None
@@ -85,6 +149,28 @@ class Genome(object):
         s += "\nGenomeEnd\n"
         return s
 
+    def to_binary(self):
+        """ Pack the genome into the binary format.
+
+        Returns:
+            string containing the header, node table and connection records
+        """
+        parts = [BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, self._id, self._input_nodes,
+            self._output_nodes, len(self._node_genes), len(self._connection_genes))]
+        parts.extend(BINARY_NODE.pack(int(ng.id), BINARY_NODE_TYPES.index(ng.node_type)) for ng in self._node_genes)
+        parts.extend(BINARY_CONNECTION.pack(cg._innov_number, cg.in_node, cg.out_node, 1 if cg.enabled else 0, cg._weight)
+            for cg in sorted(self._connection_genes.itervalues()))
+        return b"".join(parts)
+
+    def append_binary(self,filename):
+        """ Append the genome to a binary genome file.
+
+        Args:
+            filename: file to append to
+        """
+        with open(filename,"ab") as f:
+            f.write(self.to_binary())
+
     def build_phenotype(self):
         """ Gather the information needed to define the phenotype of the ANN.
 
@@ -131,8 +217,22 @@ class Genome(object):
         """
         self.fitness = fit
 
+    def gene_arrays(self):
+        """ Get the connection genes as parallel arrays sorted by innovation number.
+
+        The arrays are built on first use and cached until the connection genes change.
+
+        Returns:
+            list of innovation numbers and list of the matching (rounded) weights
+        """
+        if self._gene_arrays is None:
+            genes = sorted(self._connection_genes.itervalues())
+            self._gene_arrays = ([cg._innov_number for cg in genes], [cg.weight for cg in genes])
+        return self._gene_arrays
+
     def mutate(self):
         """ Mutates the genome by adding structure or mutatating the connection weights. """
+        self._gene_arrays = None
         if random.random() < Config.prob_addnode:
             self._mutate_add_node()
         elif random.random() < Config.prob_addconn:
@@ -209,6 +309,7 @@ class Genome(object):
     def _inherit_genes(child, parent1, parent2):
         """ Applies the crossover operator. """
         assert(parent1.fitness >= parent2.fitness)
+        child._gene_arrays = None
 
         # Crossover connection genes
         for cg1 in parent1._connection_genes.values():
@@ -235,7 +336,11 @@ class Genome(object):
                 child._node_genes.append(ng1.copy())
 
     def distance(self, other):
-        """ Returns the distance between this genome and the other. """
+        """ Returns the distance between this genome and the other.
+
+        The innovation sorted gene arrays of both genomes are walked together so
+        matching, disjoint and excess genes are found in a single linear pass.
+        """
         if len(self._connection_genes) > len(other._connection_genes):
             chromo1 = self
             chromo2 = other
@@ -243,27 +348,33 @@ class Genome(object):
             chromo1 = other
             chromo2 = self
 
+        innovs1, weights1 = chromo1.gene_arrays()
+        innovs2, weights2 = chromo2.gene_arrays()
+        len1 = len(innovs1)
+        len2 = len(innovs2)
+
         weight_diff = 0
         matching = 0
         disjoint = 0
-        excess = 0
 
-        max_cg_chromo2 = max(chromo2._connection_genes.values())
-
-        for cg1 in chromo1._connection_genes.values():
-            try:
-                cg2 = chromo2._connection_genes[cg1.key]
-            except KeyError:
-                if cg1 > max_cg_chromo2:
-                    excess += 1
-                else:
-                    disjoint += 1
-            else:
+        i = j = 0
+        while i < len1 and j < len2:
+            if innovs1[i] == innovs2[j]:
                 # Homologous genes
-                weight_diff += math.fabs(cg1.weight - cg2.weight)
+                weight_diff += math.fabs(weights1[i] - weights2[j])
                 matching += 1
+                i += 1
+                j += 1
+            elif innovs1[i] < innovs2[j]:
+                disjoint += 1
+                i += 1
+            else:
+                j += 1
+
+        # Genes of chromo1 past the last gene of chromo2 are excess.
+        excess = len1 - i
 
-        disjoint += len(chromo2._connection_genes) - matching
+        disjoint += len2 - matching
 
         distance = Config.excess_coeficient * excess + \
                    Config.disjoint_coeficient * disjoint
@@ -299,6 +410,7 @@ class Genome(object):
         Args:
             num_hidden: Number of hidden nodes to add.
         """
+        self._gene_arrays = None
         id = len(self._node_genes)+1
         for i in range(num_hidden):
             node_gene = NodeGene(id, nodetype = 'HIDDEN')
@@ -336,6 +448,7 @@ class Genome(object):
         """
         new_cg = ConnectionGene(in_node=int(src_node), out_node=int(dst_node), weight=float(weight), enabled=(True if enabled == "True" else False), innov_number = int(innov_num))
         self._connection_genes[new_cg.key] = new_cg
+        self._gene_arrays = None
 
     @classmethod
     def create_unconnected(cls):
@@ -1,12 +1,69 @@
 """ Define a population in NEAT. """
 
+import atexit
 import math
+import multiprocessing as mpc
 import random
+import signal
+import time
+import weakref
+
+import numpy
 
 from config import Config
 import genome
 import species
 
+# Populations with an open evaluation pool, whose pools are closed at exit.
+_populations_with_pools = weakref.WeakSet()
+
+def _close_pools():
+    for pop in list(_populations_with_pools):
+        pop.close_pool()
+
+atexit.register(_close_pools)
+
+class EvaluationTimeout(Exception):
+    """ Raised when evaluating an individual takes longer than the allowed time. """
+    pass
+
+def _raise_timeout(signum, frame):
+    raise EvaluationTimeout()
+
+def _evaluate_chunk(fitness_function, phenotypes, timeout, failed_fitness):
+    """ Evaluate a chunk of phenotypes.  Runs in the pool workers.
+
+    Args:
+        fitness_function: function taking a build_phenotype tuple and returning the fitness
+        phenotypes: list of build_phenotype tuples
+        timeout: seconds allowed per phenotype, None for no limit
+        failed_fitness: fitness of a phenotype that exceeds the timeout
+    Returns:
+        list of fitnesses in the order of the phenotypes
+    """
+    fitnesses = []
+    if timeout:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+    try:
+        for phenotype in phenotypes:
+            # Append exactly once per phenotype, even if the alarm fires after the
+            # fitness function returned but before the timer is cancelled.
+            fitness = failed_fitness
+            try:
+                if timeout:
+                    signal.setitimer(signal.ITIMER_REAL, timeout)
+                fitness = fitness_function(phenotype)
+                if timeout:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+            except EvaluationTimeout:
+                pass
+            fitnesses.append(fitness)
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+    return fitnesses
+
 class Population(object):
 
     def __init__(self):
@@ -18,6 +75,14 @@ class Population(object):
         # species history
         self._species_log = []
 
+        # Speciation cache: distances of unchanged genomes (elites carried over by
+        # Species.reproduce) to representants that are still in use.
+        self._distance_cache = {} # genome id -> {representant id: compatibility distance}
+        self._cached_genes = {}   # genome id -> gene arrays the cached distances were computed from
+        self._cache_hits = 0
+        self._cache_lookups = 0
+        self._cache_log = []
+
         # Statistics
         self._avg_fitness = []
         self._best_fitness = []
@@ -25,8 +90,13 @@ class Population(object):
         self._create_genomes()
         self._generation = -1
 
+        # Process pool kept between calls to evaluate.
+        self._pool = None
+        self._pool_processes = None
+
     stats = property(lambda self: (self._best_fitness, self._avg_fitness))
     species_log = property(lambda self: self._species_log)
+    cache_log = property(lambda self: self._cache_log)
 
     def __repr__(self):
         s = "Population size: %d" %self._popsize
@@ -47,6 +117,78 @@ class Population(object):
 
         return self._population
 
+    def evaluate(self, fitness_function, processes=None, chunksize=1, timeout=None, failed_fitness=0.):
+        """ Evaluate every genome in the population and set its fitness.
+
+        Genomes are sent to a persistent process pool as build_phenotype tuples, which
+        the fitness function can turn into a network with ANN2.get_ann.  The pool is
+        kept until close_pool is called, or closed at exit.
+
+        Args:
+            fitness_function: picklable (module level) function taking a build_phenotype tuple
+                and returning the fitness
+            processes: worker processes, None for one per core or 0 to evaluate in this process
+            chunksize: number of genomes sent to a worker at a time
+            timeout: seconds allowed per genome, None for no limit
+            failed_fitness: fitness given to genomes that exceed the timeout
+        Returns:
+            list of fitnesses in population order
+        """
+        phenotypes = [g.build_phenotype() for g in self]
+        chunks = [phenotypes[i:i+chunksize] for i in xrange(0, len(phenotypes), chunksize)]
+
+        if processes == 0:
+            fitnesses = [fit for chunk in chunks for fit in _evaluate_chunk(fitness_function, chunk, timeout, failed_fitness)]
+        else:
+            pool = self._get_pool(processes)
+            results = [pool.apply_async(_evaluate_chunk, (fitness_function, chunk, timeout, failed_fitness)) for chunk in chunks]
+
+            # Workers stop individuals that run over the timeout themselves.  Waiting as long as
+            # a serial evaluation would take only guards against a worker hanging outside Python.
+            deadline = time.time() + timeout*len(phenotypes) if timeout else None
+            fitnesses = []
+            try:
+                for result in results:
+                    fitnesses.extend(result.get(max(deadline - time.time(), 0) if deadline else None))
+            except mpc.TimeoutError:
+                self.close_pool(terminate=True)
+                fitnesses.extend([failed_fitness]*(len(phenotypes)-len(fitnesses)))
+
+        for g, fit in zip(self, fitnesses):
+            g.set_fitness(fit)
+
+        return fitnesses
+
+    def _get_pool(self, processes):
+        """ Get the evaluation pool, creating it if needed.
+
+        Args:
+            processes: worker processes, None for one per core
+        """
+        if self._pool is not None and self._pool_processes != processes:
+            self.close_pool()
+        if self._pool is None:
+            self._pool = mpc.Pool(processes=processes)
+            self._pool_processes = processes
+            _populations_with_pools.add(self)
+        return self._pool
+
+    def close_pool(self, terminate=False):
+        """ Shut down the evaluation pool.
+
+        Args:
+            terminate: stop the workers immediately instead of letting them finish
+        """
+        if self._pool is not None:
+            if terminate:
+                self._pool.terminate()
+            else:
+                self._pool.close()
+            self._pool.join()
+            self._pool = None
+            self._pool_processes = None
+            _populations_with_pools.discard(self)
+
     def _create_genomes(self):
         """ Create the population of individuals. """
 
@@ -59,17 +201,21 @@ class Population(object):
 
     def _speciate(self, report):
         """ Group genomes into species by similarity """
-        # Speciate the population
+        self._prune_distance_cache()
+
+        # Speciate the population, comparing each individual to all representants at once.
+        representants = species.RepresentativeTable(s.representant for s in self._species)
+        rep_ids = [s.representant.id for s in self._species]
         for individual in self:
-            found = False
-            for s in self._species:
-                if individual.distance(s.representant) < Config.compatibility_threshold:
-                    s.add(individual)
-                    found = True
-                    break
+            distances = self._representant_distances(individual, representants, rep_ids)
+            compatible = numpy.flatnonzero(distances < Config.compatibility_threshold)
 
-            if not found: # create a new species for this lone chromosome
+            if len(compatible) > 0:
+                self._species[compatible[0]].add(individual)
+            else: # create a new species for this lone chromosome
                 self._species.append(species.Species(individual))
+                representants.set_row(len(representants), individual)
+                rep_ids.append(individual.id)
 
         # python technical note:
         # we need a "working copy" list when removing elements while looping
@@ -84,6 +230,47 @@ class Population(object):
 
         self._set_compatibility_threshold()
 
+    def _prune_distance_cache(self):
+        """ Drop cached distances of genomes that are gone or have changed.
+
+        A genome is unchanged while it still holds the gene arrays the cached distances
+        were computed from, as any mutation rebuilds them.  Genome ids are never reused,
+        so distances to representants that are gone are simply never looked up again.
+        """
+        genomes = list(self) + [s.representant for s in self._species]
+        if any(self._cached_genes.get(g.id, g.gene_arrays()) is not g.gene_arrays() for g in genomes):
+            # A genome was mutated in place, so distances to it as a representant are stale too.
+            self._distance_cache = {}
+            self._cached_genes = {}
+        self._distance_cache = dict((g.id, self._distance_cache[g.id]) for g in genomes if g.id in self._distance_cache)
+        self._cached_genes = dict((g.id, g.gene_arrays()) for g in genomes)
+
+    def _representant_distances(self, individual, representants, rep_ids):
+        """ Get the distances of an individual to all representants, reusing cached ones.
+
+        Args:
+            individual: genome to compare
+            representants: RepresentativeTable of the current representants
+            rep_ids: genome ids of the representants in the table rows
+        Returns:
+            numpy array of the distances to each representant
+        """
+        self._cache_lookups += len(rep_ids)
+
+        cached = self._distance_cache.get(individual.id)
+        if cached is None:
+            distances = representants.distances(individual)
+        else:
+            # Only compare against the representants the genome has not seen yet.
+            missing = [row for row, rid in enumerate(rep_ids) if rid not in cached]
+            self._cache_hits += len(rep_ids) - len(missing)
+            distances = numpy.array([cached.get(rid, 0.) for rid in rep_ids])
+            if missing:
+                distances[missing] = representants.distances(individual, missing)
+
+        self._distance_cache[individual.id] = dict(zip(rep_ids, distances.tolist()))
+        return distances
+
     def _set_compatibility_threshold(self):
         """ Controls compatibility threshold """
         if len(self._species) > Config.species_size:
@@ -168,6 +355,12 @@ class Population(object):
                 temp.append(0)
         self._species_log.append(temp)
 
+        # Speciation cache hit rate since the last log entry.
+        hit_rate = float(self._cache_hits)/self._cache_lookups if self._cache_lookups > 0 else 0.
+        self._cache_log.append((self._cache_hits, self._cache_lookups, hit_rate))
+        self._cache_hits = 0
+        self._cache_lookups = 0
+
     def _population_diversity(self):
         """ Calculates the diversity of population: total average weights,
             number of connections, nodes """
@@ -252,7 +445,7 @@ class Population(object):
                 self._species.remove(s)
 
         # Logging speciation stats
-        # self._log_species()
+        self._log_species()
 
         if report:
             #print 'Poluation size: %d \t Divirsity: %s' %(len(self), self.__population_diversity())
@@ -268,6 +461,8 @@ class Population(object):
             print 'Amount to spawn  : %s' % [s.spawn_amount for s in self._species]
             print 'Species age      : %s' % [s.age for s in self._species]
             print 'Species no improv: %s' % [s.no_improvement_age for s in self._species] # species no improvement age
+            print 'Speciation cache : %d of %d distances reused (%.1f%%)' \
+                    %(self._cache_log[-1][0], self._cache_log[-1][1], 100*self._cache_log[-1][2])
 
             
         # -------------------------- Producing new offspring -------------------------- #
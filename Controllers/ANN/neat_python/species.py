@@ -1,6 +1,9 @@
 """ Define the operators associated with species in NEAT. """
 
 import random
+
+import numpy
+
 from config import Config
 
 class Species(object):
@@ -40,11 +43,9 @@ class Species(object):
         # Set the species ID
         individual.species_id = self._id
         
-        # Add individual to the subpopulation
+        # Add individual to the subpopulation.  The representant stays fixed while
+        # the population is speciated, it is picked again in reproduce.
         self._subpopulation.append(individual)
-        
-        # Choose the representative individual for the species.
-        self.representant = random.choice(self._subpopulation)
 
     def __iter__(self):
         """ Iterates over individuals """
@@ -139,7 +140,136 @@ class Species(object):
         # reset species (new members will be added again when speciating)
         self._subpopulation = []
 
-        # select a new random representant member
-        self.representant = random.choice(offspring)
+        # The elite is carried over unchanged, so keeping it as the representant lets
+        # speciation reuse its distances.  Otherwise select a random member.
+        if Config.elitism:
+            self.representant = offspring[0]
+        else:
+            self.representant = random.choice(offspring)
 
         return offspring
+
+class RepresentativeTable(object):
+    """ Dense table of the species representants for computing compatibility distances
+        to all of them at once.
+
+        Each row holds one representant's connection genes with a column per innovation
+        number seen in any representant, so the distance of an individual to every row
+        is a handful of numpy operations instead of a Python loop per species.
+    """
+
+    def __init__(self, representants=()):
+        """ Build the table.
+
+        Args:
+            representants: genomes to fill the first rows with
+        """
+        self._rows = 0
+        self._cols = 0
+        self._columns = {} # innovation number -> column
+        self._col_innovs = numpy.zeros(16, dtype=numpy.int64)
+        self._present = numpy.zeros((4, 16), dtype=bool)
+        self._weights = numpy.zeros((4, 16))
+        self._counts = numpy.zeros(4, dtype=numpy.int64)
+        self._max_innovs = numpy.zeros(4, dtype=numpy.int64)
+        self._sorted = None # (sorted column innovations, column order), built lazily
+
+        for r in representants:
+            self.set_row(self._rows, r)
+
+    def __len__(self):
+        return self._rows
+
+    def _grow(self, rows, cols):
+        """ Enlarge the storage to hold at least rows x cols entries. """
+        cap_rows, cap_cols = self._present.shape
+        if rows <= cap_rows and cols <= cap_cols:
+            return
+        new_rows = max(rows, cap_rows*2 if rows > cap_rows else cap_rows)
+        new_cols = max(cols, cap_cols*2 if cols > cap_cols else cap_cols)
+
+        present = numpy.zeros((new_rows, new_cols), dtype=bool)
+        present[:cap_rows,:cap_cols] = self._present
+        weights = numpy.zeros((new_rows, new_cols))
+        weights[:cap_rows,:cap_cols] = self._weights
+        self._present, self._weights = present, weights
+
+        if new_cols > cap_cols:
+            self._col_innovs = numpy.resize(self._col_innovs, new_cols)
+        if new_rows > cap_rows:
+            self._counts = numpy.resize(self._counts, new_rows)
+            self._max_innovs = numpy.resize(self._max_innovs, new_rows)
+
+    def set_row(self, row, representant):
+        """ Store a representant in a row of the table.
+
+        Args:
+            row: row to replace, or len(self) to append a new row
+            representant: genome to store
+        """
+        innovs, weights = representant.gene_arrays()
+
+        new_innovs = [i for i in innovs if i not in self._columns]
+        self._grow(max(row+1, self._rows), self._cols+len(new_innovs))
+        for i in new_innovs:
+            self._columns[i] = self._cols
+            self._col_innovs[self._cols] = i
+            self._cols += 1
+        if new_innovs:
+            self._sorted = None
+
+        cols = [self._columns[i] for i in innovs]
+        self._present[row,:self._cols] = False
+        self._weights[row,:self._cols] = 0.
+        self._present[row,cols] = True
+        self._weights[row,cols] = weights
+        self._counts[row] = len(innovs)
+        self._max_innovs[row] = innovs[-1] if innovs else -1
+        self._rows = max(self._rows, row+1)
+
+    def distances(self, individual, rows=None):
+        """ Compatibility distance of an individual to every representant.
+
+        Matches individual.distance(representant) for each row.
+
+        Args:
+            individual: genome to compare
+            rows: optional list of the rows to compare against, all rows if None
+        Returns:
+            numpy array with the distance to the representant in each (selected) row
+        """
+        rows = slice(0, self._rows) if rows is None else numpy.asarray(rows, dtype=numpy.int64)
+        ncols = self._cols
+        innovs, weights = individual.gene_arrays()
+        innovs = numpy.array(innovs, dtype=numpy.int64)
+        weights = numpy.array(weights)
+        count = len(innovs)
+        max_innov = innovs[-1] if count else -1
+
+        # Map the individual's genes onto the table columns.
+        if self._sorted is None:
+            order = numpy.argsort(self._col_innovs[:ncols])
+            self._sorted = (self._col_innovs[:ncols][order], order)
+        sorted_innovs, order = self._sorted
+        pos = numpy.minimum(numpy.searchsorted(sorted_innovs, innovs), max(ncols-1, 0))
+        found = sorted_innovs[pos] == innovs if ncols else numpy.zeros(count, dtype=bool)
+        cols = order[pos[found]]
+
+        present = self._present[rows][:,cols]
+        matching = present.sum(axis=1)
+        weight_diff = (numpy.abs(self._weights[rows][:,cols] - weights[found])*present).sum(axis=1)
+
+        counts = self._counts[rows]
+        max_innovs = self._max_innovs[rows]
+
+        # Excess genes are counted on the genome with more connection genes, as in Genome.distance.
+        excess_individual = count - numpy.searchsorted(innovs, max_innovs, side='right')
+        excess_representant = (self._present[rows][:,:ncols] & (self._col_innovs[:ncols] > max_innov)).sum(axis=1)
+        excess = numpy.where(count > counts, excess_individual, excess_representant)
+        disjoint = count + counts - 2*matching - excess
+
+        distance = Config.excess_coeficient * excess + \
+                   Config.disjoint_coeficient * disjoint
+        distance += Config.weight_coeficient * numpy.where(matching > 0, weight_diff/numpy.maximum(matching, 1), 0.)
+
+        return distance
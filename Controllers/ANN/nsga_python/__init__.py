@@ -1,3 +1,3 @@
 from nsga_config import NSGAConfig
 from nsga_genome import NSGAGenome
-from nsga_population import NSGAPopulation
+from nsga_population import NSGAPopulation, non_dominated_sort, crowding_distances
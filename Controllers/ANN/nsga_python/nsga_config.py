@@ -26,6 +26,7 @@ class NSGAConfig(object):
     weight_mutation_power   = None
     prob_togglelink         = None
     elitism                 = None
+    objective_weights       = None # per objective, positive to maximize and negative to minimize (None maximizes all)
 
     prob_crossover = None
 
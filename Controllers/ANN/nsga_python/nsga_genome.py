@@ -56,6 +56,10 @@ class NSGAGenome(object):
         self.fitness = None
         self.species_id = None
 
+        # Pareto front (0 is the non-dominated front) and crowding distance, set by NSGAPopulation.epoch
+        self.rank = None
+        self.crowding_distance = 0.
+
         # Parent ID's track the genomes geneaology
         self.parent1_id = parent1_id
         self.parent2_id = parent2_id
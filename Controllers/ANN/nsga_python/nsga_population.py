@@ -1,20 +1,85 @@
 """ Handle a population of ANNs for experimentation. """
 
-import math
 import random
 
+import numpy
+
 from nsga_config import NSGAConfig
 import nsga_genome
 
+def non_dominated_sort(objectives):
+    """ Sort individuals into Pareto fronts.
+
+    Every objective is maximized.  Dominance between all pairs is computed as a boolean
+    matrix one objective at a time, then fronts are peeled off by dominated counts.
+
+    Args:
+        objectives: array with one row per individual and one column per objective
+    Returns:
+        list of index arrays, one per front, starting with the non-dominated front
+    """
+    objectives = numpy.asarray(objectives, dtype=float)
+    n = len(objectives)
+
+    # dominates[i,j] is True when individual i dominates individual j.
+    no_worse = numpy.ones((n, n), dtype=bool)
+    better = numpy.zeros((n, n), dtype=bool)
+    for col in objectives.T:
+        no_worse &= col[:,None] >= col[None,:]
+        better |= col[:,None] > col[None,:]
+    dominates = no_worse & better
+
+    dominated_count = dominates.sum(axis=0)
+    remaining = numpy.ones(n, dtype=bool)
+    fronts = []
+    while remaining.any():
+        front = numpy.flatnonzero(remaining & (dominated_count == 0))
+        fronts.append(front)
+        remaining[front] = False
+        dominated_count -= dominates[front].sum(axis=0)
+    return fronts
+
+def crowding_distances(objectives):
+    """ Crowding distance of the individuals in a front.
+
+    Args:
+        objectives: array with one row per individual of the front and one column per objective
+    Returns:
+        array of crowding distances, infinite for the boundary individuals
+    """
+    objectives = numpy.asarray(objectives, dtype=float)
+    distances = numpy.zeros(len(objectives))
+    if len(objectives) <= 2:
+        distances[:] = numpy.inf
+        return distances
+
+    for col in objectives.T:
+        order = numpy.argsort(col, kind='mergesort')
+        ordered = col[order]
+        distances[order[[0,-1]]] = numpy.inf
+        span = ordered[-1] - ordered[0]
+        if span > 0:
+            distances[order[1:-1]] += (ordered[2:] - ordered[:-2])/span
+    return distances
+
 class NSGAPopulation(object):
     def __init__(self):
 
         # total population size
         self._popsize = NSGAConfig.pop_size
 
+        # Parents selected in the last epoch, the population holds their offspring.
+        self._parents = []
+
+        # Statistics
+        self._avg_fitness = []
+        self._best_fitness = []
+
         self._create_genomes()
+        self._generation = -1
 
     stats = property(lambda self: (self._best_fitness, self._avg_fitness))
+    parents = property(lambda self: self._parents)
 
     def __repr__(self):
         s = "Population size: %d" %self._popsize
@@ -39,37 +104,120 @@ class NSGAPopulation(object):
 
         self._population = []
         for i in xrange(self._popsize):
-            g = genome.NSGAGenome.create_fully_connected()
+            g = nsga_genome.NSGAGenome.create_fully_connected()
             if NSGAConfig.hidden_nodes > 0:
                 g.add_hidden_nodes(NSGAConfig.hidden_nodes)
             self._population.append(g)
 
-    def average_fitness(self):
-        """ Returns the average raw fitness of population """
-        sum = 0.0
-        for g in self:
-            sum += g.fitness
+    def evaluate(self, fitness_function, map_function=map):
+        """ Evaluate the genomes that do not have a fitness yet.
+
+        Genomes are passed to the fitness function as build_phenotype tuples so a
+        multiprocessing Pool's map can be used to evaluate them in parallel.
+
+        Args:
+            fitness_function: function taking a build_phenotype tuple and returning the
+                objective values of the genome
+            map_function: map used to apply the fitness function (map, pool.map, ...)
+        Returns:
+            list of the fitnesses of the evaluated genomes
+        """
+        unevaluated = [g for g in self if g.fitness is None]
+        fitnesses = map_function(fitness_function, [g.build_phenotype() for g in unevaluated])
+        for g, fit in zip(unevaluated, fitnesses):
+            g.set_fitness(fit)
+        return fitnesses
+
+    def _objectives(self, genomes):
+        """ Objective matrix of the genomes with the objective weights applied so every
+            objective is maximized. """
+        objectives = numpy.array([numpy.atleast_1d(g.fitness) for g in genomes], dtype=float)
+        if NSGAConfig.objective_weights is not None:
+            objectives *= NSGAConfig.objective_weights
+        return objectives
 
-        return sum/len(self)
+    def average_fitness(self):
+        """ Returns the average raw fitness of population, per objective """
+        return numpy.array([g.fitness for g in self], dtype=float).mean(axis=0)
 
     def stdeviation(self):
-        """ Returns the population standard deviation """
-        # first compute the average
-        u = self.average_fitness()
-        error = 0.0
-
-        try:
-            # now compute the distance from average
-            for g in self:
-                error += (u - g.fitness)**2
-        except OverflowError:
-            #TODO: catch OverflowError: (34, 'Numerical result out of range')
-            print "Overflow - printing population status"
-            print "error = %f \t average = %f" %(error, u)
-            print "Population fitness:"
-            print [g.fitness for g in self]
-
-        return math.sqrt(error/len(self))
+        """ Returns the population standard deviation, per objective """
+        return numpy.array([g.fitness for g in self], dtype=float).std(axis=0)
+
+    def _tournament_selection(self):
+        """ Binary tournament on front rank, ties broken by the larger crowding distance. """
+        a = random.choice(self._parents)
+        b = random.choice(self._parents)
+
+        if a.rank != b.rank:
+            return a if a.rank < b.rank else b
+        if a.crowding_distance != b.crowding_distance:
+            return a if a.crowding_distance > b.crowding_distance else b
+        return random.choice((a,b))
+
+    def epoch(self, report=True):
+        """ Runs an NSGA-II generation.
+
+            Assumes that the individuals have already been evaluated (see evaluate).
+            The evaluated population and the previous parents are sorted into fronts,
+            the best pop_size of them by rank and crowding distance become the new parents
+            and the population is replaced by their offspring, ready to be evaluated.
+
+            Keyword arguments:
+            report -- show stats at each epoch (default True)
+        """
+        self._generation += 1
+
+        if report: print '\n ****** Running generation %d ****** \n' % self._generation
+
+        self._avg_fitness.append(self.average_fitness())
+
+        # Select the parents of the next generation from the fronts.
+        combined = self._parents + self._population
+        objectives = self._objectives(combined)
+        fronts = non_dominated_sort(objectives)
+
+        survivors = []
+        for rank, front in enumerate(fronts):
+            crowding = crowding_distances(objectives[front])
+            for i, distance in zip(front, crowding):
+                combined[i].rank = rank
+                combined[i].crowding_distance = distance
+
+            if len(survivors) + len(front) <= self._popsize:
+                survivors.extend(combined[i] for i in front)
+            else:
+                # Fill the remaining places with the least crowded members of the front.
+                order = numpy.argsort(-crowding, kind='mergesort')
+                survivors.extend(combined[front[i]] for i in order[:self._popsize-len(survivors)])
+
+            if len(survivors) == self._popsize:
+                break
+
+        self._parents = survivors
+
+        # Best value of each objective among the parents, without the objective weights.
+        weights = numpy.ones(objectives.shape[1]) if NSGAConfig.objective_weights is None else numpy.asarray(NSGAConfig.objective_weights, dtype=float)
+        self._best_fitness.append(objectives.max(axis=0)/weights)
+
+        if report:
+            print 'Population\'s average fitness: %s stdev: %s' %(self._avg_fitness[-1], self.stdeviation())
+            print 'Fronts: %d \t non-dominated: %d' %(len(fronts), len(fronts[0]))
+            print 'Best fitness: %s' % self._best_fitness[-1]
+
+        # -------------------------- Producing new offspring -------------------------- #
+        offspring = []
+        for i in xrange(self._popsize):
+            parent1 = self._tournament_selection()
+            if random.random() < NSGAConfig.prob_crossover:
+                parent2 = self._tournament_selection()
+            else:
+                # Only mutate, crossing the parent with itself gives a copy with a new id.
+                parent2 = parent1
+            child = parent1.crossover(parent2)
+            offspring.append(child.mutate())
+
+        self._population = offspring
 
     def _population_diversity(self):
         """ Calculates the diversity of population: total average weights,
@@ -1,3 +1,5 @@
 from ann_wrap import ANN, Basic_Evolve_ANN
 
-from ann_wrap_2 import ANN2
\ No newline at end of file
+from ann_wrap_2 import ANN2
+
+from population_ann import PopulationANN
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+	Read and write the binary ANN file format of the C library (see ann.h).
+
+	The records are fixed size and 8 byte aligned, so files are read through a memory map
+	without parsing.
+"""
+
+import numpy
+
+HEADER_DTYPE = numpy.dtype([('magic','S4'),('version','<i4'),('num_input','<i4'),('num_hidden','<i4'),
+	('num_output','<i4'),('num_connections','<i4'),('output_low','<f8'),('output_high','<f8')])
+CONNECTION_DTYPE = numpy.dtype([('source','<i4'),('target','<i4'),('weight','<f8')])
+
+MAGIC = b"ANNB"
+VERSION = 1
+
+# Neuron types in the node table (NeuronType in ann.h).
+INPUT_N, OUTPUT_N, HIDDEN_N = 0, 1, 2
+
+def node_table_size(num_neurons):
+	""" Number of int32 entries in the node table, padded to a multiple of 8 bytes. """
+	return num_neurons + num_neurons % 2
+
+def write_ann_binary(filename,num_inp,num_hid,num_out,c_src,c_trg,c_wts,out_range=[0.,1.]):
+	""" Write a network in the binary ANN format.
+
+	Args:
+		filename: file to write
+		num_inp: number of inputs to the ANN
+		num_hid: number of hidden neurons in the ANN
+		num_out: number of outputs for the ANN
+		c_src: list containing the source neurons for connections
+		c_trg: list containing the target neurons for connections
+		c_wts: list containing the weights for connections
+		out_range: low and high values the outputs are scaled to
+	"""
+	header = numpy.zeros(1, dtype=HEADER_DTYPE)
+	header[0] = (MAGIC, VERSION, num_inp, num_hid, num_out, len(c_src), out_range[0], out_range[1])
+
+	nodes = numpy.zeros(node_table_size(num_inp+num_hid+num_out), dtype='<i4')
+	nodes[num_inp:num_inp+num_hid] = HIDDEN_N
+	nodes[num_inp+num_hid:num_inp+num_hid+num_out] = OUTPUT_N
+
+	connections = numpy.zeros(len(c_src), dtype=CONNECTION_DTYPE)
+	connections['source'] = c_src
+	connections['target'] = c_trg
+	connections['weight'] = c_wts
+
+	with open(filename,"wb") as f:
+		f.write(header.tobytes())
+		f.write(nodes.tobytes())
+		f.write(connections.tobytes())
+
+def read_ann_binary(filename):
+	""" Read a network in the binary ANN format.
+
+	Args:
+		filename: file to read
+	Returns:
+		num_inp,num_hid,num_out,c_src,c_trg,c_wts,out_range with the connection arrays 
+		mapped from the file
+	"""
+	data = numpy.memmap(filename, dtype=numpy.uint8, mode='r')
+	header = data[:HEADER_DTYPE.itemsize].view(HEADER_DTYPE)[0]
+	if header['magic'] != MAGIC or header['version'] != VERSION:
+		raise ValueError("Not a binary ANN file: "+str(filename))
+
+	num_inp, num_hid, num_out = int(header['num_input']), int(header['num_hidden']), int(header['num_output'])
+	start = HEADER_DTYPE.itemsize + 4*node_table_size(num_inp+num_hid+num_out)
+	connections = data[start:start+int(header['num_connections'])*CONNECTION_DTYPE.itemsize].view(CONNECTION_DTYPE)
+
+	return num_inp, num_hid, num_out, connections['source'], connections['target'], connections['weight'], \
+		[float(header['output_low']), float(header['output_high'])]
@@ -95,4 +95,122 @@ test_act_1 = new_ann_2.activate([1.,1.])
 if test_act_0 == test_act_1:
 	print("Failed Test 6: Values are equal.")
 else:
-	print("Passed Test 6: Mutate Weight in Neural Network")
\ No newline at end of file
+	print("Passed Test 6: Mutate Weight in Neural Network")
+
+###############################################################################################################
+
+# Test Case 7: Write an ANN in the binary format from Python and C, read it back on both sides and compare
+# against the original network and the text format.
+import os
+import tempfile
+
+from ann_wrap_2 import ANN2
+from ann_binary import read_ann_binary
+from cffi_code import ffi, libann
+
+tmp_dir = tempfile.mkdtemp()
+bin_py = os.path.join(tmp_dir,"py.annb")
+bin_c = os.path.join(tmp_dir,"c.annb")
+txt_c = os.path.join(tmp_dir,"c.ann")
+
+new_ann = ANN2(2,2,2,c_src=[0,1,0,2,3,2],c_trg=[2,2,3,4,5,5],c_wts=[.123456789,-.5,.25,1.987654321,-.75,.3])
+new_ann.to_binary_file(bin_py)
+libann.serializeBinary_ANN(new_ann.ann, bin_c.encode())
+libann.serialize_ANN(new_ann.ann, txt_c.encode())
+
+from_py = ANN2.from_binary_file(bin_c)
+from_c = ffi.gc(libann.new_ANN_FromBinaryFile(bin_py.encode()), libann.delete_ANN)
+from_txt = ffi.gc(libann.new_ANN_FromFile(txt_c.encode()), libann.delete_ANN)
+libann.setOutputRange_ANN(from_txt, -1., 1.)
+
+inputs = [[1.,0.],[0.,1.],[1.,1.],[.5,.25]]
+out_orig = [new_ann.activate(i) for i in inputs]
+out_py = [from_py.activate(i) for i in inputs]
+out_c, out_txt = [], []
+for i in inputs:
+	o = ffi.new("double[]", 2)
+	libann.activateIO_ANN(from_c, ffi.new("double[]", i), o)
+	out_c.append(list(o))
+	libann.activateIO_ANN(from_txt, ffi.new("double[]", i), o)
+	out_txt.append(list(o))
+
+if open(bin_py,"rb").read() != open(bin_c,"rb").read():
+	print("Failed Test 7: Python and C binary files differ.")
+elif out_orig != out_py or out_orig != out_c:
+	print("Failed Test 7: Binary round trip changed the outputs. Original: "+str(out_orig)+" Python: "+str(out_py)+" C: "+str(out_c))
+elif max(abs(a-b) for o1,o2 in zip(out_orig,out_txt) for a,b in zip(o1,o2)) > 1e-4:
+	print("Failed Test 7: Binary and text formats disagree. Binary: "+str(out_orig)+" Text: "+str(out_txt))
+elif list(read_ann_binary(bin_c)[5]) != new_ann.conn_wts:
+	print("Failed Test 7: Weights not read back exactly.")
+else:
+	print("Passed Test 7: Binary ANN round trip")
+
+for f in [bin_py,bin_c,txt_c]:
+	os.remove(f)
+os.rmdir(tmp_dir)
+
+###############################################################################################################
+
+# Test Case 8: Archive NEAT genomes in the binary format and compare them with the text format.
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+import random
+
+from neat_python import Config, Genome
+
+Config.input_nodes, Config.output_nodes, Config.weight_stdev = 3, 2, 1.
+Config.prob_addnode, Config.prob_addconn = 0.5, 0.5
+Config.min_weight, Config.max_weight, Config.min_out_weight, Config.max_out_weight = -1., 1., -1., 1.
+
+tmp_dir = tempfile.mkdtemp()
+bin_genomes = os.path.join(tmp_dir,"genomes.negb")
+txt_genome = os.path.join(tmp_dir,"genome.txt")
+
+genomes = []
+for i in range(5):
+	g = Genome.create_fully_connected()
+	for m in range(10):
+		g.mutate()
+	g.append_binary(bin_genomes)
+	genomes.append(g)
+
+with open(txt_genome,"w") as f:
+	f.write(str(genomes[-1]))
+
+read_back = Genome.genomes_from_binary_file(bin_genomes)
+from_text = Genome.genome_from_file(txt_genome)
+
+if [str(g) for g in genomes] != [str(g) for g in read_back]:
+	print("Failed Test 8: Binary genomes differ from the originals.")
+elif read_back[-1].build_phenotype() != from_text.build_phenotype():
+	print("Failed Test 8: Binary and text genomes build different phenotypes.")
+else:
+	print("Passed Test 8: Binary NEAT genome round trip")
+
+for f in [bin_genomes,txt_genome]:
+	os.remove(f)
+os.rmdir(tmp_dir)
+
+###############################################################################################################
+
+# Test Case 9: Compare the vectorized species representant distances with Genome.distance.
+from neat_python.species import RepresentativeTable
+
+Config.prob_addnode, Config.prob_addconn = 0.1, 0.2
+Config.prob_mutate_weight, Config.prob_uni_mut_weight, Config.weight_mutation_power, Config.prob_togglelink = 0.8, 0.1, 0.5, 0.01
+Config.excess_coeficient, Config.disjoint_coeficient, Config.weight_coeficient = 1., 1., 0.4
+
+genomes = []
+for i in range(40):
+	g = Genome.create_fully_connected()
+	for m in range(random.randint(0,20)):
+		g.mutate()
+	genomes.append(g)
+
+representants = RepresentativeTable(genomes[:10])
+max_diff = max(abs(d - g.distance(r)) for g in genomes for d,r in zip(representants.distances(g),genomes[:10]))
+
+if max_diff > 1e-9:
+	print("Failed Test 9: Representant distances differ from Genome.distance by "+str(max_diff))
+else:
+	print("Passed Test 9: Vectorized representant distances")
@@ -4,8 +4,87 @@
 
 import random
 
+import numpy
+
 from cffi_code import *
 
+class ConnectionGenes(object):
+	""" Connections of an ANN genome stored in parallel integer/weight lists.
+
+	Supports the dictionary operations the evolutionary operators use with (src,trg) 
+	tuples as keys.  Adding, looking up and removing a connection is O(1) and the 
+	connections touching a neuron are found in O(degree).
+
+	Object variables:
+		src: list of source neurons
+		trg: list of target neurons
+		wts: list of weights
+		index: dictionary mapping (src,trg) to the position in the lists
+		neuron_links: dictionary mapping a neuron to the set of (src,trg) keys touching it
+	"""
+
+	def __init__(self):
+		""" Initializer for the class. """
+		self.src = []
+		self.trg = []
+		self.wts = []
+		self.index = {}
+		self.neuron_links = {}
+
+	def __len__(self):
+		return len(self.src)
+
+	def __contains__(self,key):
+		return key in self.index
+
+	def __getitem__(self,key):
+		return self.wts[self.index[key]]
+
+	def __setitem__(self,key,weight):
+		""" Set the weight of a connection, adding the connection if it doesn't exist. """
+		if key in self.index:
+			self.wts[self.index[key]] = weight
+			return
+
+		self.index[key] = len(self.src)
+		self.src.append(key[0])
+		self.trg.append(key[1])
+		self.wts.append(weight)
+		self.neuron_links.setdefault(key[0],set()).add(key)
+		self.neuron_links.setdefault(key[1],set()).add(key)
+
+	def __delitem__(self,key):
+		""" Remove a connection by moving the last connection into its place. """
+		i = self.index.pop(key)
+		last = len(self.src)-1
+		if i != last:
+			self.src[i], self.trg[i], self.wts[i] = self.src[last], self.trg[last], self.wts[last]
+			self.index[(self.src[i],self.trg[i])] = i
+		self.src.pop()
+		self.trg.pop()
+		self.wts.pop()
+		for n in set(key):
+			links = self.neuron_links[n]
+			links.discard(key)
+			if not links:
+				del self.neuron_links[n]
+
+	def keys(self):
+		""" Get the (src,trg) keys of all connections. """
+		return zip(self.src,self.trg)
+
+	def iteritems(self):
+		""" Iterate over ((src,trg),weight) for all connections. """
+		return ((k,w) for k,w in zip(zip(self.src,self.trg),self.wts))
+
+	def key_at(self,i):
+		""" Get the (src,trg) key of the connection at position i. """
+		return (self.src[i],self.trg[i])
+
+	def neuron_keys(self,neuron):
+		""" Get the (src,trg) keys of the connections touching a neuron. """
+		return list(self.neuron_links.get(neuron,()))
+
 class ANN(object):
 	""" Class that provides basic ANN functionality. 
 
@@ -15,7 +94,7 @@ class ANN(object):
 		ann: instantation of the neural network
 	"""
 
-	def __init__(self,num_inp=0,num_hid=0,num_out=0,c_src=[],c_trg=[],c_wts=[],wt_range=1.,ann_str="",out_range=[-1.,1.]):
+	def __init__(self,num_inp=0,num_hid=0,num_out=0,c_src=[],c_trg=[],c_wts=[],wt_range=1.,ann_str="",out_range=[-1.,1.],csr=False):
 		""" Initializer for the class. 
 
 		Args:
@@ -27,10 +106,16 @@ class ANN(object):
 			c_wts: list containing the weights for connections
 			wt_range: absolute value for the maximum/minimum weights
 			ann_str: string containing the definition for a neural network.
+			csr: activate from connections grouped by target neuron (faster for larger networks)
 		"""
 
-		self.genome = {"stats":{},"neurons":{},"connections":{}}
+		self.genome = {"stats":{},"neurons":{},"connections":ConnectionGenes()}
 		self.ann = None
+		self.csr = csr
+
+		# Input/output buffers reused by every activation.
+		self.inputs = None
+		self.outputs = None
 
 		self.genome['stats']['weight_range'] = wt_range
 		self.genome['stats']['low_output'] = out_range[0]
@@ -67,7 +152,7 @@ class ANN(object):
 		# Parse the connections in the network.
 		out_str += "<connections>"
 		for key,val in self.genome['connections'].iteritems():
-			out_str += str(key)+":"+str(val)+";"
+			out_str += str(key[0])+"->"+str(key[1])+":"+str(val)+";"
 		out_str += "</connections>"
 
 		out_str += "</ANN>"
@@ -108,7 +193,8 @@ class ANN(object):
 		# Parse the connections string:
 		for elem in parsed_connections_str:
 			split_elem = elem.split(":")
-			self.genome['connections'][split_elem[0]] = float(split_elem[1])
+			link = split_elem[0].split("->")
+			self.genome['connections'][(int(link[0]),int(link[1]))] = float(split_elem[1])
 
 	def construct_genome(self,num_inp,num_hid,num_out,c_src,c_trg,c_wts):
 		""" Construct a dictionary containing information about the ANN.
@@ -125,7 +211,7 @@ class ANN(object):
 			dictionary containing dictionaries for: 
 											stats: information about network size, number of connections, etc
 											neurons: neuron id/information(type)
-											connections: list of tuples(src_id,trg_id,weight)
+											connections: ConnectionGenes of (src_id,trg_id) -> weight
 		"""
 
 		# Fill out the statistics about the network.
@@ -147,25 +233,25 @@ class ANN(object):
 
 		# Create the entries for the connections.
 		for i in xrange(len(c_src)):
-			self.genome['connections'][str(c_src[i])+"->"+str(c_trg[i])] = c_wts[i]
+			self.genome['connections'][(c_src[i],c_trg[i])] = c_wts[i]
 
 	def initialize_ANN(self):
 		""" Initialize the actual artificial neural network. """
 
-		# Decode the connections.
-		c_src, c_trg, c_wts = [], [], []
-		for key,val in self.genome['connections'].iteritems():
-			link = key.split("->")
-			c_src.append(int(link[0]))
-			c_trg.append(int(link[1]))
-			c_wts.append(val)
+		c_src = self.genome['connections'].src
+		c_trg = self.genome['connections'].trg
+		c_wts = self.genome['connections'].wts
 
-		self.ann = libann.new_ANN(ffi.new("int[]", [	self.genome['stats']['num_inp'],
+		self.ann = ffi.gc(libann.new_ANN_Layout(ffi.new("int[]", [	self.genome['stats']['num_inp'],
 														self.genome['stats']['num_hid'],
 														self.genome['stats']['num_out']]), 
 			ffi.new("int[]", [i for i in c_src]),
 			ffi.new("int[]", [i for i in c_trg]), 
-			ffi.new("double[]", [i for i in c_wts]), len(c_src))
+			ffi.new("double[]", [i for i in c_wts]), len(c_src), libann.CSR_LAYOUT if self.csr else libann.AOS_LAYOUT), libann.delete_ANN)
+		libann.setOutputRange_ANN(self.ann, self.genome['stats']['low_output'], self.genome['stats']['high_output'])
+
+		self.inputs = ffi.new("double[]", self.genome['stats']['num_inp'])
+		self.outputs = ffi.new("double[]", self.genome['stats']['num_out'])
 
 	def activate(self,inputs):
 		""" Activate the neural network by providing the inputs and returning the output.
@@ -180,19 +266,67 @@ class ANN(object):
 		if not self.ann:
 			self.initialize_ANN()
 
-		inputs = ffi.new("double["+str(self.genome['stats']['num_inp'])+"]", inputs)
-		outputs = ffi.new("double["+str(self.genome['stats']['num_out'])+"]")
-		
-		libann.setInput_ANN(self.ann, inputs, self.genome['stats']['num_inp'])
-		libann.activate_ANN(self.ann)
-		libann.getOutput_ANN(self.ann, outputs, self.genome['stats']['num_out'])
+		# Missing inputs are zero, not left over from the previous call.
+		num_inp = self.genome['stats']['num_inp']
+		self.inputs[0:len(inputs)] = inputs
+		if len(inputs) < num_inp:
+			self.inputs[len(inputs):num_inp] = [0.]*(num_inp-len(inputs))
+		libann.activateIO_ANN(self.ann, self.inputs, self.outputs)
+
+		return ffi.unpack(self.outputs, self.genome['stats']['num_out'])
+
+	def activate_array(self,inputs,outputs=None):
+		""" Activate the neural network on NumPy arrays without copying through lists.
+
+		Args:
+			inputs: array containing the inputs to activate with.
+			outputs: optional contiguous float64 array to write the outputs into.
+		Returns:
+			an array containing the outputs from the ANN
+		"""
+
+		# Ensure that the ANN has been initialized before we activate it.
+		if not self.ann:
+			self.initialize_ANN()
+
+		inputs = numpy.ascontiguousarray(inputs, dtype=numpy.float64)
+		if inputs.size != self.genome['stats']['num_inp']:
+			raise ValueError("Expected "+str(self.genome['stats']['num_inp'])+" inputs, got "+str(inputs.size))
+		if outputs is None:
+			outputs = numpy.empty(self.genome['stats']['num_out'])
+		elif not (isinstance(outputs, numpy.ndarray) and outputs.dtype == numpy.float64 and outputs.flags['C_CONTIGUOUS'] and outputs.size == self.genome['stats']['num_out']):
+			raise ValueError("outputs must be a C-contiguous float64 array of size "+str(self.genome['stats']['num_out']))
 
-		# Scale the outputs based on ranges.
-		outputs = list(outputs)
-		for i in range(len(outputs)):
-			outputs[i] = self.genome['stats']['low_output']+(self.genome['stats']['outputs_range']*outputs[i])
+		libann.activateIO_ANN(self.ann, ffi.from_buffer("double[]", inputs), ffi.from_buffer("double[]", outputs, require_writable=True))
 
-		return list(outputs)
+		return outputs
+
+	def activate_batch(self,inputs,reset=False,activations=1):
+		""" Activate the neural network on many input vectors in a single call.
+
+		Args:
+			inputs: n x num_inp array (or list of lists) of inputs, one sample per row.
+			reset: clear the network state before each sample so samples are independent
+			activations: number of activations per sample when resetting
+		Returns:
+			an n x num_out array containing the outputs for each sample
+		"""
+
+		# Ensure that the ANN has been initialized before we activate it.
+		if not self.ann:
+			self.initialize_ANN()
+
+		inputs = numpy.ascontiguousarray(inputs, dtype=numpy.float64)
+		if inputs.ndim != 2 or inputs.shape[1] != self.genome['stats']['num_inp']:
+			raise ValueError("Expected an n x "+str(self.genome['stats']['num_inp'])+" array of inputs, got shape "+str(inputs.shape))
+		outputs = numpy.empty((inputs.shape[0],self.genome['stats']['num_out']))
+
+		if reset:
+			libann.activateBatchReset_ANN(self.ann, ffi.from_buffer("double[]", inputs), inputs.shape[0], ffi.from_buffer("double[]", outputs, require_writable=True), activations)
+		else:
+			libann.activateBatch_ANN(self.ann, ffi.from_buffer("double[]", inputs), inputs.shape[0], ffi.from_buffer("double[]", outputs, require_writable=True))
+
+		return outputs
 
 class Basic_Evolve_ANN(object):
 	""" Class that implements static methods to perform evolutionary development of an ANN. """
@@ -215,11 +349,10 @@ class Basic_Evolve_ANN(object):
 		ann.genome['neurons'][new_id] = 'hidden'
 
 		# Select a connection randomly from the ANN's set of connections to split and insert the node.
-		conn_to_split = random.choice(list(ann.genome['connections'].keys()))
+		conn_to_split = ann.genome['connections'].key_at(random.randrange(len(ann.genome['connections'])))
 
-		con_nodes = conn_to_split.split("->")
-		ann.genome['connections'][con_nodes[0]+"->"+str(new_id)] = 1.0 # float("{0:.4f}".format(-ann.genome['stats']['weight_range'] + (random.random()*(2.*ann.genome['stats']['weight_range']))))
-		ann.genome['connections'][str(new_id)+"->"+con_nodes[1]] = ann.genome['connections'][conn_to_split] # float("{0:.4f}".format(-ann.genome['stats']['weight_range'] + (random.random()*(2.*ann.genome['stats']['weight_range']))))
+		ann.genome['connections'][(conn_to_split[0],new_id)] = 1.0 # float("{0:.4f}".format(-ann.genome['stats']['weight_range'] + (random.random()*(2.*ann.genome['stats']['weight_range']))))
+		ann.genome['connections'][(new_id,conn_to_split[1])] = ann.genome['connections'][conn_to_split] # float("{0:.4f}".format(-ann.genome['stats']['weight_range'] + (random.random()*(2.*ann.genome['stats']['weight_range']))))
 
 		# Remove the split connection.
 		del ann.genome['connections'][conn_to_split]
@@ -248,26 +381,22 @@ class Basic_Evolve_ANN(object):
 
 		# Find what connections neuron_id is a part of and delete them.
 		con_adj = 0 # Keep track of how many are removed.
-		for k in ann.genome['connections'].keys():
-			spl = k.split("->")
-			if neuron_id == int(spl[0]) or neuron_id == int(spl[1]):
-				del ann.genome['connections'][k]
-				con_adj += 1
+		for k in ann.genome['connections'].neuron_keys(neuron_id):
+			del ann.genome['connections'][k]
+			con_adj += 1
 		ann.genome['stats']['num_connections'] -= con_adj
 
 		# Move the last neuron to the removed neuron's id to maintain continuity in numbering
-		if neuron_id != ann.genome['stats']['num_neurons']-1:
-			last_id = ann.genome['stats']['num_neurons']-1
-
+		last_id = ann.genome['stats']['num_neurons']-1
+		if neuron_id != last_id:
 			# Find what connections last_id is a part of and rekey them.
-			for k in ann.genome['connections'].keys():
-				spl = k.split("->")
-				if last_id == int(spl[0]):
-					ann.genome['connections'][str(neuron_id)+"->"+spl[1]] = ann.genome['connections'][k]
-					del ann.genome['connections'][k]			
-				elif last_id == int(spl[1]):
-					ann.genome['connections'][spl[0]+"->"+str(neuron_id)] = ann.genome['connections'][k]
-					del ann.genome['connections'][k]			
+			for k in ann.genome['connections'].neuron_keys(last_id):
+				weight = ann.genome['connections'][k]
+				del ann.genome['connections'][k]
+				ann.genome['connections'][tuple(neuron_id if n == last_id else n for n in k)] = weight
+
+			ann.genome['neurons'][neuron_id] = ann.genome['neurons'][last_id]
+		del ann.genome['neurons'][last_id]
 
 		# Adjust the number of neuron count.
 		ann.genome['stats']['num_neurons'] -= 1
@@ -293,7 +422,7 @@ class Basic_Evolve_ANN(object):
 			ann: artificial neural network to perturb.
 		"""
 		#ann.genome['connections'][random.choice(list(ann.genome['connections'].keys()))] = float("{0:.4f}".format(-ann.genome['stats']['weight_range'] + (random.random()*(2.*ann.genome['stats']['weight_range']))))
-		connection = random.choice(list(ann.genome['connections'].keys()))
+		connection = ann.genome['connections'].key_at(random.randrange(len(ann.genome['connections'])))
 		Basic_Evolve_ANN.mutate_ann_weight(ann,connection)
 		# cur_weight = ann.genome['connections'][connection]
 
@@ -316,7 +445,7 @@ class Basic_Evolve_ANN(object):
 
 		Args:
 			ann: artificial neural network
-			connection: key identifying the connection to mutate
+			connection: (src,trg) key identifying the connection to mutate
 		"""
 		cur_weight = ann.genome['connections'][connection]
 
@@ -347,7 +476,7 @@ class Basic_Evolve_ANN(object):
 
 		# Don't add a second connection if one already exists!
 		max_tries = 5
-		while str(src)+"->"+str(dst) in ann.genome['connections'] and max_tries > 0:
+		while (src,dst) in ann.genome['connections'] and max_tries > 0:
 			src = random.randint(0,ann.genome['stats']['num_neurons']-1)
 			dst = random.randint(ann.genome['stats']['num_inp'],ann.genome['stats']['num_neurons']-1)
 			max_tries -= 1
@@ -356,7 +485,7 @@ class Basic_Evolve_ANN(object):
 		if max_tries == 0:
 			return
 
-		ann.genome['connections'][str(src)+"->"+str(dst)] = float("{0:.4f}".format(-ann.genome['stats']['weight_range'] + (random.random()*(2.*ann.genome['stats']['weight_range']))))
+		ann.genome['connections'][(src,dst)] = float("{0:.4f}".format(-ann.genome['stats']['weight_range'] + (random.random()*(2.*ann.genome['stats']['weight_range']))))
 		
 		# Adjust stats of the network.
 		ann.genome['stats']['num_connections'] += 1
@@ -372,6 +501,6 @@ class Basic_Evolve_ANN(object):
 		if len(ann.genome['connections']) < 1:
 			return
 
-		del ann.genome['connections'][random.choice(list(ann.genome['connections'].keys()))]
+		del ann.genome['connections'][ann.genome['connections'].key_at(random.randrange(len(ann.genome['connections'])))]
 
 		ann.genome['stats']['num_connections'] -= 1
\ No newline at end of file
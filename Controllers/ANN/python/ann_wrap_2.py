@@ -5,7 +5,10 @@
 
 import random
 
+import numpy
+
 from cffi_code import *
+from ann_binary import read_ann_binary, write_ann_binary
 
 class ANN2(object):
 	""" Class that provides basic ANN functionality. 
@@ -17,7 +20,7 @@ class ANN2(object):
 	"""
 
 	@classmethod
-	def get_ann(cls, phenotype_spec):
+	def get_ann(cls, phenotype_spec, csr=False):
 		""" Build an ANN from the phenotype specification sent from the NEAT genome build_phenotype method. 
 
 		phenotype_spec has the following form:
@@ -29,9 +32,23 @@ class ANN2(object):
 
 		return cls(num_inp=phenotype_spec[0],num_hid=phenotype_spec[1],num_out=phenotype_spec[2],\
 			c_src=phenotype_spec[3],c_trg=phenotype_spec[4],c_wts=phenotype_spec[5],\
-			wt_range=phenotype_spec[6],out_range=phenotype_spec[7])
+			wt_range=phenotype_spec[6],out_range=phenotype_spec[7],csr=csr)
+
+	@classmethod
+	def from_binary_file(cls, filename, wt_range=1., csr=False):
+		""" Build an ANN from a file in the binary ANN format.
+
+		Args:
+			filename: file written by to_binary_file or serializeBinary_ANN
+			wt_range: absolute value for the maximum/minimum weights
+			csr: activate from connections grouped by target neuron
+		"""
+		num_inp, num_hid, num_out, c_src, c_trg, c_wts, out_range = read_ann_binary(filename)
+		return cls(num_inp=num_inp,num_hid=num_hid,num_out=num_out,\
+			c_src=c_src.tolist(),c_trg=c_trg.tolist(),c_wts=c_wts.tolist(),\
+			wt_range=wt_range,out_range=out_range,csr=csr)
 
-	def __init__(self,num_inp=0,num_hid=0,num_out=0,c_src=[],c_trg=[],c_wts=[],wt_range=1.,out_range=[-1.,1.]):
+	def __init__(self,num_inp=0,num_hid=0,num_out=0,c_src=[],c_trg=[],c_wts=[],wt_range=1.,out_range=[-1.,1.],csr=False):
 		""" Initializer for the class. 
 
 		Args:
@@ -42,6 +59,7 @@ class ANN2(object):
 			c_trg: list containing the target neurons for connections
 			c_wts: list containing the weights for connections
 			wt_range: absolute value for the maximum/minimum weights
+			csr: activate from connections grouped by target neuron (faster for larger networks)
 		"""
 
 		#print(num_inp,num_hid,num_out)
@@ -51,6 +69,11 @@ class ANN2(object):
 		self.weight_range = wt_range
 
 		self.ann = None
+		self.csr = csr
+
+		# Input/output buffers reused by every activation.
+		self.inputs = None
+		self.outputs = None
 
 		# ANN Information about the nodes and connections in the network.
 		self.num_inp = num_inp
@@ -79,13 +102,26 @@ class ANN2(object):
 			str(self.conn_trg) + " " +\
 			str(self.conn_wts)
 
+	def to_binary_file(self,filename):
+		""" Write the ANN to a file in the binary ANN format.
+
+		Args:
+			filename: file to write
+		"""
+		write_ann_binary(filename,self.num_inp,self.num_hid,self.num_out,\
+			self.conn_src,self.conn_trg,self.conn_wts,[self.low_output,self.high_output])
+
 	def initialize_ANN(self):
 		""" Initialize the actual artificial neural network. """
 
-		self.ann = libann.new_ANN(ffi.new("int[]", [self.num_inp, self.num_hid, self.num_out]), 
+		self.ann = ffi.gc(libann.new_ANN_Layout(ffi.new("int[]", [self.num_inp, self.num_hid, self.num_out]), 
 			ffi.new("int[]", [i for i in self.conn_src]),
 			ffi.new("int[]", [i for i in self.conn_trg]), 
-			ffi.new("double[]", [i for i in self.conn_wts]), len(self.conn_src))
+			ffi.new("double[]", [i for i in self.conn_wts]), len(self.conn_src), libann.CSR_LAYOUT if self.csr else libann.AOS_LAYOUT), libann.delete_ANN)
+		libann.setOutputRange_ANN(self.ann, self.low_output, self.high_output)
+
+		self.inputs = ffi.new("double[]", self.num_inp)
+		self.outputs = ffi.new("double[]", self.num_out)
 
 	def activate(self,inp):
 		""" Activate the neural network by providing the inputs and returning the output.
@@ -100,16 +136,55 @@ class ANN2(object):
 		#if not self.ann:
 		#	self.initialize_ANN()
 
-		inputs = ffi.new("double["+str(self.num_inp)+"]", inp)
-		outputs = ffi.new("double["+str(self.num_out)+"]")
-		
-		libann.setInput_ANN(self.ann, inputs, self.num_inp)
-		libann.activate_ANN(self.ann)
-		libann.getOutput_ANN(self.ann, outputs, self.num_out)
+		# Missing inputs are zero, not left over from the previous call.
+		self.inputs[0:len(inp)] = inp
+		if len(inp) < self.num_inp:
+			self.inputs[len(inp):self.num_inp] = [0.]*(self.num_inp-len(inp))
+		libann.activateIO_ANN(self.ann, self.inputs, self.outputs)
+
+		return ffi.unpack(self.outputs, self.num_out)
+
+	def activate_array(self,inputs,outputs=None):
+		""" Activate the neural network on NumPy arrays without copying through lists.
+
+		Args:
+			inputs: array containing the inputs to activate with.
+			outputs: optional contiguous float64 array to write the outputs into.
+		Returns:
+			an array containing the outputs from the ANN
+		"""
+
+		inputs = numpy.ascontiguousarray(inputs, dtype=numpy.float64)
+		if inputs.size != self.num_inp:
+			raise ValueError("Expected "+str(self.num_inp)+" inputs, got "+str(inputs.size))
+		if outputs is None:
+			outputs = numpy.empty(self.num_out)
+		elif not (isinstance(outputs, numpy.ndarray) and outputs.dtype == numpy.float64 and outputs.flags['C_CONTIGUOUS'] and outputs.size == self.num_out):
+			raise ValueError("outputs must be a C-contiguous float64 array of size "+str(self.num_out))
+
+		libann.activateIO_ANN(self.ann, ffi.from_buffer("double[]", inputs), ffi.from_buffer("double[]", outputs, require_writable=True))
+
+		return outputs
+
+	def activate_batch(self,inputs,reset=False,activations=1):
+		""" Activate the neural network on many input vectors in a single call.
+
+		Args:
+			inputs: n x num_inp array (or list of lists) of inputs, one sample per row.
+			reset: clear the network state before each sample so samples are independent
+			activations: number of activations per sample when resetting
+		Returns:
+			an n x num_out array containing the outputs for each sample
+		"""
+
+		inputs = numpy.ascontiguousarray(inputs, dtype=numpy.float64)
+		if inputs.ndim != 2 or inputs.shape[1] != self.num_inp:
+			raise ValueError("Expected an n x "+str(self.num_inp)+" array of inputs, got shape "+str(inputs.shape))
+		outputs = numpy.empty((inputs.shape[0],self.num_out))
 
-		# Scale the outputs based on ranges.
-		out = list(outputs)
-		for i in range(len(out)):
-			out[i] = self.low_output+((self.high_output-self.low_output)*out[i])
+		if reset:
+			libann.activateBatchReset_ANN(self.ann, ffi.from_buffer("double[]", inputs), inputs.shape[0], ffi.from_buffer("double[]", outputs, require_writable=True), activations)
+		else:
+			libann.activateBatch_ANN(self.ann, ffi.from_buffer("double[]", inputs), inputs.shape[0], ffi.from_buffer("double[]", outputs, require_writable=True))
 
-		return out
\ No newline at end of file
+		return outputs
\ No newline at end of file
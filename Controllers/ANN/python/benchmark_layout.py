@@ -0,0 +1,63 @@
+"""
+	Compare the activation speed of the AOS and CSR connection layouts.
+
+	Random networks from 10 to 10k connections are activated on the same inputs with 
+	both layouts and the time per activation is reported.
+"""
+
+import argparse
+import random
+import time
+
+import numpy
+
+from ann_wrap_2 import ANN2
+
+def random_network(num_conn, num_inp=10, num_out=10):
+	""" Build the arguments for a random network.
+
+	Args:
+		num_conn: number of connections in the network
+		num_inp: number of input neurons
+		num_out: number of output neurons
+	Returns:
+		keyword arguments for ANN2
+	"""
+	num_hid = max(5, num_conn/20)
+	num_neurons = num_inp + num_hid + num_out
+	return {'num_inp':num_inp, 'num_hid':num_hid, 'num_out':num_out,
+		'c_src':[random.randint(0,num_neurons-1) for i in xrange(num_conn)],
+		'c_trg':[random.randint(num_inp,num_neurons-1) for i in xrange(num_conn)],
+		'c_wts':[random.uniform(-1.,1.) for i in xrange(num_conn)]}
+
+def time_activation(ann, inputs, repeats):
+	""" Time activating a network on a batch of inputs.
+
+	Args:
+		ann: network to activate
+		inputs: n x num_inp array of inputs
+		repeats: number of times to activate the whole batch
+	Returns:
+		mean seconds per activation
+	"""
+	start = time.time()
+	for i in xrange(repeats):
+		ann.activate_batch(inputs)
+	return (time.time() - start)/(repeats*inputs.shape[0])
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--connections", type=int, nargs="+", default=[10,100,1000,10000], help="Network sizes to compare.")
+parser.add_argument("--samples", type=int, default=1000, help="Inputs per batch.")
+parser.add_argument("--repeats", type=int, default=20, help="Batches to time per network.")
+parser.add_argument("--seed", type=int, default=0, help="Random seed for the networks.")
+args = parser.parse_args()
+
+random.seed(args.seed)
+
+print("Connections,AOS_us,CSR_us,Speedup")
+for num_conn in args.connections:
+	net = random_network(num_conn)
+	inputs = numpy.random.RandomState(args.seed).rand(args.samples, net['num_inp'])
+	aos = time_activation(ANN2(**net), inputs, args.repeats)
+	csr = time_activation(ANN2(csr=True, **net), inputs, args.repeats)
+	print(str(num_conn)+","+str(aos*1e6)+","+str(csr*1e6)+","+str(aos/csr))
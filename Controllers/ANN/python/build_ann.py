@@ -0,0 +1,55 @@
+"""
+	Build the cffi extension module for the ANN library.
+
+	Compiles src/ann.cpp into the API-mode module _ann_cffi next to this file so the 
+	wrappers load the library with a plain import.  Run again after changing ann.h or ann.cpp:
+		python build_ann.py
+	Set ANN_OPENMP=1 to activate the networks of a PopulationANN in parallel.
+"""
+
+import os
+import shutil
+
+from cffi import FFI
+
+python_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(python_dir,"..","src")
+
+def read_c_interface(header):
+	""" Read the C interface declared in the extern "C" block of the header.
+
+	Args:
+		header: path to ann.h
+	Returns:
+		string of declarations for ffi.cdef
+	"""
+	c_interface_str = ""
+	with open(header,"r") as f:
+		reading = False
+		for line in f:
+			line = line.strip()
+			if line == "typedef void ANN_C;":
+				reading = True
+			elif line == "}":
+				reading = False
+			if reading and line and not line.startswith("//"):
+				c_interface_str += line+"\n"
+	return c_interface_str
+
+# Optional OpenMP parallel loop over the networks of a PopulationANN.
+openmp_args = ["-fopenmp"] if os.environ.get("ANN_OPENMP","0") == "1" else []
+
+ffibuilder = FFI()
+ffibuilder.cdef("typedef enum ConnectionLayout_E { AOS_LAYOUT, CSR_LAYOUT } ConnectionLayout;")
+ffibuilder.cdef(read_c_interface(os.path.join(src_dir,"ann.h")))
+ffibuilder.set_source("_ann_cffi", '#include "ann.h"',
+	sources=[os.path.join(src_dir,"ann.cpp")],
+	include_dirs=[src_dir],
+	source_extension=".cpp",
+	extra_compile_args=["-O3"]+openmp_args,
+	extra_link_args=openmp_args)
+
+if __name__ == "__main__":
+	# Build in a scratch directory and place the extension next to the wrappers.
+	lib_path = ffibuilder.compile(tmpdir=os.path.join(python_dir,"build"), verbose=True)
+	shutil.copy(lib_path, python_dir)
@@ -1,22 +1,13 @@
 """
-	Handle calling the default FFI required loading code for the ANN so it doesn't clutter up other modules.
-"""
-
-from cffi import FFI
-ffi = FFI()
+	Handle loading the compiled ANN library so it doesn't clutter up other modules.
 
-c_interface_str = ""
-with open("../../Controllers/ANN/src/ann.h","r") as f:
-	reading = False
-	for line in f:
-		if line.strip() == "typedef void ANN_C;":
-			reading = True
-			c_interface_str += line.strip()
-		if reading and line.strip() != "}":
-			c_interface_str += line.strip()
-		else:
-			reading = False
+	The library is the cffi API-mode extension _ann_cffi produced by build_ann.py, found 
+	next to this file regardless of the working directory.
+"""
 
-ffi.cdef(c_interface_str)
+import os
 
-libann = ffi.dlopen('../../Controllers/ANN/bin/libann.dylib')
\ No newline at end of file
+try:
+	from _ann_cffi import ffi, lib as libann
+except ImportError:
+	raise ImportError("The ANN extension is not built.  Run python build_ann.py in "+os.path.dirname(os.path.abspath(__file__)))
@@ -14,6 +14,10 @@ from ann_wrap import ANN, Basic_Evolve_ANN
 
 pop_size = 50
 
+# Test cases and their targets, activated in a single call per individual.
+cases = [[0,0],[1,0],[0,1],[1,1]]
+targets = [0.,1.,1.,0.]
+
 population = [ANN(2,1,1,c_src=[0,1,2],c_trg=[2,2,3],c_wts=[-1.+2.*random.random() for j in range(3)]) for i in range(pop_size)]
 best_ind = 0
 
@@ -22,23 +26,8 @@ for gen in xrange(1000):
 	
 	# Evaluate the individuals
 	for ind in population:
-		err = 0.
-
-		# 0,0 Case
-		act = ind.activate([0,0])
-		err += math.fabs(0.-act[0])
-
-		# 1,0 Case
-		act = ind.activate([1,0])
-		err += math.fabs(1.-act[0])
-
-		# 0,1 Case
-		act = ind.activate([0,1])
-		err += math.fabs(1.-act[0])
-
-		# 1,1 Case
-		act = ind.activate([1,1])
-		err += math.fabs(0.-act[0])
+		act = ind.activate_batch(cases)
+		err = sum(math.fabs(t-a[0]) for t,a in zip(targets,act))
 
 		fitnesses.append(err)
 
@@ -0,0 +1,74 @@
+"""
+	Activate the networks of a whole population with a single call into the C library.
+"""
+
+import numpy
+
+from cffi_code import *
+
+class PopulationANN(object):
+	""" Class that packs the networks of a population into shared contiguous arrays. 
+
+	Object variables:
+		num_nets: number of networks in the population
+		num_inp: list with the number of inputs of each network
+		num_out: list with the number of outputs of each network
+		pop: instantiation of the packed networks
+	"""
+
+	def __init__(self,phenotype_specs):
+		""" Initializer for the class.
+
+		Args:
+			phenotype_specs: list of phenotype specifications from the build_phenotype method
+				of neat_python.Genome or nsga_python.NSGAGenome, one per network:
+					num_inp,num_hid,num_out,c_src,c_trg,c_wts,wt_range,out_range
+		"""
+		self.num_nets = len(phenotype_specs)
+		self.num_inp = [int(p[0]) for p in phenotype_specs]
+		self.num_out = [int(p[2]) for p in phenotype_specs]
+
+		for p in phenotype_specs:
+			if len(p[3]) != len(p[4]) or len(p[3]) != len(p[5]):
+				raise ValueError("c_src, c_trg, and c_wts not equal length!")
+
+		num_neurons = [int(n) for p in phenotype_specs for n in p[:3]]
+		c_cnt = [len(p[3]) for p in phenotype_specs]
+		c_src = [int(i) for p in phenotype_specs for i in p[3]]
+		c_trg = [int(i) for p in phenotype_specs for i in p[4]]
+		c_wts = [float(w) for p in phenotype_specs for w in p[5]]
+		out_ranges = [float(r) for p in phenotype_specs for r in p[7]]
+
+		self.pop = ffi.gc(libann.new_PopulationANN(self.num_nets, ffi.new("int[]", num_neurons),
+			ffi.new("int[]", c_cnt), ffi.new("int[]", c_src), ffi.new("int[]", c_trg),
+			ffi.new("double[]", c_wts), ffi.new("double[]", out_ranges)), libann.delete_PopulationANN)
+
+		# Packed output buffer and where each network's outputs start in it.
+		self.outputs = numpy.empty(sum(self.num_out))
+		self.output_splits = numpy.cumsum(self.num_out)[:-1]
+
+	def reset(self):
+		""" Clear the state of every network. """
+		libann.reset_PopulationANN(self.pop)
+
+	def activate(self,inputs,activations=1):
+		""" Activate every network on its own inputs.
+
+		Args:
+			inputs: list with the inputs of each network, or a num_nets x num_inp array
+			activations: number of activations of each network
+		Returns:
+			a list containing the output array of each network, valid after later calls
+		"""
+		if self.num_nets == 0:
+			return []
+
+		inputs = numpy.ascontiguousarray(numpy.hstack(inputs), dtype=numpy.float64)
+		if inputs.shape[0] != sum(self.num_inp):
+			raise ValueError("Expected "+str(sum(self.num_inp))+" inputs, got "+str(inputs.shape[0]))
+
+		libann.activate_PopulationANN(self.pop, ffi.from_buffer("double[]", inputs), 
+			ffi.from_buffer("double[]", self.outputs, require_writable=True), activations)
+
+		# Split a copy so the arrays handed out are not overwritten by the next call.
+		return numpy.split(self.outputs.copy(), self.output_splits)
@@ -7,6 +7,8 @@
 #include <iostream>
 #include <fstream>
 #include <cmath>
+#include <cstdlib>
+#include <cstring>
 
 // User defined libraries
 #include "ann.h"
@@ -48,13 +50,15 @@ static inline double sigmoid_AF(double x) {
 //      if c_trg.size() != c_wts.size() then error
 //      if c_src.size() == 0 then no connections are added
 //      if c_src.size > 0 then create a connection for each c_src/trg pair
+// - layout : AOS_LAYOUT (default) or CSR_LAYOUT to activate from flat arrays
+//      of the connections sorted by target neuron
 // 
 // Return
 // - ann : pointer to an allocated ANN object (must be deleted by user);
 //   NULL if failure
 //      
 ANN::ANN(std::vector<int> &num_neurons, std::vector<int> &c_src, std::vector<int> &c_trg,
-    std::vector<double> &c_wts)
+    std::vector<double> &c_wts, ConnectionLayout layout)
 {
     // 
     // Check input arguments
@@ -86,6 +90,10 @@ ANN::ANN(std::vector<int> &num_neurons, std::vector<int> &c_src, std::vector<int
 
     this->total_num_connections = c_src.size();
 
+    this->output_low = 0;
+    this->output_range = 1;
+    this->layout = layout;
+
     // 
     // Allocate space for, and create neurons
     // 
@@ -110,8 +118,8 @@ ANN::ANN(std::vector<int> &num_neurons, std::vector<int> &c_src, std::vector<int
         for (int c = 0; c < this->total_num_connections; ++c) {
             
             // Check connection indices
-            if (c_src[c] < 0 || c_src[c] > this->total_num_neurons ||
-                c_trg[c] < 0 || c_trg[c] > this->total_num_neurons) 
+            if (c_src[c] < 0 || c_src[c] >= this->total_num_neurons ||
+                c_trg[c] < 0 || c_trg[c] >= this->total_num_neurons) 
             {
                 std::cerr << "ANN: Neuron index out-of-bounds.";
                 std::cerr << std::endl;
@@ -122,8 +130,16 @@ ANN::ANN(std::vector<int> &num_neurons, std::vector<int> &c_src, std::vector<int
             this->connections.push_back(Connection(c_src[c], c_trg[c], c_wts[c]));
         }
     }
+
+    if (this->layout == CSR_LAYOUT) {
+        this->compileCSR();
+    }
 }
 ANN_C* new_ANN(int *num_neurons, int *c_src, int *c_trg, double *c_wts, int c_cnt)
+{
+    return new_ANN_Layout(num_neurons, c_src, c_trg, c_wts, c_cnt, AOS_LAYOUT);
+}
+ANN_C* new_ANN_Layout(int *num_neurons, int *c_src, int *c_trg, double *c_wts, int c_cnt, int layout)
 {
     std::vector<int> num(num_neurons, num_neurons + NUM_NEURON_TYPE);
     std::vector<int> src;
@@ -134,7 +150,8 @@ ANN_C* new_ANN(int *num_neurons, int *c_src, int *c_trg, double *c_wts, int c_cn
         trg.assign(c_trg, c_trg + c_cnt);
         wts.assign(c_wts, c_wts + c_cnt);
     }
-    ANN_C *new_ann = static_cast<ANN_C*>(new ANN(num, src, trg, wts));    
+    ANN_C *new_ann = static_cast<ANN_C*>(new ANN(num, src, trg, wts, 
+        static_cast<ConnectionLayout>(layout)));
     return new_ann;
 }
 
@@ -149,7 +166,10 @@ ANN_C* new_ANN(int *num_neurons, int *c_src, int *c_trg, double *c_wts, int c_cn
 // - ann : pointer to an allocated ANN object (must be deleted by user);
 //   NULL if failure
 //      
-ANN::ANN(const char *fname)
+ANN::ANN(const char *fname) :
+    output_low(0),
+    output_range(1),
+    layout(AOS_LAYOUT)
 {
     this->deserialize(fname);
 }
@@ -212,6 +232,10 @@ void ANN::fullyConnectFF()
             this->connections.push_back(Connection(h, o, 0));
         }
     }
+
+    if (this->layout == CSR_LAYOUT) {
+        this->compileCSR();
+    }
 }
 void fullyConnectFF_ANN(ANN_C *net)
 {
@@ -244,6 +268,9 @@ int ANN::randomizeW(double min, double max)
         double new_w = (max - min) * (double)rand() / (double)RAND_MAX + min;
         this->connections[c].weight = new_w;
     }
+    if (this->layout == CSR_LAYOUT) {
+        this->compileCSR();
+    }
     return 0;
 }
 int ANN::randomizeW()
@@ -333,20 +360,44 @@ int getOutput_ANN(ANN_C *net, double *outputs, int count)
 // 
 void ANN::activate() 
 {
+    if (this->layout == CSR_LAYOUT) {
+        double *outputs = &this->csr_outputs[0];
+        const int *offsets = &this->csr_offsets[0];
+        const int *sources = this->csr_sources.empty() ? 0 : &this->csr_sources[0];
+        const double *weights = this->csr_weights.empty() ? 0 : &this->csr_weights[0];
+
+        for (int n = 0; n < this->num_input; ++n) {
+            outputs[n] = this->neurons[n].output;
+        }
+
+        // 
+        // Gather the weighted outputs of each neuron's sources, then activate
+        // once every sum is taken so all neurons see the previous outputs
+        // 
+        for (int n = this->num_input; n < this->total_num_neurons; ++n) {
+            double sum = 0;
+            for (int c = offsets[n]; c < offsets[n + 1]; ++c) {
+                sum += weights[c] * outputs[sources[c]];
+            }
+            this->neurons[n].input_sum = sum;
+        }
+        for (int n = this->num_input; n < this->total_num_neurons; ++n) {
+            outputs[n] = sigmoid_AF(this->neurons[n].input_sum);
+            this->neurons[n].output = outputs[n];
+            this->neurons[n].input_sum = 0;
+        }
+        return;
+    }
+
     Connection *conn;
-    Neuron *source, *target;
 
     // 
-    // Calculate the data value for each connection and feed to target neuron
+    // Feed the weighted source output of each connection to its target neuron
     // 
     for (int c = 0; c < this->connections.size(); ++c) {
         conn = &this->connections[c];
-        source = &this->neurons[conn->source_neuron_idx];
-        target = &this->neurons[conn->target_neuron_idx];
-
-        conn->data = conn->weight * source->output;
-
-        target->input_sum += conn->data;
+        this->neurons[conn->target_neuron_idx].input_sum += 
+            conn->weight * this->neurons[conn->source_neuron_idx].output;
     }
 
     // 
@@ -364,6 +415,162 @@ void activate_ANN(ANN_C *net)
 }
 
 
+// ------------------------------------ compileCSR ----------------------------
+// --- Build the CSR arrays from the connections
+// 
+// Connections are grouped by target neuron keeping their original order
+// within a target, so the sums match the AOS layout exactly.
+// 
+void ANN::compileCSR()
+{
+    this->csr_offsets.assign(this->total_num_neurons + 1, 0);
+    for (int c = 0; c < this->connections.size(); ++c) {
+        ++this->csr_offsets[this->connections[c].target_neuron_idx + 1];
+    }
+    for (int n = 0; n < this->total_num_neurons; ++n) {
+        this->csr_offsets[n + 1] += this->csr_offsets[n];
+    }
+
+    std::vector<int> next(this->csr_offsets.begin(), this->csr_offsets.end() - 1);
+    this->csr_sources.resize(this->connections.size());
+    this->csr_weights.resize(this->connections.size());
+    for (int c = 0; c < this->connections.size(); ++c) {
+        int i = next[this->connections[c].target_neuron_idx]++;
+        this->csr_sources[i] = this->connections[c].source_neuron_idx;
+        this->csr_weights[i] = this->connections[c].weight;
+    }
+
+    this->csr_outputs.resize(this->total_num_neurons);
+    for (int n = 0; n < this->total_num_neurons; ++n) {
+        this->csr_outputs[n] = this->neurons[n].output;
+    }
+}
+
+
+// ------------------------------------ setOutputRange ------------------------
+// --- Set the range that activateIO scales the outputs to (default 0..1)
+// 
+// Argurments
+// - net  : ANN to update (for C implementation)
+// - low  : output value for a neuron output of 0
+// - high : output value for a neuron output of 1
+// 
+void ANN::setOutputRange(double low, double high)
+{
+    this->output_low = low;
+    this->output_range = high - low;
+}
+void setOutputRange_ANN(ANN_C *net, double low, double high)
+{
+    ANN* a = static_cast<ANN*>(net);
+    a->setOutputRange(low, high);
+}
+
+
+// ------------------------------------ activateIO ----------------------------
+// --- Set the inputs, activate the ANN and write the scaled outputs in one call
+// 
+// Argurments
+// - net     : ANN to activate (for C implementation)
+// - inputs  : array of num_input values
+// - outputs : array of num_output values to fill
+// 
+void ANN::activate(const double *inputs, double *outputs)
+{
+    for (int n = 0; n < this->num_input; ++n) {
+        this->neurons[n].output = inputs[n];
+    }
+
+    this->activate();
+
+    for (int n = 0; n < this->num_output; ++n) {
+        outputs[n] = this->output_low + 
+            this->output_range * this->neurons[this->num_iPLUSh + n].output;
+    }
+}
+void activateIO_ANN(ANN_C *net, double *inputs, double *outputs)
+{
+    ANN* a = static_cast<ANN*>(net);
+    a->activate(inputs, outputs);
+}
+
+
+// ------------------------------------ reset ---------------------------------
+// --- Clear the outputs and input sums of all neurons
+// 
+// Argurments
+// - net : ANN to reset (for C implementation)
+// 
+void ANN::reset()
+{
+    for (int n = 0; n < this->total_num_neurons; ++n) {
+        this->neurons[n].output = 0;
+        this->neurons[n].input_sum = 0;
+    }
+    if (this->layout == CSR_LAYOUT) {
+        this->csr_outputs.assign(this->total_num_neurons, 0);
+    }
+}
+void reset_ANN(ANN_C *net)
+{
+    ANN* a = static_cast<ANN*>(net);
+    a->reset();
+}
+
+
+// ------------------------------------ activateBatch -------------------------
+// --- Activate the ANN on each row of an input matrix in one call
+// 
+// Without reset the rows are a sequence, exactly as calling activateIO once 
+// per row.  With reset each row is an independent sample: the neuron state is
+// cleared and the network activated the given number of times so the inputs
+// can propagate through the hidden layers.
+// 
+// Argurments
+// - net         : ANN to activate (for C implementation)
+// - inputs      : row-major n_samples x num_input matrix
+// - n_samples   : number of rows
+// - outputs     : row-major n_samples x num_output matrix to fill (scaled)
+// - activations : activations per sample
+// - reset       : clear the neuron state before each sample
+// 
+void ANN::activateBatch(const double *inputs, int n_samples, double *outputs, 
+    int activations, bool reset)
+{
+    for (int s = 0; s < n_samples; ++s) {
+        const double *in = inputs + s * this->num_input;
+        double *out = outputs + s * this->num_output;
+
+        if (reset) {
+            this->reset();
+        }
+
+        for (int n = 0; n < this->num_input; ++n) {
+            this->neurons[n].output = in[n];
+        }
+
+        for (int a = 0; a < activations; ++a) {
+            this->activate();
+        }
+
+        for (int n = 0; n < this->num_output; ++n) {
+            out[n] = this->output_low + 
+                this->output_range * this->neurons[this->num_iPLUSh + n].output;
+        }
+    }
+}
+void activateBatch_ANN(ANN_C *net, double *inputs, int n_samples, double *outputs)
+{
+    ANN* a = static_cast<ANN*>(net);
+    a->activateBatch(inputs, n_samples, outputs, 1, false);
+}
+void activateBatchReset_ANN(ANN_C *net, double *inputs, int n_samples, double *outputs, int activations)
+{
+    ANN* a = static_cast<ANN*>(net);
+    a->activateBatch(inputs, n_samples, outputs, activations, true);
+}
+
+
 // ------------------------------------ serialize -----------------------------
 // --- Write the ANN to a file (not precise)
 // 
@@ -473,6 +680,10 @@ int ANN::deserialize(const char *in_fname)
     }
     
     in_file.close();
+
+    if (this->layout == CSR_LAYOUT) {
+        this->compileCSR();
+    }
     return 0;
 }
 int deserialize_ANN(ANN_C *net, const char *in_fname)
@@ -483,6 +694,168 @@ int deserialize_ANN(ANN_C *net, const char *in_fname)
 
 
 
+// ------------------------------------ serializeBinary -----------------------
+// --- Write the ANN to a binary file (exact weights, see ann.h for the layout)
+// 
+// Argurments
+// - net       : ANN to write (for C implementation)
+// - out_fname : name of the output file
+// 
+// Return
+// - error = (failure) ? -1 : 0
+// 
+int ANN::serializeBinary(const char *out_fname)
+{
+    std::ofstream out_file(out_fname, std::ios::binary);
+    if (!out_file.is_open()) {
+        std::cerr << "ANN: the file could not be created: ";
+        std::cerr << out_fname << std::endl;
+        return -1;
+    }
+
+    ANNBinaryHeader header;
+    std::memcpy(header.magic, ANN_BINARY_MAGIC, 4);
+    header.version = ANN_BINARY_VERSION;
+    header.num_input = this->num_input;
+    header.num_hidden = this->num_hidden;
+    header.num_output = this->num_output;
+    header.num_connections = this->connections.size();
+    header.output_low = this->output_low;
+    header.output_high = this->output_low + this->output_range;
+    out_file.write(reinterpret_cast<const char*>(&header), sizeof(header));
+
+    // 
+    // --- Write the node table padded to 8 bytes
+    // 
+    std::vector<int> types(this->total_num_neurons + this->total_num_neurons % 2, 0);
+    for (int n = 0; n < this->total_num_neurons; ++n) {
+        types[n] = static_cast<int>(this->neurons[n].type);
+    }
+    if (!types.empty()) {
+        out_file.write(reinterpret_cast<const char*>(&types[0]), types.size() * sizeof(int));
+    }
+
+    // 
+    // --- Write the packed connection records
+    // 
+    std::vector<ANNBinaryConnection> records(this->connections.size());
+    for (int c = 0; c < this->connections.size(); ++c) {
+        records[c].source = this->connections[c].source_neuron_idx;
+        records[c].target = this->connections[c].target_neuron_idx;
+        records[c].weight = this->connections[c].weight;
+    }
+    if (!records.empty()) {
+        out_file.write(reinterpret_cast<const char*>(&records[0]), 
+            records.size() * sizeof(ANNBinaryConnection));
+    }
+
+    out_file.close();
+    return 0;
+}
+int serializeBinary_ANN(ANN_C *net, const char *out_fname)
+{
+    ANN* a = static_cast<ANN*>(net);
+    return a->serializeBinary(out_fname);
+}
+
+
+
+// ------------------------------------ deserializeBinary ---------------------
+// --- Read an ANN from a binary file
+// 
+// Argurments
+// - net      : ANN to set (for C implementation)
+// - in_fname : name of the input file
+// 
+// Return
+// - error = (failure) ? -1 : 0
+// 
+int ANN::deserializeBinary(const char *in_fname)
+{
+    std::ifstream in_file(in_fname, std::ios::binary);
+    if (!in_file.is_open()) {
+        std::cerr << "ANN: the file could not be opened: ";
+        std::cerr << in_fname << std::endl;
+        return -1;
+    }
+
+    ANNBinaryHeader header;
+    in_file.read(reinterpret_cast<char*>(&header), sizeof(header));
+    if (!in_file || std::memcmp(header.magic, ANN_BINARY_MAGIC, 4) != 0 || 
+        header.version != ANN_BINARY_VERSION) 
+    {
+        std::cerr << "ANN: not a binary ANN file: " << in_fname << std::endl;
+        return -1;
+    }
+
+    this->num_input = header.num_input;
+    this->num_hidden = header.num_hidden;
+    this->num_output = header.num_output;
+    this->num_iPLUSh = this->num_input + this->num_hidden;
+    this->total_num_neurons = this->num_iPLUSh + this->num_output;
+    this->total_num_connections = header.num_connections;
+    this->setOutputRange(header.output_low, header.output_high);
+
+    // 
+    // --- Read the node table
+    // 
+    std::vector<int> types(this->total_num_neurons + this->total_num_neurons % 2, 0);
+    if (!types.empty()) {
+        in_file.read(reinterpret_cast<char*>(&types[0]), types.size() * sizeof(int));
+    }
+    this->neurons.clear();
+    this->neurons.reserve(this->total_num_neurons);
+    for (int n = 0; n < this->total_num_neurons; ++n) {
+        this->neurons.push_back(Neuron(static_cast<NeuronType>(types[n])));
+    }
+
+    // 
+    // --- Read the connection records
+    // 
+    std::vector<ANNBinaryConnection> records(header.num_connections);
+    if (!records.empty()) {
+        in_file.read(reinterpret_cast<char*>(&records[0]), 
+            records.size() * sizeof(ANNBinaryConnection));
+    }
+    if (!in_file) {
+        std::cerr << "ANN: binary ANN file is truncated: " << in_fname << std::endl;
+        return -1;
+    }
+    this->connections.clear();
+    this->connections.reserve(records.size());
+    for (int c = 0; c < records.size(); ++c) {
+        this->connections.push_back(Connection(records[c].source, records[c].target, 
+            records[c].weight));
+    }
+
+    in_file.close();
+
+    if (this->layout == CSR_LAYOUT) {
+        this->compileCSR();
+    }
+    return 0;
+}
+int deserializeBinary_ANN(ANN_C *net, const char *in_fname)
+{
+    ANN* a = static_cast<ANN*>(net);
+    return a->deserializeBinary(in_fname);
+}
+ANN_C* new_ANN_FromBinaryFile(const char *fname)
+{
+    std::vector<int> num(3, 0);
+    std::vector<int> src;
+    std::vector<int> trg;
+    std::vector<double> wts;
+    ANN *a = new ANN(num, src, trg, wts);
+    if (a->deserializeBinary(fname) != 0) {
+        delete a;
+        return NULL;
+    }
+    return static_cast<ANN_C*>(a);
+}
+
+
+
 // ------------------------------------ stream --------------------------------
 // --- Write ANN information to the given stream
 // 
@@ -519,4 +892,182 @@ void print_ANN(ANN_C *net)
 
 
 
+// ----------------------------------------------------------------------------
+// --- PopulationANN
+// ----------------------------------------------------------------------------
+
+// ------------------------------------ new -----------------------------------
+// Pack the networks of a population into shared arrays
+// 
+// Arguments
+// - num_nets    : number of networks
+// - num_neurons : num_nets x 3 matrix of num_input, num_hidden, num_output
+// - c_cnt       : number of connections of each network
+// - c_src, c_trg, c_wts : connections of all networks one after the other, 
+//      with neuron indices local to their network
+// - out_ranges  : num_nets x 2 matrix of the low and high output values
+// 
+// Return
+// - pop : pointer to an allocated PopulationANN object (must be deleted by user)
+// 
+PopulationANN::PopulationANN(int num_nets, int *num_neurons, int *c_cnt, int *c_src, 
+    int *c_trg, double *c_wts, double *out_ranges) :
+    num_nets(num_nets)
+{
+    this->num_input.resize(num_nets);
+    this->num_output.resize(num_nets);
+    this->neuron_start.resize(num_nets + 1);
+    this->input_start.resize(num_nets);
+    this->output_start.resize(num_nets);
+    this->output_low.resize(num_nets);
+    this->output_range.resize(num_nets);
+
+    // 
+    // Lay out the neurons, inputs and outputs of each network
+    // 
+    int total_neurons = 0, total_inputs = 0, total_outputs = 0, total_conns = 0;
+    for (int k = 0; k < num_nets; ++k) {
+        this->num_input[k] = num_neurons[3*k];
+        this->num_output[k] = num_neurons[3*k + 2];
+        this->neuron_start[k] = total_neurons;
+        this->input_start[k] = total_inputs;
+        this->output_start[k] = total_outputs;
+        this->output_low[k] = out_ranges[2*k];
+        this->output_range[k] = out_ranges[2*k + 1] - out_ranges[2*k];
+
+        total_neurons += num_neurons[3*k] + num_neurons[3*k + 1] + num_neurons[3*k + 2];
+        total_inputs += this->num_input[k];
+        total_outputs += this->num_output[k];
+        total_conns += c_cnt[k];
+    }
+    this->neuron_start[num_nets] = total_neurons;
+
+    // 
+    // Count the incoming connections of each neuron
+    // 
+    this->offsets.assign(total_neurons + 1, 0);
+    for (int k = 0, c = 0; k < num_nets; ++k) {
+        int n_neurons = this->neuron_start[k + 1] - this->neuron_start[k];
+        for (int end = c + c_cnt[k]; c < end; ++c) {
+            if (c_src[c] < 0 || c_src[c] >= n_neurons ||
+                c_trg[c] < 0 || c_trg[c] >= n_neurons) 
+            {
+                std::cerr << "PopulationANN: Neuron index out-of-bounds in network ";
+                std::cerr << k << "." << std::endl;
+                exit(EXIT_FAILURE);
+            }
+            ++this->offsets[this->neuron_start[k] + c_trg[c] + 1];
+        }
+    }
+    for (int n = 0; n < total_neurons; ++n) {
+        this->offsets[n + 1] += this->offsets[n];
+    }
+
+    // 
+    // Fill the connections grouped by target, keeping their order
+    // 
+    std::vector<int> next(this->offsets.begin(), this->offsets.end() - 1);
+    this->sources.resize(total_conns);
+    this->weights.resize(total_conns);
+    for (int k = 0, c = 0; k < num_nets; ++k) {
+        for (int end = c + c_cnt[k]; c < end; ++c) {
+            int i = next[this->neuron_start[k] + c_trg[c]]++;
+            this->sources[i] = this->neuron_start[k] + c_src[c];
+            this->weights[i] = c_wts[c];
+        }
+    }
+
+    this->outputs.assign(total_neurons, 0);
+    this->sums.assign(total_neurons, 0);
+}
+POPANN_C* new_PopulationANN(int num_nets, int *num_neurons, int *c_cnt, int *c_src, int *c_trg, double *c_wts, double *out_ranges)
+{
+    return static_cast<POPANN_C*>(new PopulationANN(num_nets, num_neurons, c_cnt, 
+        c_src, c_trg, c_wts, out_ranges));
+}
+
+
+// ------------------------------------ delete --------------------------------
+// --- Free any allocated memory
+// 
+PopulationANN::~PopulationANN()
+{
+}
+void delete_PopulationANN(POPANN_C *pop)
+{
+    delete static_cast<PopulationANN*>(pop);
+}
+
+
+// ------------------------------------ reset ---------------------------------
+// --- Clear the neuron state of every network
+// 
+void PopulationANN::reset()
+{
+    this->outputs.assign(this->outputs.size(), 0);
+    this->sums.assign(this->sums.size(), 0);
+}
+void reset_PopulationANN(POPANN_C *pop)
+{
+    static_cast<PopulationANN*>(pop)->reset();
+}
+
+
+// ------------------------------------ activate ------------------------------
+// --- Activate every network on its own inputs
+// 
+// Networks are independent, so with OpenMP enabled at build time they are
+// activated in parallel.
+// 
+// Argurments
+// - pop         : population to activate (for C implementation)
+// - inputs      : inputs of all networks one after the other
+// - outputs     : array to fill with the scaled outputs of all networks
+// - activations : number of activations of each network
+// 
+void PopulationANN::activateNet(int k, const double *inputs, double *outputs, int activations)
+{
+    double *out = &this->outputs[0];
+    double *sum = &this->sums[0];
+    const int *offsets = &this->offsets[0];
+    const int *sources = this->sources.empty() ? 0 : &this->sources[0];
+    const double *weights = this->weights.empty() ? 0 : &this->weights[0];
+
+    int first = this->neuron_start[k];
+    int first_active = first + this->num_input[k];
+    int last = this->neuron_start[k + 1];
+
+    for (int n = 0; n < this->num_input[k]; ++n) {
+        out[first + n] = inputs[this->input_start[k] + n];
+    }
+
+    for (int a = 0; a < activations; ++a) {
+        for (int n = first_active; n < last; ++n) {
+            double s = 0;
+            for (int c = offsets[n]; c < offsets[n + 1]; ++c) {
+                s += weights[c] * out[sources[c]];
+            }
+            sum[n] = s;
+        }
+        for (int n = first_active; n < last; ++n) {
+            out[n] = sigmoid_AF(sum[n]);
+        }
+    }
 
+    int first_output = last - this->num_output[k];
+    for (int n = 0; n < this->num_output[k]; ++n) {
+        outputs[this->output_start[k] + n] = this->output_low[k] + 
+            this->output_range[k] * out[first_output + n];
+    }
+}
+void PopulationANN::activate(const double *inputs, double *outputs, int activations)
+{
+    #pragma omp parallel for schedule(dynamic)
+    for (int k = 0; k < this->num_nets; ++k) {
+        this->activateNet(k, inputs, outputs, activations);
+    }
+}
+void activate_PopulationANN(POPANN_C *pop, double *inputs, double *outputs, int activations)
+{
+    static_cast<PopulationANN*>(pop)->activate(inputs, outputs, activations);
+}
@@ -2,6 +2,7 @@
 #ifndef ANN_H
 #define ANN_H
 
+#include <ostream>
 #include <vector>
 
 
@@ -61,7 +62,6 @@ public:
 
     // connection data
     double weight;
-    double data;
 
 public:
 
@@ -69,8 +69,7 @@ public:
     Connection(int source, int target, double w) : 
         source_neuron_idx(source),
         target_neuron_idx(target),
-        weight(w), 
-        data(0)
+        weight(w)
     {
     }
 
@@ -78,6 +77,53 @@ public:
 
 
 
+// ----------------------------------------------------------------------------
+// 
+// --- Binary file format for an ANN
+// 
+// header      : ANNBinaryHeader (40 bytes)
+// node table  : int32 NeuronType per neuron, padded to a multiple of 8 bytes
+// connections : ANNBinaryConnection per connection (16 bytes)
+// 
+// All records are fixed size and 8 byte aligned so the file can be mapped
+// into memory and read in place (see python/ann_binary.py).
+// 
+#define ANN_BINARY_MAGIC "ANNB"
+#define ANN_BINARY_VERSION 1
+
+struct ANNBinaryHeader
+{
+    char magic[4];
+    int version;
+    int num_input;
+    int num_hidden;
+    int num_output;
+    int num_connections;
+    double output_low;
+    double output_high;
+};
+
+struct ANNBinaryConnection
+{
+    int source;
+    int target;
+    double weight;
+};
+
+
+
+// ----------------------------------------------------------------------------
+// 
+// --- Memory layout used to activate the connections
+// 
+typedef enum ConnectionLayout_E
+{
+    AOS_LAYOUT,     // vector of Connection structs
+    CSR_LAYOUT      // connections grouped by target in flat arrays
+} ConnectionLayout;
+
+
+
 // ----------------------------------------------------------------------------
 // 
 // --- An artificial neural network data structure for holding all of the
@@ -107,6 +153,22 @@ public:
     // Vector of connections
     std::vector<Connection> connections;
 
+    // Outputs are scaled to output_low..(output_low+output_range)
+    double output_low;
+    double output_range;
+
+    // Layout used by activate
+    ConnectionLayout layout;
+
+    // Compressed sparse row copy of the connections (CSR_LAYOUT only)
+    //      incoming connections of neuron n : csr_offsets[n]..(csr_offsets[n+1]-1)
+    std::vector<int> csr_offsets;
+    std::vector<int> csr_sources;
+    std::vector<double> csr_weights;
+
+    // Flat neuron outputs read by the CSR activation
+    std::vector<double> csr_outputs;
+
 public:
 
     // 
@@ -114,7 +176,7 @@ public:
     // 
     
     ANN(std::vector<int> &num_neurons, std::vector<int> &c_src, std::vector<int> &c_trg, 
-        std::vector<double> &c_wts);
+        std::vector<double> &c_wts, ConnectionLayout layout = AOS_LAYOUT);
     ANN(const char *fname);
     ~ANN();
 
@@ -142,11 +204,29 @@ public:
     // Activate the network
     void activate();
 
+    // Rebuild the CSR arrays after the connections change
+    void compileCSR();
+
+    // Set the range the outputs are scaled to
+    void setOutputRange(double low, double high);
+
+    // Set inputs, activate and write the scaled outputs
+    void activate(const double *inputs, double *outputs);
+
+    // Clear the neuron state
+    void reset();
+
+    // Activate on each row of an n_samples x num_input matrix
+    void activateBatch(const double *inputs, int n_samples, double *outputs, 
+        int activations, bool reset);
+
     // 
     // --- Save/Load an ANN
     // 
     int serialize(const char *out_fname);
     int deserialize(const char *in_fname);
+    int serializeBinary(const char *out_fname);
+    int deserializeBinary(const char *in_fname);
 
     // 
     // --- ANN data printing
@@ -156,6 +236,66 @@ public:
 };
 
 
+// ----------------------------------------------------------------------------
+// 
+// --- The networks of a whole population packed into shared contiguous arrays
+// 
+// Each network keeps the ANN neuron ordering (input, hidden, output) inside a
+// global range of neuron indices and its connections are stored in CSR form
+// with global source indices, so every network is activated exactly like an
+// ANN with CSR_LAYOUT.
+// 
+
+class PopulationANN
+{
+public:
+
+    // Number of networks
+    int num_nets;
+
+    // Per network sizes and offsets into the shared arrays
+    std::vector<int> num_input;
+    std::vector<int> num_output;
+    std::vector<int> neuron_start;  // first global neuron (num_nets+1 entries)
+    std::vector<int> input_start;   // first value in the packed inputs
+    std::vector<int> output_start;  // first value in the packed outputs
+    std::vector<double> output_low;
+    std::vector<double> output_range;
+
+    // Incoming connections of global neuron n : offsets[n]..(offsets[n+1]-1)
+    std::vector<int> offsets;
+    std::vector<int> sources;
+    std::vector<double> weights;
+
+    // Neuron state
+    std::vector<double> outputs;
+    std::vector<double> sums;
+
+public:
+
+    // 
+    // --- Constructors and destructor
+    // 
+
+    PopulationANN(int num_nets, int *num_neurons, int *c_cnt, int *c_src, int *c_trg, 
+        double *c_wts, double *out_ranges);
+    ~PopulationANN();
+
+    // 
+    // --- Interact with the networks
+    // 
+
+    // Clear the neuron state of every network
+    void reset();
+
+    // Activate every network on its inputs and write its scaled outputs
+    void activate(const double *inputs, double *outputs, int activations);
+
+    // Activate a single network
+    void activateNet(int k, const double *inputs, double *outputs, int activations);
+};
+
+
 // ----------------------------------------------------------------------------
 // 
 // --- C interface
@@ -170,6 +310,7 @@ extern "C"
     typedef void ANN_C;
 
     ANN_C* new_ANN(int *num_neurons, int *c_src, int *c_trg, double *c_wts, int c_cnt);
+    ANN_C* new_ANN_Layout(int *num_neurons, int *c_src, int *c_trg, double *c_wts, int c_cnt, int layout);
     ANN_C* new_ANN_FromFile(const char *fname);
     void delete_ANN(ANN_C *net);
 
@@ -183,11 +324,36 @@ extern "C"
 
     void activate_ANN(ANN_C *net);
 
+    void setOutputRange_ANN(ANN_C *net, double low, double high);
+
+    void activateIO_ANN(ANN_C *net, double *inputs, double *outputs);
+
+    void reset_ANN(ANN_C *net);
+
+    void activateBatch_ANN(ANN_C *net, double *inputs, int n_samples, double *outputs);
+
+    void activateBatchReset_ANN(ANN_C *net, double *inputs, int n_samples, double *outputs, int activations);
+
     int serialize_ANN(ANN_C *net, const char *out_fname);
 
     int deserialize_ANN(ANN_C *net, const char *in_fname);
 
+    ANN_C* new_ANN_FromBinaryFile(const char *fname);
+
+    int serializeBinary_ANN(ANN_C *net, const char *out_fname);
+
+    int deserializeBinary_ANN(ANN_C *net, const char *in_fname);
+
     void print_ANN(ANN_C *net);
+
+    typedef void POPANN_C;
+
+    POPANN_C* new_PopulationANN(int num_nets, int *num_neurons, int *c_cnt, int *c_src, int *c_trg, double *c_wts, double *out_ranges);
+    void delete_PopulationANN(POPANN_C *pop);
+
+    void reset_PopulationANN(POPANN_C *pop);
+
+    void activate_PopulationANN(POPANN_C *pop, double *inputs, double *outputs, int activations);
 }
 
 
@@ -1,5 +1,7 @@
+import atexit
 import multiprocessing as mpc
 import time
+import weakref
 from _MultiNEAT import *  # noqa
 
 
@@ -79,38 +81,145 @@ def EvaluateGenomeList_Serial(genome_list, evaluator):
     return (fitnesses, elapsed)
 
 
-# Evaluates all genomes in parallel manner (many processes) and returns a
-# list of corresponding fitness values and the time it took  evaluator is
-# a callable that is supposed to take Genome as argument and return a double
-def EvaluateGenomeList_Parallel(genome_list, evaluator, cores):
-    fitnesses = []
-    pool = mpc.Pool(processes=cores)
-    curtime = time.time()
+# Worker side of ParallelEvaluator.  The evaluator is installed once per worker
+# process so tasks only carry the genome (or its phenotype buffer) and its
+# index.
+_worker_evaluator = None
+_worker_phenotype_only = False
+
+
+def _InitWorker(evaluator, phenotype_only, initializer, initargs):
+    global _worker_evaluator, _worker_phenotype_only
+    _worker_evaluator = evaluator
+    _worker_phenotype_only = phenotype_only
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _EvaluateIndexed(task):
+    index, genome = task
+    if _worker_phenotype_only:
+        # Rebuild the network from the buffer made by Genome.BuildPhenotypeBuffer
+        net = NeuralNetwork()
+        if not net.FromBuffer(genome):
+            raise ValueError('Invalid phenotype buffer for genome %d' % index)
+        return index, _worker_evaluator(net)
+    return index, _worker_evaluator(genome)
+
+
+# Evaluates genome lists in parallel with a pool of worker processes that is
+# kept alive between calls (i.e. between generations).  evaluator is a
+# callable that takes a Genome and returns a double.  initializer(*initargs)
+# runs once in every worker when the pool starts, so expensive per-worker
+# state (an ODE world, a loaded library) can be set up there and reused by
+# every evaluation in that worker.  Call Close() (or use it in a with
+# statement) to shut the workers down; evaluators still open are closed at
+# exit.  The evaluator is sent to the workers once, when the pool starts, so
+# later changes to its state (or to module globals it reads) in the parent
+# process are not seen by the workers.
+# With phenotype_only=True the evaluator takes the NeuralNetwork instead of the
+# Genome and only the compact phenotype buffer of each genome is sent to the
+# workers, instead of the pickled genome with all its genes.
+class ParallelEvaluator(object):
+    def __init__(self, evaluator, cores=None, initializer=None, initargs=(),
+                 chunksize=1, phenotype_only=False):
+        self.evaluator = evaluator
+        self.cores = cores
+        self.chunksize = chunksize
+        self.phenotype_only = phenotype_only
+        self.pool = mpc.Pool(processes=cores, initializer=_InitWorker,
+                             initargs=(evaluator, phenotype_only, initializer,
+                                       initargs))
+        _open_evaluators.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.Close()
+        else:
+            self.Terminate()
 
-    if prbar_installed:
-        widg = ['Individuals: ', Counter(),
-                ' of ' + str(len(genome_list)), ' ', ETA(), ' ',
-                AnimatedMarker()]
-        progress = ProgressBar(maxval=len(genome_list), widgets=widg).start()
+    # Returns a list of fitness values in the order of genome_list and the
+    # time it took.  Results arrive in completion order (imap_unordered) and
+    # are put back in place using the index each task is tagged with.
+    def Evaluate(self, genome_list):
+        if self.pool is None:
+            raise RuntimeError('ParallelEvaluator has been closed')
+
+        fitnesses = [None] * len(genome_list)
+        curtime = time.time()
 
-    for i, fitness in enumerate(pool.imap(evaluator, genome_list)):
         if prbar_installed:
-            progress.update(i)
+            widg = ['Individuals: ', Counter(),
+                    ' of ' + str(len(genome_list)), ' ', ETA(), ' ',
+                    AnimatedMarker()]
+            progress = ProgressBar(maxval=len(genome_list), widgets=widg).start()
+
+        if self.phenotype_only:
+            tasks = ((i, g.BuildPhenotypeBuffer())
+                     for i, g in enumerate(genome_list))
         else:
-            print 'Individuals: (%s/%s)' % (i, len(genome_list))
+            tasks = enumerate(genome_list)
+        for i, (index, fitness) in enumerate(self.pool.imap_unordered(
+                _EvaluateIndexed, tasks, self.chunksize)):
+            if prbar_installed:
+                progress.update(i)
+            else:
+                print 'Individuals: (%s/%s)' % (i, len(genome_list))
 
-        if cvnumpy_installed:
-            cv2.waitKey(1)
+            if cvnumpy_installed:
+                cv2.waitKey(1)
 
-        fitnesses.append(fitness)
-    if prbar_installed:
-        progress.finish()
-    elapsed = time.time() - curtime
+            fitnesses[index] = fitness
+        if prbar_installed:
+            progress.finish()
+        elapsed = time.time() - curtime
 
-    print 'seconds elapsed: %s' % elapsed
-    pool.close()
-    pool.join()
-    return (fitnesses, elapsed)
+        print 'seconds elapsed: %s' % elapsed
+        return (fitnesses, elapsed)
+
+    # Lets the workers finish their current tasks and shuts them down.
+    def Close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+            _open_evaluators.discard(self)
+
+    # Stops the workers immediately.
+    def Terminate(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+            _open_evaluators.discard(self)
+
+
+# Evaluators that have not been closed yet, closed at exit.
+_open_evaluators = weakref.WeakSet()
+
+
+def _CloseParallelEvaluators():
+    for pe in list(_open_evaluators):
+        pe.Close()
+
+atexit.register(_CloseParallelEvaluators)
+
+
+# Evaluates all genomes in parallel manner (many processes) and returns a
+# list of corresponding fitness values and the time it took  evaluator is
+# a callable that is supposed to take Genome as argument and return a double
+# A new pool is started and closed on every call, so the workers always see
+# the current evaluator; use a ParallelEvaluator to keep the workers between
+# generations.  With phenotype_only=True evaluator takes the NeuralNetwork
+# built from the genome and only the phenotype is sent to the workers.
+def EvaluateGenomeList_Parallel(genome_list, evaluator, cores,
+                                phenotype_only=False):
+    with ParallelEvaluator(evaluator, cores,
+                           phenotype_only=phenotype_only) as pe:
+        return pe.Evaluate(genome_list)
 
 
 # Just set the fitness values to the genomes
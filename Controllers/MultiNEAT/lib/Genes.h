@@ -114,6 +114,10 @@ private:
 
 public:
 
+    // The genome renumbers the IDs when threaded reproduction
+    // merges new innovations into the population's database
+    friend class Genome;
+
     // Serialization
 	friend class boost::serialization::access;
 	template<class Archive>
@@ -281,6 +285,10 @@ public:
     // The type of activation function the neuron has
     ActivationFunction m_ActFunction;
 
+    // The genome renumbers the IDs when threaded reproduction
+    // merges new innovations into the population's database
+    friend class Genome;
+
     // Serialization
 	friend class boost::serialization::access;
 	template<class Archive>
@@ -317,6 +317,34 @@ unsigned int Genome::GetLastInnovationID() const
     return t_maxid+1;
 }
 
+// Renumbers the neuron IDs and link innovation IDs found in the maps
+void Genome::RemapIDs(const std::map<int, int>& a_NeuronIDs, const std::map<int, int>& a_InnovIDs)
+{
+    std::map<int, int>::const_iterator t_it;
+
+    for(unsigned int i=0; i<NumNeurons(); i++)
+    {
+        t_it = a_NeuronIDs.find(m_NeuronGenes[i].m_ID);
+        if (t_it != a_NeuronIDs.end())
+            m_NeuronGenes[i].m_ID = t_it->second;
+    }
+
+    for(unsigned int i=0; i<NumLinks(); i++)
+    {
+        t_it = a_NeuronIDs.find(m_LinkGenes[i].m_FromNeuronID);
+        if (t_it != a_NeuronIDs.end())
+            m_LinkGenes[i].m_FromNeuronID = t_it->second;
+
+        t_it = a_NeuronIDs.find(m_LinkGenes[i].m_ToNeuronID);
+        if (t_it != a_NeuronIDs.end())
+            m_LinkGenes[i].m_ToNeuronID = t_it->second;
+
+        t_it = a_InnovIDs.find(m_LinkGenes[i].m_InnovationID);
+        if (t_it != a_InnovIDs.end())
+            m_LinkGenes[i].m_InnovationID = t_it->second;
+    }
+}
+
 // Returns true if the specified neuron ID is present in the genome
 bool Genome::HasNeuronID(unsigned int a_ID) const
 {
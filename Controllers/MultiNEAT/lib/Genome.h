@@ -35,6 +35,7 @@
 #include <boost/serialization/vector.hpp>
 
 #include <vector>
+#include <map>
 
 #include "NeuralNetwork.h"
 #include "Substrate.h"
@@ -290,6 +291,10 @@ public:
     // returns the max innovation Id
     unsigned int GetLastInnovationID() const;
 
+    // Renumbers the neuron IDs and link innovation IDs found in the maps
+    // IDs not present in the maps are left unchanged
+    void RemapIDs(const std::map<int, int>& a_NeuronIDs, const std::map<int, int>& a_InnovIDs);
+
     // Sorts the genes of the genome
     // The neurons by IDs and the links by innovation numbers.
     void SortGenes();
@@ -47,6 +47,7 @@ InnovationDatabase::InnovationDatabase()
     m_NextInnovationNum = 1; // innovations start at 1
     m_NextNeuronID = 1;      // neuron IDs start at 1
     m_Innovations.clear();
+    m_Base = NULL;
 }
 
 // Creates an empty database but this time sets the next innov number and neuron ID
@@ -57,6 +58,7 @@ InnovationDatabase::InnovationDatabase(int a_LastInnovationNum, int a_LastNeuron
     m_NextInnovationNum = a_LastInnovationNum;
     m_NextNeuronID = a_LastNeuronID;
     m_Innovations.clear();
+    m_Base = NULL;
 }
 
 
@@ -74,6 +76,7 @@ void InnovationDatabase::Init(int a_LastInnovationNum, int a_LastNeuronID)
 void InnovationDatabase::Init(const Genome& a_Genome)
 {
     m_Innovations.clear();
+    m_Base = NULL;
     for(unsigned int i=0; i<a_Genome.NumLinks(); i++)
     {
         Innovation t_innov( a_Genome.GetLinkByIndex(i).InnovationID(), NEW_LINK, a_Genome.GetLinkByIndex(i).FromNeuronID(), a_Genome.GetLinkByIndex(i).ToNeuronID(), NONE, -1);
@@ -88,6 +91,7 @@ void InnovationDatabase::Init(const Genome& a_Genome)
 void InnovationDatabase::Init(std::ifstream& a_DataFile)
 {
     m_Innovations.clear();
+    m_Base = NULL;
     m_NextInnovationNum = 0;
     m_NextNeuronID = 0;
 
@@ -140,9 +144,9 @@ void InnovationDatabase::Save(FILE *a_file)
     fprintf(a_file, "NextNeuronID: %d\n", m_NextNeuronID);
 
     // Now save all innovations
-    for(unsigned int i=0; i<m_Innovations.size(); i++)
+    for(unsigned int i=0; i<NumInnovations(); i++)
     {
-        fprintf(a_file, "Innovation %d %d %d %d %d %d\n", m_Innovations[i].ID(), static_cast<int>(m_Innovations[i].InnovType()), m_Innovations[i].FromNeuronID(), m_Innovations[i].ToNeuronID(), static_cast<int>(m_Innovations[i].GetNeuronType()), m_Innovations[i].NeuronID());
+        fprintf(a_file, "Innovation %d %d %d %d %d %d\n", Entry(i).ID(), static_cast<int>(Entry(i).InnovType()), Entry(i).FromNeuronID(), Entry(i).ToNeuronID(), static_cast<int>(Entry(i).GetNeuronType()), Entry(i).NeuronID());
     }
     fprintf(a_file, "InnovationDatabaseEnd\n\n");
 }
@@ -159,12 +163,12 @@ int InnovationDatabase::CheckInnovation(int a_In, int a_Out, InnovationType a_Ty
     ASSERT((a_Type == NEW_NEURON) || (a_Type == NEW_LINK));
 
     // search the list for a match
-    for(unsigned int i=0; i < m_Innovations.size(); i++)
+    for(unsigned int i=0; i < NumInnovations(); i++)
     {
-        if ((m_Innovations[i].FromNeuronID() == a_In) && (m_Innovations[i].ToNeuronID() == a_Out) && (m_Innovations[i].InnovType() == a_Type))
+        if ((Entry(i).FromNeuronID() == a_In) && (Entry(i).ToNeuronID() == a_Out) && (Entry(i).InnovType() == a_Type))
         {
             // match found?
-            return m_Innovations[i].ID();
+            return Entry(i).ID();
         }
     }
 
@@ -180,12 +184,12 @@ int InnovationDatabase::CheckLastInnovation(int a_In, int a_Out, InnovationType
     int t_ID = -1;
 
     // search the list for a match
-    for(unsigned int i=0; i < m_Innovations.size(); i++)
+    for(unsigned int i=0; i < NumInnovations(); i++)
     {
-        if ((m_Innovations[i].FromNeuronID() == a_In) && (m_Innovations[i].ToNeuronID() == a_Out) && (m_Innovations[i].InnovType() == a_Type))
+        if ((Entry(i).FromNeuronID() == a_In) && (Entry(i).ToNeuronID() == a_Out) && (Entry(i).InnovType() == a_Type))
         {
             // match found?
-            t_ID = m_Innovations[i].ID();
+            t_ID = Entry(i).ID();
         }
     }
 
@@ -203,9 +207,9 @@ std::vector<int> InnovationDatabase::CheckAllInnovations(int a_In, int a_Out, In
     t_idxs.clear();
 
     // search the list for a match
-    for(unsigned int i=0; i < m_Innovations.size(); i++)
+    for(unsigned int i=0; i < NumInnovations(); i++)
     {
-        if ((m_Innovations[i].FromNeuronID() == a_In) && (m_Innovations[i].ToNeuronID() == a_Out) && (m_Innovations[i].InnovType() == a_Type))
+        if ((Entry(i).FromNeuronID() == a_In) && (Entry(i).ToNeuronID() == a_Out) && (Entry(i).InnovType() == a_Type))
         {
             // match found?
             t_idxs.push_back( i );
@@ -224,12 +228,12 @@ int InnovationDatabase::FindNeuronID(int a_In, int a_Out) const
     ASSERT((a_In > 0) && (a_Out > 0));
 
     // search the list for a match
-    for(unsigned int i=0; i < m_Innovations.size(); i++)
+    for(unsigned int i=0; i < NumInnovations(); i++)
     {
-        if ((m_Innovations[i].FromNeuronID() == a_In) && (m_Innovations[i].ToNeuronID() == a_Out) && (m_Innovations[i].InnovType() == NEW_NEURON))
+        if ((Entry(i).FromNeuronID() == a_In) && (Entry(i).ToNeuronID() == a_Out) && (Entry(i).InnovType() == NEW_NEURON))
         {
             // match found?
-            return m_Innovations[i].NeuronID();
+            return Entry(i).NeuronID();
         }
     }
 
@@ -243,12 +247,12 @@ int InnovationDatabase::FindLastNeuronID(int a_In, int a_Out) const
     int t_ID = -1;
 
     // search the list for a match
-    for(unsigned int i=0; i < m_Innovations.size(); i++)
+    for(unsigned int i=0; i < NumInnovations(); i++)
     {
-        if ((m_Innovations[i].FromNeuronID() == a_In) && (m_Innovations[i].ToNeuronID() == a_Out) && (m_Innovations[i].InnovType() == NEW_NEURON))
+        if ((Entry(i).FromNeuronID() == a_In) && (Entry(i).ToNeuronID() == a_Out) && (Entry(i).InnovType() == NEW_NEURON))
         {
             // match found?
-            t_ID = m_Innovations[i].NeuronID();
+            t_ID = Entry(i).NeuronID();
         }
     }
 
@@ -294,6 +298,84 @@ int InnovationDatabase::AddNeuronInnovation(int a_In, int a_Out, NeuronType a_NT
 void InnovationDatabase::Flush()
 {
     m_Innovations.clear();
+    m_Base = NULL;
+}
+
+
+// Makes this database an empty journal on top of a_Base
+void InnovationDatabase::StartJournal(const InnovationDatabase& a_Base)
+{
+    ASSERT(a_Base.m_Base == NULL);
+
+    m_Innovations.clear();
+    m_Base = &a_Base;
+    m_NextNeuronID = a_Base.m_NextNeuronID;
+    m_NextInnovationNum = a_Base.m_NextInnovationNum;
+}
+
+
+// Merges the innovations recorded in a journal (see StartJournal())
+// The journal entries are replayed in order, so the result depends only on the order of the merges
+void InnovationDatabase::Merge(const InnovationDatabase& a_Journal, unsigned int a_First,
+                               std::map<int, int>& a_NeuronIDs, std::map<int, int>& a_InnovIDs)
+{
+    std::map<int, int>::const_iterator t_it;
+
+    // how many times the journal split each connection so far
+    std::map< std::pair<int, int>, unsigned int > t_splits;
+
+    for(unsigned int i=0; i<a_Journal.m_Innovations.size(); i++)
+    {
+        const Innovation& t_innov = a_Journal.m_Innovations[i];
+
+        // the connected neurons may be new ones from this journal too
+        int t_in = t_innov.FromNeuronID();
+        int t_out = t_innov.ToNeuronID();
+        t_it = a_NeuronIDs.find(t_in);
+        if (t_it != a_NeuronIDs.end())
+            t_in = t_it->second;
+        t_it = a_NeuronIDs.find(t_out);
+        if (t_it != a_NeuronIDs.end())
+            t_out = t_it->second;
+
+        if (t_innov.InnovType() == NEW_NEURON)
+        {
+            // Like Mutate_AddNeuron(), reuse a neuron that split the same connection
+            // and that the genome does not have yet. Babies of other species cannot
+            // have the neurons added in this epoch, so the n-th split of a connection
+            // in the journal takes the n-th neuron merged for it since a_First.
+            unsigned int& t_count = t_splits[std::make_pair(t_in, t_out)];
+            unsigned int t_seen = 0;
+            int t_nid = -1;
+            for(unsigned int j=a_First; j<NumInnovations(); j++)
+            {
+                const Innovation& t_prev = Entry(j);
+                if ((t_prev.FromNeuronID() == t_in) && (t_prev.ToNeuronID() == t_out) && (t_prev.InnovType() == NEW_NEURON))
+                {
+                    if (t_seen == t_count)
+                    {
+                        t_nid = t_prev.NeuronID();
+                        break;
+                    }
+                    t_seen++;
+                }
+            }
+            t_count++;
+
+            if (t_nid == -1)
+                t_nid = AddNeuronInnovation(t_in, t_out, t_innov.GetNeuronType());
+
+            a_NeuronIDs[t_innov.NeuronID()] = t_nid;
+        }
+        else
+        {
+            int t_id = CheckInnovation(t_in, t_out, NEW_LINK);
+            if (t_id == -1)
+                t_id = AddLinkInnovation(t_in, t_out);
+
+            a_InnovIDs[t_innov.ID()] = t_id;
+        }
+    }
 }
 
 
@@ -31,6 +31,7 @@
 ///////////////////////////////////////////////////////////////////////////////
 
 #include <vector>
+#include <map>
 #include <fstream>
 
 #include "Genes.h"
@@ -147,6 +148,21 @@ private:
     int m_NextNeuronID;
     int m_NextInnovationNum;
 
+    // When set, this database is a journal: the base is searched first and
+    // m_Innovations only holds what was added since StartJournal()
+    const InnovationDatabase* m_Base;
+
+    unsigned int NumBaseInnovations() const
+    {
+        return m_Base ? m_Base->NumInnovations() : 0;
+    }
+
+    const Innovation& Entry(unsigned int a_Idx) const
+    {
+        unsigned int t_base = NumBaseInnovations();
+        return (a_Idx < t_base) ? m_Base->m_Innovations[a_Idx] : m_Innovations[a_Idx - t_base];
+    }
+
 public:
 
     ////////////////////////////
@@ -205,9 +221,27 @@ public:
     // Clears all innovations in the database
     void Flush();
 
+    // Makes this database an empty journal on top of a_Base, which must not
+    // change until the journal is merged. New innovations are numbered as
+    // a_Base would number them and only they are stored here.
+    void StartJournal(const InnovationDatabase& a_Base);
+
+    // Merges the innovations recorded by a_Journal (see StartJournal()).
+    // a_First is the size of this database before the first merge of the epoch.
+    // Link innovations already present here are reused, as is a neuron that an
+    // earlier merge added for the same split, everything else gets new numbers.
+    // The maps receive the journal's IDs -> the IDs in this database.
+    void Merge(const InnovationDatabase& a_Journal, unsigned int a_First,
+               std::map<int, int>& a_NeuronIDs, std::map<int, int>& a_InnovIDs);
+
+    unsigned int NumInnovations() const
+    {
+        return NumBaseInnovations() + static_cast<unsigned int>(m_Innovations.size());
+    }
+
     Innovation GetInnovationByIdx(int idx) const
     {
-        return m_Innovations[idx];
+        return Entry(idx);
     };
 
     // Saves the database to an already opened file
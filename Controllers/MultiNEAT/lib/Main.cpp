@@ -5,10 +5,68 @@
  *      Author: peter
  */
 
+#include <Python.h>
+#include <cstdio>
+#include <map>
+
+#include "Genome.h"
+#include "Innovation.h"
+#include "Parameters.h"
+#include "Random.h"
+
+using namespace NEAT;
+
+// Two species that split the same link in their own journals
+// must get the same neuron and link innovation IDs once merged
+static bool TestMergeSameSplit()
+{
+	Parameters t_params;
+	Genome t_seed(0, 2, 0, 1, false, UNSIGNED_SIGMOID, UNSIGNED_SIGMOID, 0, t_params);
+	InnovationDatabase t_innovs;
+	t_innovs.Init(t_seed);
+	unsigned int t_first = t_innovs.NumInnovations();
+
+	Genome t_babies[2] = { t_seed, t_seed };
+	InnovationDatabase t_journals[2];
+	for(unsigned int i=0; i<2; i++)
+	{
+		RNG t_rng;
+		t_rng.Seed(0); // same seed, same link split
+		t_journals[i].StartJournal(t_innovs);
+		if (!t_babies[i].Mutate_AddNeuron(t_journals[i], t_params, t_rng))
+			return false;
+	}
+
+	for(unsigned int i=0; i<2; i++)
+	{
+		std::map<int, int> t_neuron_ids, t_innov_ids;
+		t_innovs.Merge(t_journals[i], t_first, t_neuron_ids, t_innov_ids);
+		t_babies[i].RemapIDs(t_neuron_ids, t_innov_ids);
+		t_babies[i].SortGenes();
+	}
+
+	// one neuron and its two links
+	if (t_innovs.NumInnovations() != t_first + 3)
+		return false;
+	if ((t_babies[0].NumNeurons() != t_babies[1].NumNeurons()) || (t_babies[0].NumLinks() != t_babies[1].NumLinks()))
+		return false;
+	for(unsigned int i=0; i<t_babies[0].NumNeurons(); i++)
+	{
+		if (t_babies[0].GetNeuronByIndex(i).ID() != t_babies[1].GetNeuronByIndex(i).ID())
+			return false;
+	}
+	for(unsigned int i=0; i<t_babies[0].NumLinks(); i++)
+	{
+		if (t_babies[0].GetLinkByIndex(i).InnovationID() != t_babies[1].GetLinkByIndex(i).InnovationID())
+			return false;
+	}
+	return true;
+}
 
 // This is just for testing purposes
 int main()
 {
-	return 0;
+	bool t_ok = TestMergeSameSplit();
+	printf("Merge of the same split: %s\n", t_ok ? "ok" : "FAILED");
+	return t_ok ? 0 : 1;
 }
-
@@ -31,6 +31,8 @@
 
 #include <math.h>
 #include <float.h>
+#include <string.h>
+#include <algorithm>
 #include <fstream>
 #include <sstream>
 #include <string>
@@ -640,6 +642,67 @@ std::vector<double> NeuralNetwork::Output()
 	return t_output;
 }
 
+void NeuralNetwork::ActivateBatchFast(const double* a_Inputs, unsigned int a_NumRows, unsigned int a_NumCols,
+                                      unsigned int a_Activations, bool a_Flush, double* a_Outputs)
+{
+    // like Input_numpy, rows with a different number of values are clipped to fit
+    const unsigned int t_cols = std::min<unsigned int>(a_NumCols, m_num_inputs);
+
+    for (unsigned int r = 0; r < a_NumRows; r++)
+    {
+        if (a_Flush)
+            Flush();
+
+        const double* t_row = a_Inputs + r * a_NumCols;
+        for (unsigned int i = 0; i < t_cols; i++)
+            m_neurons[i].m_activation = t_row[i];
+        for (unsigned int i = t_cols; i < m_num_inputs; i++)
+            m_neurons[i].m_activation = 0;
+
+        for (unsigned int a = 0; a < a_Activations; a++)
+            ActivateFast();
+
+        double* t_out = a_Outputs + r * m_num_outputs;
+        for (unsigned int i = 0; i < m_num_outputs; i++)
+            t_out[i] = m_neurons[i + m_num_inputs].m_activation;
+    }
+}
+
+py::object NeuralNetwork::ActivateBatch_numpy(py::object a_Inputs, unsigned int a_Activations, bool a_Flush)
+{
+    py::object t_numpy = py::import("numpy");
+
+    // a 1D array is a single row of inputs
+    py::object t_inputs = t_numpy.attr("ascontiguousarray")(a_Inputs, "float64");
+    if (py::extract<int>(t_inputs.attr("ndim"))() == 1)
+        t_inputs = t_inputs.attr("reshape")(1, -1);
+    if (py::extract<int>(t_inputs.attr("ndim"))() != 2)
+    {
+        PyErr_SetString(PyExc_ValueError, "ActivateBatch expects a 2D array of inputs");
+        py::throw_error_already_set();
+    }
+
+    const unsigned int t_rows = py::extract<unsigned int>(t_inputs.attr("shape")[0]);
+    const unsigned int t_cols = py::extract<unsigned int>(t_inputs.attr("shape")[1]);
+    py::object t_outputs = t_numpy.attr("empty")(py::make_tuple(t_rows, m_num_outputs), "float64");
+
+    Py_buffer t_in, t_out;
+    if (PyObject_GetBuffer(t_inputs.ptr(), &t_in, PyBUF_C_CONTIGUOUS) != 0)
+        py::throw_error_already_set();
+    if (PyObject_GetBuffer(t_outputs.ptr(), &t_out, PyBUF_C_CONTIGUOUS | PyBUF_WRITABLE) != 0)
+    {
+        PyBuffer_Release(&t_in);
+        py::throw_error_already_set();
+    }
+
+    ActivateBatchFast(static_cast<const double*>(t_in.buf), t_rows, t_cols, a_Activations, a_Flush,
+                      static_cast<double*>(t_out.buf));
+
+    PyBuffer_Release(&t_in);
+    PyBuffer_Release(&t_out);
+    return t_outputs;
+}
+
 void NeuralNetwork::Adapt(Parameters& a_Parameters)
 {
 	// find max absolute magnitude of the weight
@@ -931,4 +994,130 @@ bool NeuralNetwork::Load(const char *a_filename)
     return Load(t_DataFile);
 }
 
+// Layout of the phenotype buffer (native byte order):
+//   int    magic, version, num_inputs, num_outputs, num_neurons, num_connections
+//   int    neuron type[num_neurons], activation function type[num_neurons]
+//   int    connection source[num_connections], target[num_connections], recurrent flag[num_connections]
+//   int    padding to a multiple of 8 bytes
+//   double neuron a[num_neurons], b[num_neurons], time constant[num_neurons], bias[num_neurons], split y[num_neurons]
+//   double connection weight[num_connections], hebb rate[num_connections], hebb pre rate[num_connections]
+#define PHENOTYPE_BUFFER_MAGIC 0x504E4E4D // "MNNP"
+#define PHENOTYPE_BUFFER_VERSION 1
+#define PHENOTYPE_BUFFER_HEADER 6
+
+void NeuralNetwork::SaveBuffer(std::string& a_buffer) const
+{
+    const int t_n = static_cast<int>(m_neurons.size());
+    const int t_c = static_cast<int>(m_connections.size());
+
+    std::vector<int> t_ints;
+    t_ints.reserve(PHENOTYPE_BUFFER_HEADER + 2*t_n + 3*t_c + 1);
+    t_ints.push_back(PHENOTYPE_BUFFER_MAGIC);
+    t_ints.push_back(PHENOTYPE_BUFFER_VERSION);
+    t_ints.push_back(m_num_inputs);
+    t_ints.push_back(m_num_outputs);
+    t_ints.push_back(t_n);
+    t_ints.push_back(t_c);
+    for (int i = 0; i < t_n; i++)
+        t_ints.push_back(static_cast<int>(m_neurons[i].m_type));
+    for (int i = 0; i < t_n; i++)
+        t_ints.push_back(static_cast<int>(m_neurons[i].m_activation_function_type));
+    for (int i = 0; i < t_c; i++)
+        t_ints.push_back(m_connections[i].m_source_neuron_idx);
+    for (int i = 0; i < t_c; i++)
+        t_ints.push_back(m_connections[i].m_target_neuron_idx);
+    for (int i = 0; i < t_c; i++)
+        t_ints.push_back(static_cast<int>(m_connections[i].m_recur_flag));
+    if (t_ints.size() % 2)
+        t_ints.push_back(0);
+
+    std::vector<double> t_doubles;
+    t_doubles.reserve(5*t_n + 3*t_c);
+    for (int i = 0; i < t_n; i++) t_doubles.push_back(m_neurons[i].m_a);
+    for (int i = 0; i < t_n; i++) t_doubles.push_back(m_neurons[i].m_b);
+    for (int i = 0; i < t_n; i++) t_doubles.push_back(m_neurons[i].m_timeconst);
+    for (int i = 0; i < t_n; i++) t_doubles.push_back(m_neurons[i].m_bias);
+    for (int i = 0; i < t_n; i++) t_doubles.push_back(m_neurons[i].m_split_y);
+    for (int i = 0; i < t_c; i++) t_doubles.push_back(m_connections[i].m_weight);
+    for (int i = 0; i < t_c; i++) t_doubles.push_back(m_connections[i].m_hebb_rate);
+    for (int i = 0; i < t_c; i++) t_doubles.push_back(m_connections[i].m_hebb_pre_rate);
+
+    a_buffer.assign(reinterpret_cast<const char*>(&t_ints[0]), t_ints.size() * sizeof(int));
+    if (!t_doubles.empty())
+        a_buffer.append(reinterpret_cast<const char*>(&t_doubles[0]), t_doubles.size() * sizeof(double));
+}
+
+bool NeuralNetwork::LoadBuffer(const std::string& a_buffer)
+{
+    int t_header[PHENOTYPE_BUFFER_HEADER];
+    if (a_buffer.size() < sizeof(t_header))
+        return false;
+    memcpy(t_header, a_buffer.data(), sizeof(t_header));
+    if ((t_header[0] != PHENOTYPE_BUFFER_MAGIC) || (t_header[1] != PHENOTYPE_BUFFER_VERSION))
+        return false;
+
+    // Every neuron and connection takes more than a byte, so counts above the
+    // buffer size are corrupt (and would overflow the size computation below)
+    const int t_n = t_header[4];
+    const int t_c = t_header[5];
+    if ((t_n < 0) || (t_c < 0) ||
+        (static_cast<unsigned int>(t_n) > a_buffer.size()) || (static_cast<unsigned int>(t_c) > a_buffer.size()))
+        return false;
+
+    unsigned int t_num_ints = PHENOTYPE_BUFFER_HEADER + 2*t_n + 3*t_c;
+    t_num_ints += t_num_ints % 2;
+    const unsigned int t_num_doubles = 5*t_n + 3*t_c;
+    if (a_buffer.size() != t_num_ints * sizeof(int) + t_num_doubles * sizeof(double))
+        return false;
+
+    std::vector<int> t_ints(t_num_ints);
+    memcpy(&t_ints[0], a_buffer.data(), t_num_ints * sizeof(int));
+    std::vector<double> t_doubles(t_num_doubles + 1);
+    memcpy(&t_doubles[0], a_buffer.data() + t_num_ints * sizeof(int), t_num_doubles * sizeof(double));
+
+    // Reject connections to neurons that are not in the buffer before using them
+    const int* t_idx = &t_ints[PHENOTYPE_BUFFER_HEADER + 2*t_n];
+    for (int i = 0; i < 2*t_c; i++)
+    {
+        if ((t_idx[i] < 0) || (t_idx[i] >= t_n))
+            return false;
+    }
+
+    Clear();
+    SetInputOutputDimentions(static_cast<unsigned short>(t_header[2]), static_cast<unsigned short>(t_header[3]));
+
+    const int* t_int = &t_ints[PHENOTYPE_BUFFER_HEADER];
+    const double* t_double = &t_doubles[0];
+
+    m_neurons.resize(t_n);
+    for (int i = 0; i < t_n; i++)
+    {
+        Neuron& t_neuron = m_neurons[i];
+        t_neuron.m_type = static_cast<NEAT::NeuronType>(t_int[i]);
+        t_neuron.m_activation_function_type = static_cast<NEAT::ActivationFunction>(t_int[t_n + i]);
+        t_neuron.m_a = t_double[i];
+        t_neuron.m_b = t_double[t_n + i];
+        t_neuron.m_timeconst = t_double[2*t_n + i];
+        t_neuron.m_bias = t_double[3*t_n + i];
+        t_neuron.m_split_y = t_double[4*t_n + i];
+    }
+    t_int += 2*t_n;
+    t_double += 5*t_n;
+
+    m_connections.resize(t_c);
+    for (int i = 0; i < t_c; i++)
+    {
+        Connection& t_connection = m_connections[i];
+        t_connection.m_source_neuron_idx = static_cast<unsigned short>(t_int[i]);
+        t_connection.m_target_neuron_idx = static_cast<unsigned short>(t_int[t_c + i]);
+        t_connection.m_recur_flag = static_cast<bool>(t_int[2*t_c + i]);
+        t_connection.m_weight = t_double[i];
+        t_connection.m_hebb_rate = t_double[t_c + i];
+        t_connection.m_hebb_pre_rate = t_double[2*t_c + i];
+    }
+
+    Flush();
+    return true;
+}
+
 }; // namespace NEAT
@@ -36,6 +36,7 @@
 
 namespace py = boost::python;
 
+#include <string>
 #include <vector>
 #include "Genes.h"
 
@@ -151,6 +152,14 @@ public:
     void Input_numpy(py::numeric::array& a_Inputs);
     std::vector<double> Output();
 
+    // Activates the network once per row of a_Inputs (a_NumRows rows of a_NumCols values)
+    // with a_Activations calls to ActivateFast() and writes each row's outputs to a_Outputs.
+    // If a_Flush is set the network is flushed before every row (independent test cases),
+    // otherwise activations carry over from one row to the next (consecutive timesteps).
+    void ActivateBatchFast(const double* a_Inputs, unsigned int a_NumRows, unsigned int a_NumCols,
+                           unsigned int a_Activations, bool a_Flush, double* a_Outputs);
+    py::object ActivateBatch_numpy(py::object a_Inputs, unsigned int a_Activations, bool a_Flush);
+
     // accessor methods
     void AddNeuron(const Neuron& a_n) { m_neurons.push_back( a_n ); }
     void AddConnection(const Connection& a_c) { m_connections.push_back( a_c ); }
@@ -192,6 +201,11 @@ public:
     // save/load from already opened files for reading/writing
     void Save(FILE* a_file);
     bool Load(std::ifstream& a_DataFile);
+
+    // compact binary phenotype with the neuron and connection fields stored
+    // as flat arrays, used to send networks to evaluation workers
+    void SaveBuffer(std::string& a_buffer) const;
+    bool LoadBuffer(const std::string& a_buffer);
 };
 
 }; // namespace NEAT
@@ -70,6 +70,10 @@ void Parameters::Reset()
     // search quickly, yet less efficient, leave this to true.
     AllowClones = false;
 
+    // Number of threads used by Epoch() to breed the species and to place the
+    // offspring into species. 1 keeps the original serial reproduction.
+    EpochThreads = 1;
+
 
 
 
@@ -419,6 +423,9 @@ int Parameters::Load(std::ifstream& a_DataFile)
             	AllowClones = false;
         }
 
+        if (s == "EpochThreads")
+            a_DataFile >> EpochThreads;
+
         if (s == "YoungAgeTreshold")
             a_DataFile >> YoungAgeTreshold;
 
@@ -749,6 +756,7 @@ void Parameters::Save(FILE* a_fstream)
 	fprintf(a_fstream, "MaxSpecies %d\n", MaxSpecies);
 	fprintf(a_fstream, "InnovationsForever %s\n", InnovationsForever==true?"true":"false");
 	fprintf(a_fstream, "AllowClones %s\n", AllowClones==true?"true":"false");
+	fprintf(a_fstream, "EpochThreads %d\n", EpochThreads);
 	fprintf(a_fstream, "YoungAgeTreshold %d\n", YoungAgeTreshold);
 	fprintf(a_fstream, "YoungAgeFitnessBoost %3.20f\n", YoungAgeFitnessBoost);
 	fprintf(a_fstream, "SpeciesDropoffAge %d\n", SpeciesMaxStagnation);
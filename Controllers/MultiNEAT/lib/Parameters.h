@@ -74,6 +74,14 @@ public:
     // search quickly, yet less efficient, leave this to true.
     bool AllowClones;
 
+    // Number of threads used by Epoch() to breed the species and to place the
+    // offspring into species. 1 keeps the original serial reproduction.
+    // With 2 or more threads every species breeds with its own random stream
+    // seeded from the population's RNG, so the result is the same for a given
+    // seed whatever the number of threads above 1. It is not the same result
+    // as the serial path taken with 1.
+    unsigned int EpochThreads;
+
    ////////////////////////////////
     // GA Parameters
     ////////////////////////////////
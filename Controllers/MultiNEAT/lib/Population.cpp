@@ -32,6 +32,9 @@
 #include <algorithm>
 #include <fstream>
 
+#include <boost/bind.hpp>
+#include <boost/thread.hpp>
+
 #include "Genome.h"
 #include "Species.h"
 #include "Random.h"
@@ -45,6 +48,143 @@
 namespace NEAT
 {
 
+///////////////////////////////////
+// Helpers for the threaded Epoch()
+///////////////////////////////////
+
+// Hands out the indices [0 .. count) to the worker threads one at a time
+class WorkQueue
+{
+    boost::mutex m_Mutex;
+    unsigned int m_Next;
+    unsigned int m_Count;
+
+public:
+    WorkQueue(unsigned int a_Count): m_Next(0), m_Count(a_Count) {}
+
+    bool Take(unsigned int& a_Idx)
+    {
+        boost::mutex::scoped_lock t_lock(m_Mutex);
+        if (m_Next >= m_Count)
+            return false;
+        a_Idx = m_Next++;
+        return true;
+    }
+};
+
+template<class Job> void RunJobs(WorkQueue* a_Queue, Job* a_Job)
+{
+    unsigned int t_idx;
+    while(a_Queue->Take(t_idx))
+        (*a_Job)(t_idx);
+}
+
+// Calls a_Job(i) for every i in [0 .. a_Count) on up to a_Threads threads
+// The jobs must write only their own results, as the order they run in is not fixed
+template<class Job> void ParallelFor(unsigned int a_Count, unsigned int a_Threads, Job& a_Job)
+{
+    if (a_Threads > a_Count)
+        a_Threads = a_Count;
+
+    if (a_Threads <= 1)
+    {
+        for(unsigned int i=0; i<a_Count; i++)
+            a_Job(i);
+        return;
+    }
+
+    WorkQueue t_queue(a_Count);
+    boost::thread_group t_threads;
+    for(unsigned int i=0; i<a_Threads-1; i++)
+        t_threads.create_thread(boost::bind(&RunJobs<Job>, &t_queue, &a_Job));
+
+    // the calling thread works too
+    RunJobs(&t_queue, &a_Job);
+    t_threads.join_all();
+}
+
+// Breeds one species with its own random stream, recording its innovations in a journal
+struct BreedJob
+{
+    Population& m_Pop;
+    const InnovationDatabase& m_Innovs;
+    std::vector<RNG>& m_RNGs;
+    std::vector<InnovationDatabase>& m_Journals;
+    std::vector< std::vector<Genome> >& m_Babies;
+    std::vector< std::vector<bool> >& m_Checked;
+
+    BreedJob(Population& a_Pop, const InnovationDatabase& a_Innovs, std::vector<RNG>& a_RNGs,
+             std::vector<InnovationDatabase>& a_Journals, std::vector< std::vector<Genome> >& a_Babies,
+             std::vector< std::vector<bool> >& a_Checked)
+        : m_Pop(a_Pop), m_Innovs(a_Innovs), m_RNGs(a_RNGs), m_Journals(a_Journals), m_Babies(a_Babies), m_Checked(a_Checked) {}
+
+    void operator()(unsigned int a_Idx)
+    {
+        m_Journals[a_Idx].StartJournal(m_Innovs);
+        m_Pop.m_Species[a_Idx].Breed(m_Pop, m_Pop.m_Parameters, m_RNGs[a_Idx], m_Journals[a_Idx],
+                                     m_Babies[a_Idx], m_Checked[a_Idx]);
+    }
+};
+
+// Tells if a checked baby is a clone of any baby from the species bred before its own
+struct CloneJob
+{
+    std::vector<Genome>& m_Babies;
+    const std::vector<bool>& m_Checked;
+    const std::vector<unsigned int>& m_SpeciesStart;
+    std::vector<bool>& m_Clone;
+    Parameters& m_Parameters;
+
+    CloneJob(std::vector<Genome>& a_Babies, const std::vector<bool>& a_Checked,
+             const std::vector<unsigned int>& a_SpeciesStart, std::vector<bool>& a_Clone, Parameters& a_Parameters)
+        : m_Babies(a_Babies), m_Checked(a_Checked), m_SpeciesStart(a_SpeciesStart), m_Clone(a_Clone), m_Parameters(a_Parameters) {}
+
+    void operator()(unsigned int a_Idx)
+    {
+        if (!m_Checked[a_Idx])
+            return;
+
+        for(unsigned int i=0; i<m_SpeciesStart[a_Idx]; i++)
+        {
+            if (m_Babies[a_Idx].CompatibilityDistance(m_Babies[i], m_Parameters) < 0.00001)
+            {
+                m_Clone[a_Idx] = true;
+                return;
+            }
+        }
+    }
+};
+
+// Finds the first of the representatives [0 .. count) a genome is compatible with
+struct CompatibilityJob
+{
+    std::vector<Genome>& m_Genomes;
+    std::vector<Genome>& m_Reps;
+    unsigned int m_First;
+    unsigned int m_NumReps;
+    std::vector<int>& m_Species;
+    Parameters& m_Parameters;
+
+    CompatibilityJob(std::vector<Genome>& a_Genomes, std::vector<Genome>& a_Reps, unsigned int a_First,
+                     std::vector<int>& a_Species, Parameters& a_Parameters)
+        : m_Genomes(a_Genomes), m_Reps(a_Reps), m_First(a_First), m_NumReps(static_cast<unsigned int>(a_Reps.size())),
+          m_Species(a_Species), m_Parameters(a_Parameters) {}
+
+    void operator()(unsigned int a_Idx)
+    {
+        m_Species[a_Idx] = -1;
+        for(unsigned int j=0; j<m_NumReps; j++)
+        {
+            if (m_Genomes[m_First + a_Idx].IsCompatibleWith(m_Reps[j], m_Parameters))
+            {
+                m_Species[a_Idx] = static_cast<int>(j);
+                return;
+            }
+        }
+    }
+};
+
+
 // The constructor
 Population::Population(const Genome& a_Seed, const Parameters& a_Parameters, bool a_RandomizeWeights, double a_RandomizationRange)
 {
@@ -213,30 +353,37 @@ void Population::Speciate()
 
     // NOTE: we are comparing the new generation's genomes to the representatives from the previous generation!
     // Any new species that is created is assigned a representative from the new generation.
-    for(unsigned int i=0; i<m_Genomes.size(); i++)
+    if (m_Parameters.EpochThreads > 1)
     {
-        t_added = false;
-
-        // iterate through each species and check if compatible. If compatible, then add to the species.
-        // if not compatible, create a new species.
-        for(unsigned int j=0; j<m_Species.size(); j++)
+        PlaceGenomes(m_Genomes, m_Species);
+    }
+    else
+    {
+        for(unsigned int i=0; i<m_Genomes.size(); i++)
         {
-            Genome tmp = m_Species[j].GetRepresentative();
-            if (m_Genomes[i].IsCompatibleWith( tmp, m_Parameters ))
+            t_added = false;
+
+            // iterate through each species and check if compatible. If compatible, then add to the species.
+            // if not compatible, create a new species.
+            for(unsigned int j=0; j<m_Species.size(); j++)
             {
-                // Compatible, add to species
-                m_Species[j].AddIndividual( m_Genomes[i] );
-                t_added = true;
+                Genome tmp = m_Species[j].GetRepresentative();
+                if (m_Genomes[i].IsCompatibleWith( tmp, m_Parameters ))
+                {
+                    // Compatible, add to species
+                    m_Species[j].AddIndividual( m_Genomes[i] );
+                    t_added = true;
 
-                break;
+                    break;
+                }
             }
-        }
 
-        if (!t_added)
-        {
-            // didn't find compatible species, create new species
-            m_Species.push_back( Species(m_Genomes[i], m_NextSpeciesID));
-            m_NextSpeciesID++;
+            if (!t_added)
+            {
+                // didn't find compatible species, create new species
+                m_Species.push_back( Species(m_Genomes[i], m_NextSpeciesID));
+                m_NextSpeciesID++;
+            }
         }
     }
 
@@ -434,6 +581,168 @@ void Population::UpdateSpecies()
 
 
 
+// Puts the genomes into species like the serial first-fit scan does
+// The genomes go in blocks: the tests against the species that existed when the block
+// started run in parallel, then the genomes are assigned in order and only the species
+// created in the meantime are tested serially.
+void Population::PlaceGenomes(std::vector<Genome>& a_Genomes, std::vector<Species>& a_Species)
+{
+    unsigned int t_threads = m_Parameters.EpochThreads;
+    unsigned int t_block = 16 * t_threads;
+
+    std::vector<Genome> t_reps;
+    for(unsigned int i=0; i<a_Species.size(); i++)
+        t_reps.push_back( a_Species[i].GetRepresentative() );
+
+    std::vector<int> t_species;
+    for(unsigned int t_first=0; t_first<a_Genomes.size(); t_first += t_block)
+    {
+        unsigned int t_count = std::min(t_block, static_cast<unsigned int>(a_Genomes.size()) - t_first);
+        unsigned int t_num_reps = static_cast<unsigned int>(t_reps.size());
+
+        t_species.resize(t_count);
+        CompatibilityJob t_job(a_Genomes, t_reps, t_first, t_species, m_Parameters);
+        ParallelFor(t_count, t_threads, t_job);
+
+        for(unsigned int i=0; i<t_count; i++)
+        {
+            Genome& t_genome = a_Genomes[t_first + i];
+            int t_idx = t_species[i];
+
+            // try the species created since the block started
+            for(unsigned int j=t_num_reps; (t_idx == -1) && (j<t_reps.size()); j++)
+            {
+                if (t_genome.IsCompatibleWith( t_reps[j], m_Parameters ))
+                    t_idx = static_cast<int>(j);
+            }
+
+            if (t_idx != -1)
+            {
+                a_Species[t_idx].AddIndividual( t_genome );
+            }
+            else
+            {
+                a_Species.push_back( Species(t_genome, m_NextSpeciesID) );
+                m_NextSpeciesID++;
+                t_reps.push_back( t_genome );
+            }
+        }
+    }
+}
+
+
+// Reproduces all species into m_TempSpecies on several threads
+// 1. Each species breeds with its own RNG, seeded from m_RNG in species order,
+//    and records its innovations in a journal on top of the innovation database.
+// 2. The journals are merged into the database in species order and the babies renumbered.
+// 3. Clones of babies from the previous species are mutated again, in order.
+// 4. The babies are placed into species in order (see PlaceGenomes()).
+// None of the results depend on how the work was split among the threads.
+void Population::ReproduceThreaded()
+{
+    unsigned int t_threads = m_Parameters.EpochThreads;
+    unsigned int t_num_species = static_cast<unsigned int>(m_Species.size());
+
+    std::vector<RNG> t_rngs(t_num_species);
+    for(unsigned int i=0; i<t_num_species; i++)
+        t_rngs[i].Seed( m_RNG.RandInt(0, 2147483646) );
+
+    std::vector<InnovationDatabase> t_journals(t_num_species);
+    std::vector< std::vector<Genome> > t_species_babies(t_num_species);
+    std::vector< std::vector<bool> > t_species_checked(t_num_species);
+
+    BreedJob t_breed(*this, m_InnovationDatabase, t_rngs, t_journals, t_species_babies, t_species_checked);
+    ParallelFor(t_num_species, t_threads, t_breed);
+
+    // Merge the innovations and collect the babies in species order
+    unsigned int t_first_innov = m_InnovationDatabase.NumInnovations();
+    std::vector<Genome> t_babies;
+    std::vector<bool> t_checked;
+    std::vector<unsigned int> t_parent;       // index of the species that bred the baby
+    std::vector<unsigned int> t_species_start; // index of the first baby of that species
+    for(unsigned int i=0; i<t_num_species; i++)
+    {
+        std::map<int, int> t_neuron_ids, t_innov_ids;
+        m_InnovationDatabase.Merge(t_journals[i], t_first_innov, t_neuron_ids, t_innov_ids);
+
+        unsigned int t_start = static_cast<unsigned int>(t_babies.size());
+        for(unsigned int j=0; j<t_species_babies[i].size(); j++)
+        {
+            Genome& t_baby = t_species_babies[i][j];
+            if (!(t_neuron_ids.empty() && t_innov_ids.empty()))
+                t_baby.RemapIDs(t_neuron_ids, t_innov_ids);
+
+            // We have a new offspring now
+            // give the offspring a new ID
+            t_baby.SetID(m_NextGenomeID);
+            m_NextGenomeID++;
+
+            // sort the baby's genes
+            t_baby.SortGenes();
+
+            // clear the baby's fitness
+            t_baby.SetFitness(0);
+            t_baby.SetAdjFitness(0);
+            t_baby.SetOffspringAmount(0);
+
+            t_baby.ResetEvaluated();
+
+            t_babies.push_back(t_baby);
+            t_checked.push_back(t_species_checked[i][j]);
+            t_parent.push_back(i);
+            t_species_start.push_back(t_start);
+        }
+        t_species_babies[i].clear();
+    }
+
+    // No clones across species either, unless allowed
+    // The parallel test is against the babies as bred, so the ones changed
+    // here are tested again serially.
+    if (!m_Parameters.AllowClones)
+    {
+        std::vector<bool> t_clone(t_babies.size(), false);
+        CloneJob t_clones(t_babies, t_checked, t_species_start, t_clone, m_Parameters);
+        ParallelFor(static_cast<unsigned int>(t_babies.size()), t_threads, t_clones);
+
+        std::vector<unsigned int> t_changed;
+        for(unsigned int i=0; i<t_babies.size(); i++)
+        {
+            if (!t_checked[i])
+                continue;
+
+            bool t_is_clone = t_clone[i];
+            if (t_is_clone)
+            {
+                // may be a clone of a baby that was changed since, so test it again
+                t_is_clone = false;
+                for(unsigned int j=0; (j<i) && (!t_is_clone); j++)
+                    t_is_clone = (t_babies[i].CompatibilityDistance(t_babies[j], m_Parameters) < 0.00001);
+            }
+            else
+            {
+                for(unsigned int j=0; (j<t_changed.size()) && (!t_is_clone); j++)
+                    t_is_clone = (t_babies[i].CompatibilityDistance(t_babies[t_changed[j]], m_Parameters) < 0.00001);
+            }
+
+            if (t_is_clone)
+                t_changed.push_back(i);
+
+            while(t_is_clone)
+            {
+                m_Species[t_parent[i]].MutateGenome(true, *this, t_babies[i], m_Parameters, t_rngs[t_parent[i]]);
+                t_babies[i].SortGenes();
+
+                t_is_clone = false;
+                for(unsigned int j=0; (j<i) && (!t_is_clone); j++)
+                    t_is_clone = (t_babies[i].CompatibilityDistance(t_babies[j], m_Parameters) < 0.00001);
+            }
+        }
+    }
+
+    PlaceGenomes(t_babies, m_TempSpecies);
+}
+
+
 // the epoch method - the heart of the GA
 void Population::Epoch()
 {
@@ -663,9 +972,16 @@ void Population::Epoch()
     for(unsigned int i=0; i<m_TempSpecies.size(); i++)
     	m_TempSpecies[i].Clear();
 
-    for(unsigned int i=0; i<m_Species.size(); i++)
+    if (m_Parameters.EpochThreads > 1)
+    {
+        ReproduceThreaded();
+    }
+    else
     {
-        m_Species[i].Reproduce(*this, m_Parameters, m_RNG);
+        for(unsigned int i=0; i<m_Species.size(); i++)
+        {
+            m_Species[i].Reproduce(*this, m_Parameters, m_RNG);
+        }
     }
 
     m_Species = m_TempSpecies;
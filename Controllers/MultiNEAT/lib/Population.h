@@ -91,6 +91,14 @@ private:
     // Separates the population into species based on compatibility distance
     void Speciate();
 
+    // Puts each genome into the first species whose representative it is compatible with,
+    // creating new species as needed - the same result as the serial scan in Speciate().
+    // The compatibility tests run on EpochThreads threads.
+    void PlaceGenomes(std::vector<Genome>& a_Genomes, std::vector<Species>& a_Species);
+
+    // Reproduces all species into m_TempSpecies on EpochThreads threads
+    void ReproduceThreaded();
+
     // Adjusts each species's fitness
     void AdjustFitness();
 
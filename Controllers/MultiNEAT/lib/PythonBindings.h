@@ -43,6 +43,49 @@ namespace py = boost::python;
 using namespace NEAT;
 using namespace py;
 
+///////////////////////////////////////////////////////////////////
+// Compact phenotype transfer
+///////////////////////////////////////////////////////////////////
+
+// The phenotype buffer (see NeuralNetwork::SaveBuffer) as a Python string
+str NN_ToBuffer(const NeuralNetwork& a_nn)
+{
+	std::string t_buffer;
+	a_nn.SaveBuffer(t_buffer);
+	return str(t_buffer.data(), t_buffer.size());
+}
+
+bool NN_FromBuffer(NeuralNetwork& a_nn, const str& a_buffer)
+{
+	return a_nn.LoadBuffer(extract<std::string>(a_buffer)());
+}
+
+// Builds the phenotype of a genome and returns only its buffer, so evaluation
+// workers can be sent the network instead of the whole genome
+str Genome_BuildPhenotypeBuffer(const Genome& a_genome)
+{
+	NeuralNetwork t_nn;
+	a_genome.BuildPhenotype(t_nn);
+	return NN_ToBuffer(t_nn);
+}
+
+struct NeuralNetwork_pickle_suite : pickle_suite
+{
+	static object getstate(const NeuralNetwork& a)
+	{
+		return NN_ToBuffer(a);
+	}
+
+	static void setstate(NeuralNetwork& a, object entries)
+	{
+		if (!NN_FromBuffer(a, extract<str>(entries)()))
+		{
+			PyErr_SetString(PyExc_ValueError, "Invalid NeuralNetwork phenotype buffer");
+			throw_error_already_set();
+		}
+	}
+};
+
 
 BOOST_PYTHON_MODULE(_MultiNEAT)
 {
@@ -176,9 +219,19 @@ BOOST_PYTHON_MODULE(_MultiNEAT)
 			NN_Input_numpy)
 			.def("Output",
 			&NeuralNetwork::Output)
+			.def("ActivateBatch",
+			&NeuralNetwork::ActivateBatch_numpy,
+			(arg("inputs"), arg("activations")=1, arg("flush")=false))
+
+			.def("ToBuffer",
+			NN_ToBuffer)
+			.def("FromBuffer",
+			NN_FromBuffer)
 
 			.def_readwrite("neurons", &NeuralNetwork::m_neurons)
 			.def_readonly("connections", &NeuralNetwork::m_connections)
+
+			.def_pickle(NeuralNetwork_pickle_suite())
 			;
 
 
@@ -211,6 +264,7 @@ BOOST_PYTHON_MODULE(_MultiNEAT)
 			.def("GetDepth", &Genome::GetDepth)
 
 			.def("BuildPhenotype", &Genome::BuildPhenotype)
+			.def("BuildPhenotypeBuffer", Genome_BuildPhenotypeBuffer)
 			.def("DerivePhenotypicChanges", &Genome::DerivePhenotypicChanges)
 			.def("BuildHyperNEATPhenotype", &Genome::BuildHyperNEATPhenotype)
 
@@ -304,6 +358,7 @@ BOOST_PYTHON_MODULE(_MultiNEAT)
 			.def_readwrite("MaxSpecies", &Parameters::MaxSpecies)
 			.def_readwrite("InnovationsForever", &Parameters::InnovationsForever)
 			.def_readwrite("AllowClones", &Parameters::AllowClones)
+			.def_readwrite("EpochThreads", &Parameters::EpochThreads)
 			.def_readwrite("YoungAgeTreshold", &Parameters::YoungAgeTreshold)
 			.def_readwrite("YoungAgeFitnessBoost", &Parameters::YoungAgeFitnessBoost)
 			.def_readwrite("SpeciesDropoffAge", &Parameters::SpeciesMaxStagnation)
@@ -326,6 +326,119 @@ SUMMARY OF THE EPOCH MECHANISM
 */
 
 
+// Mates (or copies) parents of the species and mutates the result
+// Produces every baby but the champion. a_IsClone tells the mutation that the previous
+// attempt was a clone, so only non-structural mutations are allowed.
+// New innovations are recorded in a_Innovs.
+Genome Species::MateAndMutate(bool a_IsClone, Population& a_Pop, InnovationDatabase& a_Innovs, Parameters& a_Parameters, RNG& a_RNG)
+{
+    Genome t_baby;
+
+    // this tells us if the baby is a result of mating
+    bool t_mated = false;
+
+    // There must be individuals there..
+    ASSERT(NumIndividuals() > 0);
+
+    // for a species of size 1 we can only mutate
+    // NOTE: but does it make sense since we know this is the champ?
+    if (NumIndividuals() == 1)
+    {
+        t_baby = GetIndividual(a_Parameters, a_RNG);
+        //JMM Addition:
+        //Set the Parent ID's of the genome for tracking in External Code
+        t_baby.SetPID1(t_baby.GetID());
+        t_baby.SetPID2(-4);
+        t_mated = false;
+    }
+    // else we can mate
+    else
+    {
+        do // keep trying to mate until a good offspring is produced
+        {
+            Genome t_mom = GetIndividual(a_Parameters, a_RNG);
+
+            // choose whether to mate at all
+            // Do not allow crossover when in simplifying phase
+            if ((a_RNG.RandFloat() < a_Parameters.CrossoverRate) && (a_Pop.GetSearchMode() != SIMPLIFYING))
+            {
+                // get the father
+                Genome t_dad;
+                bool t_interspecies = false;
+
+                // There is a probability that the father may come from another species
+                if ((a_RNG.RandFloat() < a_Parameters.InterspeciesCrossoverRate) && (a_Pop.m_Species.size()>1))
+                {
+                    // Find different species (random one) // !!!!!!!!!!!!!!!!!
+                    int t_diffspec = a_RNG.RandInt(0, static_cast<int>(a_Pop.m_Species.size()-1));
+                    t_dad = a_Pop.m_Species[t_diffspec].GetIndividual(a_Parameters, a_RNG);
+                    t_interspecies = true;
+                }
+                else
+                {
+                    // Mate within species
+                    t_dad = GetIndividual(a_Parameters, a_RNG);
+
+                    // The other parent should be a different one
+                    // number of tries to find different parent
+                    int t_tries = 32;
+                    if (!a_Parameters.AllowClones)
+                        while(((t_mom.GetID() == t_dad.GetID()) || (t_mom.CompatibilityDistance(t_dad, a_Parameters) < 0.00001) ) && (t_tries--))
+                        {
+                            t_dad = GetIndividual(a_Parameters, a_RNG);
+                        }
+                    else
+                        while(((t_mom.GetID() == t_dad.GetID()) ) && (t_tries--))
+                        {
+                            t_dad = GetIndividual(a_Parameters, a_RNG);
+                        }
+                    t_interspecies = false;
+                }
+
+                // OK we have both mom and dad so mate them
+                // Choose randomly one of two types of crossover
+                if (a_RNG.RandFloat() < a_Parameters.MultipointCrossoverRate)
+                {
+                    t_baby = t_mom.Mate( t_dad, false, t_interspecies, a_RNG);
+                }
+                else
+                {
+                    t_baby = t_mom.Mate( t_dad, true, t_interspecies, a_RNG);
+                }
+
+                t_mated = true;
+
+                //JMM Addition:
+                //Set the Parent ID's of the genome for tracking in External Code
+                t_baby.SetPID1(t_mom.GetID());
+                t_baby.SetPID2(t_dad.GetID());
+            }
+            // don't mate - reproduce the mother asexually
+            else
+            {
+                t_baby = t_mom;
+                t_mated = false;
+
+                //JMM Addition:
+                //Set the Parent ID to the mother and the second to a -2 indicating
+                //a copy.
+                t_baby.SetPID1(t_mom.GetID());
+                t_baby.SetPID2(-2);
+            }
+
+        } while (t_baby.HasDeadEnds() || (t_baby.NumLinks() == 0));
+        // in case of dead ends after crossover we will repeat crossover
+        // until it works
+    }
+
+    // Mutate the baby
+    if ((!t_mated) || (a_RNG.RandFloat() < a_Parameters.OverallMutationRate))
+        MutateGenome(a_IsClone, a_Pop, t_baby, a_Innovs, a_Parameters, a_RNG);
+
+    return t_baby;
+}
+
+
 // Reproduce mates & mutates the individuals of the species
 // It may access the global species list in the population
 // because some babies may turn out to belong in another species
@@ -367,107 +480,7 @@ void Species::Reproduce(Population &a_Pop, Parameters& a_Parameters, RNG& a_RNG)
         {
             do // - while the baby already exists somewhere in the new population
             {
-                // this tells us if the baby is a result of mating
-                bool t_mated = false;
-
-                // There must be individuals there..
-                ASSERT(NumIndividuals() > 0);
-
-                // for a species of size 1 we can only mutate
-                // NOTE: but does it make sense since we know this is the champ?
-                if (NumIndividuals() == 1)
-                {
-                    t_baby = GetIndividual(a_Parameters, a_RNG);
-                    //JMM Addition:
-                    //Set the Parent ID's of the genome for tracking in External Code
-                    t_baby.SetPID1(t_baby.GetID());
-                    t_baby.SetPID2(-4);
-                    t_mated = false;
-                }
-                // else we can mate
-                else
-                {
-                	do // keep trying to mate until a good offspring is produced
-                	{
-						Genome t_mom = GetIndividual(a_Parameters, a_RNG);
-
-						// choose whether to mate at all
-						// Do not allow crossover when in simplifying phase
-						if ((a_RNG.RandFloat() < a_Parameters.CrossoverRate) && (a_Pop.GetSearchMode() != SIMPLIFYING))
-						{
-							// get the father
-							Genome t_dad;
-							bool t_interspecies = false;
-
-							// There is a probability that the father may come from another species
-							if ((a_RNG.RandFloat() < a_Parameters.InterspeciesCrossoverRate) && (a_Pop.m_Species.size()>1))
-							{
-								// Find different species (random one) // !!!!!!!!!!!!!!!!!
-								int t_diffspec = a_RNG.RandInt(0, static_cast<int>(a_Pop.m_Species.size()-1));
-								t_dad = a_Pop.m_Species[t_diffspec].GetIndividual(a_Parameters, a_RNG);
-								t_interspecies = true;
-							}
-							else
-							{
-								// Mate within species
-								t_dad = GetIndividual(a_Parameters, a_RNG);
-
-								// The other parent should be a different one
-								// number of tries to find different parent
-								int t_tries = 32;
-								if (!a_Parameters.AllowClones)
-									while(((t_mom.GetID() == t_dad.GetID()) || (t_mom.CompatibilityDistance(t_dad, a_Parameters) < 0.00001) ) && (t_tries--))
-									{
-										t_dad = GetIndividual(a_Parameters, a_RNG);
-									}
-								else
-									while(((t_mom.GetID() == t_dad.GetID()) ) && (t_tries--))
-									{
-										t_dad = GetIndividual(a_Parameters, a_RNG);
-									}
-								t_interspecies = false;
-							}
-
-							// OK we have both mom and dad so mate them
-							// Choose randomly one of two types of crossover
-							if (a_RNG.RandFloat() < a_Parameters.MultipointCrossoverRate)
-							{
-								t_baby = t_mom.Mate( t_dad, false, t_interspecies, a_RNG);
-							}
-							else
-							{
-								t_baby = t_mom.Mate( t_dad, true, t_interspecies, a_RNG);
-							}
-
-                            t_mated = true;
-
-                            //JMM Addition:
-                            //Set the Parent ID's of the genome for tracking in External Code
-                            t_baby.SetPID1(t_mom.GetID());
-                            t_baby.SetPID2(t_dad.GetID());
-                        }
-						// don't mate - reproduce the mother asexually
-						else
-						{
-							t_baby = t_mom;
-							t_mated = false;
-                            
-                            //JMM Addition:
-                            //Set the Parent ID to the mother and the second to a -2 indicating
-                            //a copy.
-                            t_baby.SetPID1(t_mom.GetID());
-                            t_baby.SetPID2(-2);
-						}
-
-                	} while (t_baby.HasDeadEnds() || (t_baby.NumLinks() == 0));
-					// in case of dead ends after crossover we will repeat crossover
-					// until it works
-			    }
-
-
-                // Mutate the baby
-                if ((!t_mated) || (a_RNG.RandFloat() < a_Parameters.OverallMutationRate))
-                    MutateGenome(t_baby_exists_in_pop, a_Pop, t_baby, a_Parameters, a_RNG);
+                t_baby = MateAndMutate(t_baby_exists_in_pop, a_Pop, a_Pop.AccessInnovationDatabase(), a_Parameters, a_RNG);
 
                 // Check if this baby is already present somewhere in the offspring
                 // we don't want that
@@ -582,6 +595,77 @@ void Species::Reproduce(Population &a_Pop, Parameters& a_Parameters, RNG& a_RNG)
 
 
 
+// Breeds the offspring of the species into a_Babies without touching the population,
+// so that several species can breed at the same time (see Population::ReproduceThreaded()).
+// Works like Reproduce() except that the new innovations go to a_Innovs, clones are only
+// looked for among this species's own babies and the babies get no IDs or species yet.
+// a_Checked tells which babies went through the clone check (all but the champ and fallbacks).
+void Species::Breed(Population& a_Pop, Parameters& a_Parameters, RNG& a_RNG, InnovationDatabase& a_Innovs,
+                    std::vector<Genome>& a_Babies, std::vector<bool>& a_Checked)
+{
+    Genome t_baby;
+
+    int t_offspring_count = Rounded(GetOffspringRqd());
+
+    bool t_champ_chosen = false;
+    bool t_baby_exists_in_pop = false;
+    while(t_offspring_count-- > 0)
+    {
+        bool t_checked = false;
+
+        if (!t_champ_chosen)
+        {
+            t_baby = m_Individuals[0];
+            //JMM Addition:
+            //Set the Parent ID's of the genome for tracking in External Code
+            t_baby.SetPID1(t_baby.GetID());
+            t_baby.SetPID2(-5);
+            t_champ_chosen = true;
+        }
+        else
+        {
+            do // - while the baby already exists among this species's babies
+            {
+                t_baby = MateAndMutate(t_baby_exists_in_pop, a_Pop, a_Innovs, a_Parameters, a_RNG);
+
+                t_baby_exists_in_pop = false;
+                if (!a_Parameters.AllowClones)
+                {
+                    for(unsigned int i=0; i<a_Babies.size(); i++)
+                    {
+                        if (t_baby.CompatibilityDistance(a_Babies[i], a_Parameters) < 0.00001) // identical genome?
+                        {
+                            t_baby_exists_in_pop = true;
+                            break;
+                        }
+                    }
+                }
+            }
+            while (t_baby_exists_in_pop);
+
+            t_checked = true;
+        }
+
+        // If there is anything wrong here, we will just
+        // pick a random individual and leave him unchanged
+        if ((t_baby.NumLinks() == 0) || t_baby.HasDeadEnds())
+        {
+            t_baby = GetIndividual(a_Parameters, a_RNG);
+
+            //JMM Addition:
+            //Set the Parent ID to itself and the second to -3.
+            t_baby.SetPID1(t_baby.GetID());
+            t_baby.SetPID2(-3);
+            t_checked = false;
+        }
+
+        a_Babies.push_back(t_baby);
+        a_Checked.push_back(t_checked);
+    }
+}
+
+
+
 ////////////
 // Real-time code
 void Species::CalculateAverageFitness()
@@ -748,6 +832,12 @@ Genome Species::ReproduceOne(Population& a_Pop, Parameters& a_Parameters, RNG& a
 
 // Mutates a genome
 void Species::MutateGenome( bool t_baby_is_clone, Population &a_Pop, Genome &t_baby, Parameters& a_Parameters, RNG& a_RNG )
+{
+    MutateGenome(t_baby_is_clone, a_Pop, t_baby, a_Pop.AccessInnovationDatabase(), a_Parameters, a_RNG);
+}
+
+// Same as above, but the new innovations are recorded in a_Innovs
+void Species::MutateGenome( bool t_baby_is_clone, Population &a_Pop, Genome &t_baby, InnovationDatabase &a_Innovs, Parameters& a_Parameters, RNG& a_RNG )
 {
 #if 1
     // NEW version:
@@ -816,15 +906,15 @@ void Species::MutateGenome( bool t_baby_is_clone, Population &a_Pop, Genome &t_b
 		switch(ChosenMutation)
 		{
 		case ADD_NODE:
-			t_mutation_success = t_baby.Mutate_AddNeuron(a_Pop.AccessInnovationDatabase(), a_Parameters, a_RNG);
+			t_mutation_success = t_baby.Mutate_AddNeuron(a_Innovs, a_Parameters, a_RNG);
 			break;
 
 		case ADD_LINK:
-			t_mutation_success = t_baby.Mutate_AddLink(a_Pop.AccessInnovationDatabase(), a_Parameters, a_RNG);
+			t_mutation_success = t_baby.Mutate_AddLink(a_Innovs, a_Parameters, a_RNG);
 			break;
 
 		case REMOVE_NODE:
-			t_mutation_success = t_baby.Mutate_RemoveSimpleNeuron(a_Pop.AccessInnovationDatabase(), a_RNG);
+			t_mutation_success = t_baby.Mutate_RemoveSimpleNeuron(a_Innovs, a_RNG);
 			break;
 
 		case REMOVE_LINK:
@@ -917,10 +1007,10 @@ void Species::MutateGenome( bool t_baby_is_clone, Population &a_Pop, Genome &t_b
     while (t_mutation_success == false)
     {
     	if (a_RNG.RandFloat() < a_Parameters.MutateAddNeuronProb)
-    		t_mutation_success = t_baby.Mutate_AddNeuron(a_Pop.AccessInnovationDatabase(), a_Parameters, a_RNG);
+    		t_mutation_success = t_baby.Mutate_AddNeuron(a_Innovs, a_Parameters, a_RNG);
     	else
     	if (a_RNG.RandFloat() < a_Parameters.MutateAddLinkProb)
-    		t_mutation_success = t_baby.Mutate_AddLink(a_Pop.AccessInnovationDatabase(), a_Parameters, a_RNG);
+    		t_mutation_success = t_baby.Mutate_AddLink(a_Innovs, a_Parameters, a_RNG);
     	else
     	{
     		/*if (a_RNG.RandFloat() < a_Parameters.MutateNeuronActivationTypeProb)
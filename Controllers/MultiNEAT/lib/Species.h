@@ -170,6 +170,15 @@ public:
     void Reproduce(Population& a_Pop, Parameters& a_Parameters, RNG& a_RNG);
 
     void MutateGenome( bool t_baby_is_clone, Population &a_Pop, Genome &t_baby, Parameters& a_Parameters, RNG& a_RNG);
+    void MutateGenome( bool t_baby_is_clone, Population &a_Pop, Genome &t_baby, InnovationDatabase &a_Innovs, Parameters& a_Parameters, RNG& a_RNG);
+
+    // Mates and mutates one baby (any but the champion)
+    Genome MateAndMutate(bool a_IsClone, Population& a_Pop, InnovationDatabase& a_Innovs, Parameters& a_Parameters, RNG& a_RNG);
+
+    // Reproduction that leaves the population untouched, used by the threaded Epoch()
+    // The babies are returned in a_Babies, the new innovations are recorded in a_Innovs
+    void Breed(Population& a_Pop, Parameters& a_Parameters, RNG& a_RNG, InnovationDatabase& a_Innovs,
+               std::vector<Genome>& a_Babies, std::vector<bool>& a_Checked);
 
     // Removes all individuals
     void Clear()
@@ -23,5 +23,7 @@ setup(name='MultiNEAT',
                                             'lib/Substrate.cpp',
                                             'lib/Utils.cpp'],
                              libraries=['boost_python',
-                                        'boost_serialization'])]
+                                        'boost_serialization',
+                                        'boost_thread',
+                                        'boost_system'])]
       )
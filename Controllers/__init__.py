@@ -1,2 +1,2 @@
 from MultiNEAT import MultiNEAT_logging
-from ANN import ANN, ANN2, Basic_Evolve_ANN, ANN_logging
+from ANN import ANN, ANN2, Basic_Evolve_ANN, PopulationANN, ANN_logging
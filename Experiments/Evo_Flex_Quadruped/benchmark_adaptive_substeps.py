@@ -0,0 +1,70 @@
+"""
+    Compare adaptive substepping against the fixed substep schedule.
+
+    A fixed set of genomes is evaluated with n substeps per timestep as the reference
+    and with adaptive substepping.  The evaluation time, the substeps saved, the number
+    of timesteps redone at max_substeps and how far the fitnesses move from the
+    reference are reported.
+"""
+
+import argparse
+import random
+import time
+
+import flex_quadruped_utils
+
+from evo_flex_quadruped_simulation import Simulation
+
+######################################################################
+
+def evaluate_genomes(genome_strs, exp_class, eval_time, adaptive, min_substeps, max_substeps):
+    """ Evaluate the genomes with a substep schedule.
+
+    Args:
+        genome_strs: serialized genomes to evaluate
+        exp_class: experiment class to build the genomes with
+        eval_time: simulation time for each genome
+        adaptive: whether to use adaptive substepping
+        min_substeps: fewest substeps per timestep
+        max_substeps: most substeps per timestep
+    Returns:
+        fitnesses, the mean seconds per evaluation and the summed substep statistics
+    """
+    fits = []
+    totals = {'ticks':0, 'substeps':0, 'fixed_substeps':0, 'saved':0, 'fallbacks':0}
+    start = time.time()
+    for g in genome_strs:
+        simulation = Simulation(eval_time=eval_time, dt=.02, n=4, adaptive=adaptive, min_substeps=min_substeps, max_substeps=max_substeps)
+        fits.append(simulation.evaluate_individual(exp_class(genome=g)))
+        for k,v in simulation.substep_statistics.iteritems():
+            totals[k] += v
+    return fits, (time.time() - start)/len(genome_strs), totals
+
+######################################################################
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--exp_num", type=int, default=0, help="What experiment genome class to use.")
+parser.add_argument("--num_genomes", type=int, default=20, help="Number of random genomes to compare.")
+parser.add_argument("--eval_time", type=float, default=10., help="Simulation time for an individual.")
+parser.add_argument("--min_substeps", type=int, default=2, help="Fewest substeps per timestep.")
+parser.add_argument("--max_substeps", type=int, default=8, help="Most substeps per timestep.")
+parser.add_argument("--seed", type=int, default=0, help="Random seed for the genomes.")
+args = parser.parse_args()
+
+random.seed(args.seed)
+
+exp_class = flex_quadruped_utils.experiment_classes[args.exp_num]
+
+# Serialize the genome set so both schedules evaluate identical individuals.
+genome_strs = [str(exp_class()) for i in range(args.num_genomes)]
+
+ref_fits, ref_time, ref_stats = evaluate_genomes(genome_strs, exp_class, args.eval_time, False, 0, 0)
+fits, sec, stats = evaluate_genomes(genome_strs, exp_class, args.eval_time, True, args.min_substeps, args.max_substeps)
+num_objs = len(ref_fits[0])
+
+print("fixed: "+str(ref_time)+" sec per eval, "+str(ref_stats['substeps'])+" substeps")
+print("adaptive: "+str(sec)+" sec per eval, "+str(stats['substeps'])+" substeps, "+str(stats['saved'])+" saved, "+str(stats['fallbacks'])+" fallbacks")
+print("speedup: "+str(ref_time/sec))
+for i in range(num_objs):
+    dev = sum(abs(r[i]-f[i]) for r,f in zip(ref_fits,fits))/len(fits)
+    print("mean abs deviation fit "+str(i+1)+": "+str(dev))
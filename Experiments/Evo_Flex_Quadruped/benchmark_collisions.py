@@ -0,0 +1,101 @@
+"""
+    Benchmark the cost of the collision phase of a simulation substep.
+
+    Robots are built from random genomes, allowed to settle onto the floor and then the
+    collision pass (space.collide plus emptying the contact group) is timed repeatedly
+    with the current near_callback and with the previous implementation for comparison.
+"""
+
+import argparse
+import random
+import time
+
+import flex_quadruped_utils
+import evo_flex_quadruped_simulation
+
+from evo_flex_quadruped_simulation import Simulation, near_callback
+
+######################################################################
+
+def legacy_near_callback(args, geom1, geom2):
+    """ Previous collision callback, kept as the baseline for the benchmark. """
+    world, contactgroup, simulation = args
+    man = simulation.man
+
+    # Check to see if the two objects are connected.  Don't collide.
+    if(man.are_connected(geom1.getBody(), geom2.getBody()) or (geom1 != man.floor and geom2 != man.floor)):
+        return
+
+    # Check if the objects do collide
+    contacts = man.generate_contacts(geom1, geom2)
+
+    # Check to see if one of the objects is a foot sensor and the other
+    # is the ground.
+    if (geom1 == man.floor and hasattr(geom2.getBody(),'touch') or
+        geom2 == man.floor and hasattr(geom1.getBody(),'touch')):
+        body_id = man.get_body_key(geom2.getBody()) if geom1 == man.floor else man.get_body_key(geom1.getBody())
+        simulation.quadruped.activate_touch_sensor(body_id,[i for i in contacts[0].getContactGeomParams()[0]])
+        simulation.touch_logging[1][body_id] = 1
+
+    # Check to see if we are colliding between the floor and a body or bodies on the robot.
+    # Set the friction accordingly.
+    if not(geom1 == man.floor or geom2 == man.floor):
+        mu = 0.1 # Low friction
+    else:
+        mu = 10 # High friction
+
+    # Create contact joints
+    man.world,man.contactgroup = world,contactgroup
+    for c in contacts:
+        c.setBounce(0.2)
+        c.setMu(mu)
+        j = man.create_contact_joint(c)
+        j.attach(geom1.getBody(), geom2.getBody())
+
+def time_collisions(simulation, callback, substeps):
+    """ Time the collision pass of a settled simulation.
+
+    Args:
+        simulation: Simulation with a robot set up
+        callback: collision callback to time
+        substeps: number of collision passes to time
+    Returns:
+        mean seconds per collision pass
+    """
+    man = simulation.man
+    args = (man.world, man.contactgroup, simulation)
+    start = time.time()
+    for i in xrange(substeps):
+        man.space.collide(args, callback)
+        man.contactgroup.empty()
+    return (time.time() - start)/substeps
+
+######################################################################
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--exp_num", type=int, default=0, help="What experiment genome class to use.")
+parser.add_argument("--num_genomes", type=int, default=10, help="Number of random genomes to benchmark.")
+parser.add_argument("--substeps", type=int, default=10000, help="Collision passes to time per genome.")
+parser.add_argument("--seed", type=int, default=0, help="Random seed for the genomes.")
+args = parser.parse_args()
+
+random.seed(args.seed)
+
+totals = {'legacy':0., 'current':0.}
+for g in range(args.num_genomes):
+    simulation = Simulation(dt=.02, n=4)
+    simulation.genome = flex_quadruped_utils.experiment_classes[args.exp_num]()
+    simulation.setup_robot(evo_flex_quadruped_simulation.ODEManager(near_callback, stepsize=simulation.dt/simulation.n, max_joint_vel=simulation.genome.max_joint_vel, col_data=simulation))
+
+    # Let the robot settle so the feet are in contact with the floor.
+    settle = 0.0
+    while settle < 1.0:
+        simulation.man.step(near_callback, simulation.n)
+        settle += simulation.dt
+
+    totals['legacy'] += time_collisions(simulation, legacy_near_callback, args.substeps)
+    totals['current'] += time_collisions(simulation, near_callback, args.substeps)
+
+for k in ['legacy','current']:
+    print(k+": "+str(totals[k]/args.num_genomes*1e6)+" us per collision pass")
+print("speedup: "+str(totals['legacy']/totals['current']))
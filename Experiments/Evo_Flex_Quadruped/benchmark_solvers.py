@@ -0,0 +1,92 @@
+"""
+    Compare the accuracy and throughput of the ODE solver settings.
+
+    A fixed set of genomes is evaluated with the dense world.step solver as the reference
+    and with quickStep at several iteration counts.  For each setting the evaluation time
+    and how the fitness rankings of the genome set change relative to the reference are
+    reported.
+"""
+
+import argparse
+import random
+import time
+
+import flex_quadruped_utils
+
+from evo_flex_quadruped_simulation import Simulation
+
+######################################################################
+
+def kendall_tau(a, b):
+    """ Kendall rank correlation between two lists of values.
+
+    Args:
+        a: values for the reference ranking
+        b: values for the compared ranking
+    Returns:
+        tau between -1 (reversed) and 1 (identical ordering)
+    """
+    concordant = discordant = 0
+    for i in range(len(a)):
+        for j in range(i+1,len(a)):
+            s = (a[i]-a[j])*(b[i]-b[j])
+            if s > 0:
+                concordant += 1
+            elif s < 0:
+                discordant += 1
+    pairs = concordant + discordant
+    return float(concordant - discordant)/pairs if pairs > 0 else 1.
+
+def evaluate_genomes(genome_strs, exp_class, eval_time, solver, iterations, sor):
+    """ Evaluate the genomes with a solver setting.
+
+    Args:
+        genome_strs: serialized genomes to evaluate
+        exp_class: experiment class to build the genomes with
+        eval_time: simulation time for each genome
+        solver: "step" or "quickStep"
+        iterations: quickStep iterations
+        sor: quickStep over-relaxation parameter (None for the ODE default)
+    Returns:
+        fitnesses and the mean seconds per evaluation
+    """
+    fits = []
+    start = time.time()
+    for g in genome_strs:
+        simulation = Simulation(eval_time=eval_time, dt=.02, n=4, solver=solver, solver_iterations=iterations, solver_sor=sor)
+        fits.append(simulation.evaluate_individual(exp_class(genome=g)))
+    return fits, (time.time() - start)/len(genome_strs)
+
+######################################################################
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--exp_num", type=int, default=0, help="What experiment genome class to use.")
+parser.add_argument("--num_genomes", type=int, default=20, help="Number of random genomes to compare.")
+parser.add_argument("--genome_file", type=str, default="", help="File with one genome per line to use instead of random genomes.")
+parser.add_argument("--eval_time", type=float, default=10., help="Simulation time for an individual.")
+parser.add_argument("--iterations", type=int, nargs="+", default=[5,10,20,40], help="quickStep iteration counts to compare.")
+parser.add_argument("--sor", type=float, default=None, help="quickStep over-relaxation parameter (ODE default if not given).")
+parser.add_argument("--seed", type=int, default=0, help="Random seed for the genomes.")
+args = parser.parse_args()
+
+random.seed(args.seed)
+
+exp_class = flex_quadruped_utils.experiment_classes[args.exp_num]
+
+# Serialize the genome set so every setting evaluates identical individuals.
+if args.genome_file:
+    with open(args.genome_file,"r") as f:
+        genome_strs = [line.strip() for line in f if line.strip()]
+else:
+    genome_strs = [str(exp_class()) for i in range(args.num_genomes)]
+
+ref_fits, ref_time = evaluate_genomes(genome_strs, exp_class, args.eval_time, "step", 0, None)
+num_objs = len(ref_fits[0])
+
+print("Solver,Iterations,Sec_Per_Eval,Speedup,"+",".join("Tau_Fit_"+str(i+1) for i in range(num_objs))+","+",".join("Mean_Abs_Dev_Fit_"+str(i+1) for i in range(num_objs)))
+print("step,0,"+str(ref_time)+",1.0,"+",".join("1.0" for i in range(num_objs))+","+",".join("0.0" for i in range(num_objs)))
+for iterations in args.iterations:
+    fits, sec = evaluate_genomes(genome_strs, exp_class, args.eval_time, "quickStep", iterations, args.sor)
+    taus = [kendall_tau([f[i] for f in ref_fits],[f[i] for f in fits]) for i in range(num_objs)]
+    devs = [sum(abs(r[i]-f[i]) for r,f in zip(ref_fits,fits))/len(fits) for i in range(num_objs)]
+    print("quickStep,"+str(iterations)+","+str(sec)+","+str(ref_time/sec)+","+",".join(map(str,taus))+","+",".join(map(str,devs)))
@@ -59,20 +59,18 @@ parser.add_argument("--nsga",action="store_true",help="Are we doing NSGA-II?")
 parser.add_argument("--exp_num",type=int, default=0, help="What experiment to run.")
 parser.add_argument("--provide_genome",action="store_true", help="Provide a genome for validation.")
 parser.add_argument("--genome",type=str,help="Genome to validate.")
+parser.add_argument("--batch_size",type=int, default=1, help="Number of robots to simulate together in one world.")
+parser.add_argument("--max_contacts",type=int, default=-1, help="Maximum contacts per colliding geom pair (-1 for no limit).")
+parser.add_argument("--solver",type=str, default="step", choices=["step","quickStep"], help="ODE solver used to step the world.")
+parser.add_argument("--solver_iterations",type=int, default=20, help="Number of quickStep iterations.")
+parser.add_argument("--solver_sor",type=float, default=None, help="Successive over-relaxation parameter for quickStep (ODE default if not given).")
+parser.add_argument("--adaptive_substeps",action="store_true",help="Pick the number of physics substeps per timestep from contact and body activity.")
+parser.add_argument("--min_substeps",type=int, default=2, help="Fewest substeps per timestep with adaptive substeps.")
+parser.add_argument("--max_substeps",type=int, default=8, help="Most substeps per timestep with adaptive substeps.")
 args = parser.parse_args()
 
 # Select the experiment to run.
-quadruped_classes = [
-    flex_quadruped_utils.ControlForceSliderFlexEvolve, # Add Sliders to the Base Experiment - 0
-    flex_quadruped_utils.ControlForceEvolve, # Base Experiment - 1 (Sliders fixed movement springiness)
-    flex_quadruped_utils.ControlForceSpineFlexEvolve, # Spine flexibility, stiff sliders - 2
-    flex_quadruped_utils.ControlForceSpineSliderFlexEvolve, # Spine and sliders flexible - 3
-    flex_quadruped_utils.ControlForceSpineFlexNoSlidersEvolve, # Spine Flex and No Sliders - 4
-    flex_quadruped_utils.ControlForceNoSlidersEvolve, # Base Experiment with no sliders - 5
-    flex_quadruped_utils.ControlForceHingeLowerEvolve, # Evolve hinge joints on the lower legs - 6
-    flex_quadruped_utils.ControlForceSpineFlexHingeLowerEvolve, # Evolve hinge joints and spine flexibility - 7
-    flex_quadruped_utils.ControlForceHingeLowerActiveSpineEvolve # Evolve hinge joints and an actively controlled spine - 8
-]
+quadruped_classes = flex_quadruped_utils.experiment_classes
 
 # Set arguments for the evo_quadruped_evol_utils
 evo_flex_quadruped_evol_utils.args = args
@@ -57,27 +57,73 @@ def writeLexicaseOrdering(filename):
 
 ##########################################################################################
 
-def evaluate_individual(individual):
+def simulation_settings():
+    """ Collect the simulation parameters from the command line arguments.
+
+    Returns:
+        dict of keyword arguments for evo_flex_quadruped_simulation.Simulation
+    """
+    file_prefix = ""
+    if args.debug_runtime:
+        file_prefix = "DEBUG_RUNTIME_EVO_QUAD_"+str(args.run_num)+"_"
+    elif args.validator:
+        file_prefix = "Evo_Quad_Validation_"+str(args.run_num)+"_Gen_"+str(args.gens)+"_"
+    settings = {'log_frames':args.log_frames, 'run_num':args.run_num, 'eval_time':args.eval_time, 
+            'output_path':args.output_path, 'file_prefix':file_prefix,
+            'max_contacts':getattr(args, 'max_contacts', -1),
+            'solver':getattr(args, 'solver', "step"),
+            'solver_iterations':getattr(args, 'solver_iterations', 20),
+            'solver_sor':getattr(args, 'solver_sor', None)}
+    if getattr(args, 'adaptive_substeps', False):
+        # Batched robots share a world and always use the fixed schedule.
+        settings.update({'adaptive':True, 'min_substeps':args.min_substeps, 'max_substeps':args.max_substeps})
+    return settings
+
+def evaluate_individual(individual, settings=None):
     """ Wrapper to call Simulation which will evaluate an individual.  
 
     Args:
         individual: arguments to pass to the simulation
+        settings: simulation parameters, read from args if not provided
 
     Returns:
         fitness of an individual
     """
+    settings = settings if settings else simulation_settings()
+    return evo_flex_quadruped_simulation.evaluate_individual(individual, **settings)
 
-    # Set the parameters for the simulation.
-    evo_flex_quadruped_simulation.eval_time = args.eval_time
-    evo_flex_quadruped_simulation.run_num = args.run_num
-    evo_flex_quadruped_simulation.output_path = args.output_path
-    file_prefix = ""
-    if args.debug_runtime:
-        evo_flex_quadruped_simulation.file_prefix = file_prefix = "DEBUG_RUNTIME_EVO_QUAD_"+str(args.run_num)+"_"
-    elif args.validator:
-        evo_flex_quadruped_simulation.file_prefix = file_prefix = "Evo_Quad_Validation_"+str(args.run_num)+"_Gen_"+str(args.gens)+"_"
-    simulation = evo_flex_quadruped_simulation.Simulation(log_frames=args.log_frames, run_num=args.run_num, eval_time=args.eval_time, dt=.02, n=4, file_prefix=file_prefix)
-    return simulation.evaluate_individual(individual)
+def evaluate_batch(individuals, settings=None):
+    """ Wrapper to call BatchSimulation which will evaluate several individuals in one world.
+
+    Args:
+        individuals: list of individuals to simulate together
+        settings: simulation parameters, read from args if not provided
+
+    Returns:
+        list of fitnesses in the order of the individuals
+    """
+    settings = dict(settings if settings else simulation_settings())
+    for k in ['log_frames','adaptive','min_substeps','max_substeps']:
+        settings.pop(k, None) # Batched robots are never logged and share one substep schedule.
+    return evo_flex_quadruped_simulation.evaluate_individuals(individuals, **settings)
+
+def evaluate_population(toolbox, individuals):
+    """ Evaluate a list of individuals through the toolbox map.
+
+    Individuals are grouped args.batch_size at a time into a shared world if batching is enabled.
+
+    Args:
+        toolbox: DEAP toolbox with map, evaluate and evaluate_batch registered
+        individuals: individuals to evaluate
+
+    Returns:
+        list of fitnesses in the order of the individuals
+    """
+    batch_size = getattr(args, 'batch_size', 1)
+    if batch_size > 1:
+        batches = [individuals[i:i+batch_size] for i in range(0,len(individuals),batch_size)]
+        return [fit for batch in toolbox.map(toolbox.evaluate_batch, batches) for fit in batch]
+    return toolbox.map(toolbox.evaluate, individuals)
 
 ##########################################################################################
 
@@ -243,8 +289,11 @@ def common_evolution_run(**kwargs):
     # Create a population as a list.
     toolbox.register("population", tools.initRepeat, list, toolbox.individual)
 
-    # Register the evaluation function.
-    toolbox.register("evaluate", evaluate_individual)
+    # Register the evaluation functions with the simulation settings bound so workers
+    # do not depend on module state.
+    settings = simulation_settings()
+    toolbox.register("evaluate", evaluate_individual, settings=settings)
+    toolbox.register("evaluate_batch", evaluate_batch, settings=settings)
 
     if kwargs['evol_type'] == 'norm_ga':
         # Register the selection function.
@@ -268,7 +317,7 @@ def common_evolution_run(**kwargs):
     pop = toolbox.population(n=kwargs['pop_size'])
 
     # Run the first set of evaluations.
-    fitnesses = toolbox.map(toolbox.evaluate, pop)
+    fitnesses = evaluate_population(toolbox, pop)
     for ind, fit in zip(pop, fitnesses):
         ind.fitness.values = fit
 
@@ -303,7 +352,7 @@ def common_evolution_run(**kwargs):
             del mutant.fitness.values
         
         invalids = [ind for ind in pop if not ind.fitness.valid]
-        fitnesses = toolbox.map(toolbox.evaluate, invalids)
+        fitnesses = evaluate_population(toolbox, invalids)
         for ind, fit in zip(invalids, fitnesses):
             ind.fitness.values = fit
 
@@ -359,8 +408,11 @@ def nsga_evolution_run(**kwargs):
     # Create a population as a list.
     toolbox.register("population", tools.initRepeat, list, toolbox.individual)
 
-    # Register the evaluation function.
-    toolbox.register("evaluate", evaluate_individual)
+    # Register the evaluation functions with the simulation settings bound so workers
+    # do not depend on module state.
+    settings = simulation_settings()
+    toolbox.register("evaluate", evaluate_individual, settings=settings)
+    toolbox.register("evaluate_batch", evaluate_batch, settings=settings)
 
     toolbox.register("select", tools.selNSGA2)
 
@@ -380,7 +432,7 @@ def nsga_evolution_run(**kwargs):
 
     # Run the first set of evaluations.
     invalid_ind = [ind for ind in pop if not ind.fitness.valid]
-    fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
+    fitnesses = evaluate_population(toolbox, invalid_ind)
     for ind, fit in zip(invalid_ind, fitnesses):
         ind.fitness.values = fit        
 
@@ -424,7 +476,7 @@ def nsga_evolution_run(**kwargs):
 
         # Evaluate the individuals with an invalid fitness
         invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
-        fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
+        fitnesses = evaluate_population(toolbox, invalid_ind)
         for ind, fit in zip(invalid_ind, fitnesses):
             ind.fitness.values = fit
 
@@ -12,19 +12,13 @@ sys.path.insert(0, '../../')
 from Analysis import MOIAnalysis, COMEvaluation
 
 from ODESystem import ODEManager
+from ODESystem.manager import STATIC_CATEGORY
 from ODESystem import Placement
 
 from Robot import Sensors, TouchComponent
 
 import ode
 
-# Global constants for the simulation parameters.
-eval_time = 10
-file_prefix = ""
-log_frames = False
-run_num = 101
-output_path = ""
-
 ##########################################################################################
 
 def drange(start, stop, step):
@@ -69,42 +63,51 @@ def shift_oscillator(t,freq,d,phase_shift):
 
 ##########################################################################################
 
-def evaluate_individual(individual):
+def evaluate_individual(individual, **settings):
     """ Wrapper to call Simulation which will evaluate an individual.  
 
     Args:
         individual: arguments to pass to the simulation
-        file_prefix: prefix for output files if validating
+        settings: keyword arguments for Simulation (log_frames, run_num, eval_time, 
+            file_prefix, output_path, max_contacts, solver, solver_iterations, solver_sor,
+            adaptive, min_substeps, max_substeps)
 
     Returns:
         fitness of an individual
     """
 
-    simulation = Simulation(log_frames=log_frames, 
-        run_num=run_num, 
-        eval_time=eval_time, dt=.02, n=4,
-        file_prefix=file_prefix)
+    simulation = Simulation(dt=.02, n=4, **settings)
     return simulation.evaluate_individual(individual)
 
-##########################################################################################
+def evaluate_individuals(individuals, **settings):
+    """ Wrapper to call BatchSimulation which will evaluate several individuals in one world.
+
+    Args:
+        individuals: list of arguments to pass to the simulation
+        settings: keyword arguments for BatchSimulation (run_num, eval_time, file_prefix, 
+            output_path, max_contacts, solver, solver_iterations, solver_sor)
+
+    Returns:
+        list of fitnesses in the order of the individuals
+    """
 
-man = 0
-quadruped = 0
+    simulation = BatchSimulation(dt=.02, n=4, **settings)
+    return simulation.evaluate_individuals(individuals)
 
-# For tracking toe touching over time.
-num_touches = 0
-touch_logging = [] # For keeping track of when a toe touch is persistent or new.
+##########################################################################################
 
 class Quadruped(object):
     """ Represent the quadruped robot. """
 
-    def __init__(self,man,genome,base_pos=[0,0,0],logging=False):
+    def __init__(self,man,genome,base_pos=[0,0,0],logging=False,log_path=""):
         """ Initialize the robot in the ODE environment. 
 
         Arguments:
             man: ODE Manager for the Physics Simulation
             base_pos: base position to start the robot from
             morphology_genome: dict of dicts which contain different parameters for the morphology (TODO)
+            logging: whether to log sensor data
+            log_path: where to write sensor logs
         """
         self.man = man
         self.body_keys = []
@@ -120,8 +123,8 @@ class Quadruped(object):
         self.low_hinge = False
 
         # Sensors for robot.
-        self.sensor = Sensors(man,logging=logging,log_path=output_path)
-        self.sensor_components = {'touch':TouchComponent(man,logging=logging,log_path=output_path)}
+        self.sensor = Sensors(man,logging=logging,log_path=log_path)
+        self.sensor_components = {'touch':TouchComponent(man,logging=logging,log_path=log_path)}
 
         # Hardware Limits
         self.ref_moi_pivot = ""
@@ -136,8 +139,6 @@ class Quadruped(object):
             base_pos: base position to start the robot from
             morphology: optional dict of dicts defining measurements for various parts of the robot.
         """
-        global touch_logging
-
         self.flex_spine = genome.flex_spine
 
         self.low_hinge = genome.hinge_lower
@@ -336,8 +337,6 @@ class Quadruped(object):
         self.man.bodies[12].touch=True
         self.man.bodies[13].touch=True
         self.man.bodies[14].touch=True
-        touch_logging.append({11:0,12:0,13:0,14:0})
-        touch_logging.append({11:0,12:0,13:0,14:0})
 
         # Add in joint positions sensors.
         self.sensor.register_joint_sensors([0,1,2,3,4,5,6,7,8,9,10,11,12,13])
@@ -350,6 +349,10 @@ class Quadruped(object):
         """ Get the body numbers used in the quadruped. """
         return [i for i in range(15)]
 
+    def get_foot_nums(self):
+        """ Get the body numbers of the feet (touch sensors). """
+        return [11,12,13,14]
+
     def actuate_joints_by_pos(self,positions=[[0.,0.] for i in xrange(8)]):
         """ Actuate the joints of the quadruped to the specified position. 
 
@@ -395,6 +398,10 @@ class Quadruped(object):
         """ Get the state of the touch sensor for debugging. """
         return self.sensor_components['touch'].get_sensors()
 
+    def clear_touch_sensors(self):
+        """ Reset the touch sensors without logging them. """
+        self.sensor_components['touch'].clear_touching()
+
     def get_joint_feedback(self):
         """ Get the feedback from the joints. """
 
@@ -470,47 +477,63 @@ def near_callback(args, geom1, geom2):
 
     This function checks if the given geoms do collide and
     creates contact joints if they do.
-    """
-    global touch_logging
 
-    # Check to see if the two objects are connected.  Don't collide.
-    if(man.are_connected(geom1.getBody(), geom2.getBody()) or (geom1 != man.floor and geom2 != man.floor)):
+    Args:
+        args: (world, contactgroup, simulation) with the Simulation owning the robot
+    """
+    world, contactgroup, simulation = args
+
+    # Only contacts between the robot and the floor or terrain are simulated.
+    # Precomputed collision data for the robot geom, which is in the table.
+    geom_table = simulation.geom_table
+    entry = geom_table.get(geom1)
+    if entry is None:
+        entry = geom_table.get(geom2)
+        if entry is None:
+            return
+        static = geom1
+    elif geom2 in geom_table:
         return
+    else:
+        static = geom2
+    body_key, body, is_foot, surface = entry
+
+    if static is not simulation.man.floor:
+        if static.getCategoryBits() != STATIC_CATEGORY:
+            return
+        surface = 'terrain'
 
     # Check if the objects do collide
-    contacts = man.generate_contacts(geom1, geom2)
-
-    # Check to see if one of the objects is a foot sensor and the other
-    # is the ground.
-    if (geom1 == man.floor and hasattr(geom2.getBody(),'touch') or
-        geom2 == man.floor and hasattr(geom1.getBody(),'touch')):
-        body_id = man.get_body_key(geom2.getBody()) if geom1 == man.floor else man.get_body_key(geom1.getBody())
-        quadruped.activate_touch_sensor(body_id,[i for i in contacts[0].getContactGeomParams()[0]])
-        touch_logging[1][body_id] = 1
-
-    # Check to see if we are colliding between the floor and a body or bodies on the robot.
-    # Set the friction accordingly.
-    if not(geom1 == man.floor or geom2 == man.floor):
-        mu = 0.1 # Low friction
-    else:
-        mu = 10 # High friction
+    contacts = simulation.man.generate_contacts(geom1, geom2)
+    if not contacts:
+        return
 
-    # Create contact joints
-    man.world,man.contactgroup = args
-    for c in contacts:
-        c.setBounce(0.2)
-        c.setMu(mu)
-        j = man.create_contact_joint(c)
-        j.attach(geom1.getBody(), geom2.getBody())
+    # Check to see if one of the objects is a foot sensor.  The contact 
+    # position is only needed when the sensors are logged.
+    if is_foot:
+        simulation.quadruped.activate_touch_sensor(body_key,contacts[0].getContactGeomParams()[0] if simulation.log_frames else ["NA","NA","NA"])
+        simulation.touch_logging[1][body_key] = 1
+
+    # Create contact joints, keeping the body order of the collided geoms.
+    if geom1 is static:
+        simulation.man.create_contact_joints(contacts, None, body, surface=surface)
+    else:
+        simulation.man.create_contact_joints(contacts, body, None, surface=surface)
 
 class Simulation(object):
     """ Define a simulation to encapsulate an ODE simulation. """
 
-    def __init__(self, log_frames=0, run_num=0, eval_time=10., dt=.02, n=4,hyperNEAT=False,substrate=False,periodic=True,file_prefix=""):
+    def __init__(self, log_frames=0, run_num=0, eval_time=10., dt=.02, n=4,hyperNEAT=False,substrate=False,periodic=True,file_prefix="",output_path="",max_contacts=-1,solver="step",solver_iterations=20,solver_sor=None,adaptive=False,min_substeps=2,max_substeps=8):
         """ Initialize the simulation class. """
-        global simulate
 
-        man = ""
+        # ODE manager and robot for the simulation.
+        self.man = 0
+        self.quadruped = 0
+        self.geom_table = {}
+
+        # For tracking toe touching over time.
+        self.num_touches = 0
+        self.touch_logging = [] # For keeping track of when a toe touch is persistent or new.
 
         # Settings for the simulation.
         self.log_frames = log_frames
@@ -543,14 +566,50 @@ class Simulation(object):
         self.joint_feedback = []
         self.forces = []
 
-        # Set the file prefix for validation purposes.
+        # Set the file prefix and output path for validation purposes.
         self.file_prefix = file_prefix
+        self.output_path = output_path
+
+        # Contact generation limit and the contact statistics of the last run.
+        self.max_contacts = max_contacts
+        self.contact_statistics = {}
+
+        # Solver used to step the world.
+        self.solver = solver
+        self.solver_iterations = solver_iterations
+        self.solver_sor = solver_sor
+
+        # Adaptive substepping instead of a fixed n substeps per timestep.
+        self.adaptive = adaptive
+        self.min_substeps = min_substeps
+        self.max_substeps = max_substeps
+
+        # Activity thresholds for picking the number of substeps.
+        self.quiet_contacts = 4.     # Mean contacts per substep in flight or a quiet stance.
+        self.impact_contacts = 2.    # Change in mean contacts per substep signalling an impact.
+        self.slow_lin_speed = 0.5    # Body speeds below which the robot is quiet.
+        self.slow_ang_speed = 2.
+        self.fast_lin_speed = 2.     # Body speeds above which the robot is moving fast.
+        self.fast_ang_speed = 8.
+
+        # Torso speeds after a coarse timestep that trigger redoing it with max_substeps.
+        # (Half of the explosion limits in simulate.)
+        self.fallback_lin_speed = 15.
+        self.fallback_ang_speed = 10.
+
+        # Substep tracking and the statistics of the last run.
+        self.ticks = 0
+        self.substeps_taken = 0
+        self.fallbacks = 0
+        self.tick_contacts = 0.
+        self.prev_tick_contacts = 0.
+        self.substep_statistics = {}
 
     def update_callback(self):
         """ Function to handle updating the joints and such in the simulation. """
 
         # Record joint forces for calculation in the fitness function.
-        jf = quadruped.get_joint_feedback()
+        jf = self.quadruped.get_joint_feedback()
         
         self.forces.append([vector_3d_magnitude(jf[i][0]),vector_3d_magnitude(jf[i][2])] for i in range(len(jf)))
         
@@ -624,15 +683,13 @@ class Simulation(object):
             if (self.genome.actuated_spine):
                 raise RuntimeError('Actuated spine was not implemented for the shift_oscillator per joint.')                    
 
-        quadruped.actuate_joints_by_pos(positions=positions)
+        self.quadruped.actuate_joints_by_pos(positions=positions)
 
     def reset_simulation(self):
         """ Reset the simulation. """
-        
-        global num_touches
 
-        man.delete_joints()
-        man.delete_bodies()
+        self.man.delete_joints()
+        self.man.delete_bodies()
         self.exploded = False
         self.flipped = False
         self.elapsed_time = 0.
@@ -640,12 +697,13 @@ class Simulation(object):
         self.flipped_dist = 0.
         self.forces = []
         self.joint_feedback = []
-        num_touches = 0
-        touch_logging = []
+        self.num_touches = 0
+        self.touch_logging = []
 
     def simulate(self):
         """ Perform physics simulation. """
-        global num_touches, touch_logging
+        man = self.man
+        touch_logging = self.touch_logging
 
         if self.elapsed_time < self.eval_time: 
             self.update_callback()
@@ -653,12 +711,12 @@ class Simulation(object):
             # Update the touching code.
             for k,v in touch_logging[0].iteritems():
                 if touch_logging[1][k] != v and v == 0:
-                    num_touches += 1
+                    self.num_touches += 1
             touch_logging[0] = touch_logging[1].copy() # Ensure we don't copy objects.
             touch_logging[1] = dict.fromkeys( touch_logging[1].iterkeys(), 0 ) # Reset the touch sensors to null state.
 
             # Check to see if we flipped over.
-            if not self.flipped and quadruped.get_flipped():
+            if not self.flipped and self.quadruped.get_flipped():
                 self.flipped = True
                 self.flipped_time = self.elapsed_time
                 self.flipped_dist = euclidean_distance(man.get_body_position(0),[0,0,0])
@@ -694,11 +752,13 @@ class Simulation(object):
                 fit[2] = self.com_evaluation.get_vertical_movement_delta()
 
                 if self.log_frames:
-                    self.com_evaluation.write_data(output_path+"/"+self.file_prefix)
+                    self.com_evaluation.write_data(self.output_path+"/"+self.file_prefix)
 
+            self.contact_statistics = man.get_contact_statistics()
+            self.substep_statistics = self.get_substep_statistics()
             self.reset_simulation()
             return False, fit
-        quadruped.step_sensors(self.elapsed_time)
+        self.quadruped.step_sensors(self.elapsed_time)
         return True, 0 
 
     def explosion_logging(self, pos, ang_vel, lin_vel):
@@ -717,23 +777,131 @@ class Simulation(object):
             f.write("Lin Vel:"+str(lin_vel)+"\n")
             f.write("\n\n\n")
 
-    def physics_only_simulation(self):
-        """ Initialize and conduct a simulation. """
-        global man, quadruped
+    def setup_robot(self, manager):
+        """ Create the quadruped for the current genome in the given manager. 
 
-        # Initialize the manager to be unique to the process.
-        man = ODEManager(near_callback, stepsize=self.dt/self.n, log_data=self.log_frames, run_num=self.run_num, eval_time=self.eval_time, max_joint_vel=self.genome.max_joint_vel,output_path=output_path+"/"+self.file_prefix)
+        Args:
+            manager: ODEManager to build the robot in
+        """
+        self.man = manager
 
         # Initialize the quadruped
-        quadruped = Quadruped(man=man,genome=self.genome,logging=self.log_frames)
+        self.quadruped = Quadruped(man=self.man,genome=self.genome,logging=self.log_frames,log_path=self.output_path)
+
+        # Collision data for each geom of the robot, used by near_callback.
+        self.man.set_contact_surface('floor', bounce=0.2, mu=10.) # High friction
+        self.man.set_contact_surface('terrain', bounce=0.2, mu=10.)
+        self.geom_table = self.man.create_geom_table(surface='floor')
+
+        # Reset the substep tracking.
+        self.ticks = 0
+        self.substeps_taken = 0
+        self.fallbacks = 0
+        self.tick_contacts = 0.
+        self.prev_tick_contacts = 0.
+
+        # Start tracking the feet touching the ground.
+        self.num_touches = 0
+        self.touch_logging = [dict.fromkeys(self.quadruped.get_foot_nums(),0) for i in range(2)]
 
         # Initialize the COMEvaluation
         self.com_evaluation = COMEvaluation(
-            man,
-            quadruped.get_body_nums(),
+            self.man,
+            self.quadruped.get_body_nums(),
             self.dt
         )
 
+    def get_robot_speeds(self):
+        """ Get the largest linear and angular speed over the bodies of the robot. """
+        lin = ang = 0.
+        for b in self.man.bodies.itervalues():
+            v = b.getLinearVel()
+            w = b.getAngularVel()
+            lin = max(lin, v[0]*v[0]+v[1]*v[1]+v[2]*v[2])
+            ang = max(ang, w[0]*w[0]+w[1]*w[1]+w[2]*w[2])
+        return math.sqrt(lin), math.sqrt(ang)
+
+    def choose_substeps(self):
+        """ Pick the number of substeps for the next timestep from the recent contact and body activity. """
+        lin, ang = self.get_robot_speeds()
+        if math.fabs(self.tick_contacts - self.prev_tick_contacts) >= self.impact_contacts or \
+            lin > self.fast_lin_speed or ang > self.fast_ang_speed:
+            # Impacts and fast motion.
+            return self.max_substeps
+        if self.tick_contacts <= self.quiet_contacts and lin < self.slow_lin_speed and ang < self.slow_ang_speed:
+            # Flight or a quiet stance.
+            return self.min_substeps
+        return max(self.min_substeps, min(self.n, self.max_substeps))
+
+    def is_unstable(self):
+        """ Check whether the torso is moving fast enough that the last timestep was too coarse. """
+        lin_vel = self.man.bodies[0].getLinearVel()
+        ang_vel = self.man.bodies[0].getAngularVel()
+        for v in lin_vel:
+            if math.isnan(v) or math.fabs(v) > self.fallback_lin_speed:
+                return True
+        for w in ang_vel:
+            if math.isnan(w) or math.fabs(w) > self.fallback_ang_speed:
+                return True
+        return False
+
+    def step_physics(self):
+        """ Advance the physics by one timestep (dt). 
+
+        With adaptive substepping the number of substeps is picked from the activity 
+        of the previous timestep.  A coarse timestep that leaves the robot unstable is 
+        undone and redone with max_substeps.
+        """
+        if not self.adaptive:
+            self.man.step(near_callback, self.n)
+            self.ticks += 1
+            self.substeps_taken += self.n
+            return
+
+        substeps = self.choose_substeps()
+        states = self.man.get_body_states() if substeps < self.max_substeps else None
+        start_contacts = self.man.total_contacts
+        self.man.step(near_callback, substeps, self.dt/substeps, log=False)
+
+        if states and self.is_unstable():
+            # Undo the coarse timestep, including any touches it registered.
+            self.man.set_body_states(states)
+            self.touch_logging[1] = dict.fromkeys(self.touch_logging[1].iterkeys(), 0)
+            self.quadruped.clear_touch_sensors()
+            self.fallbacks += 1
+            self.substeps_taken += substeps
+
+            substeps = self.max_substeps
+            start_contacts = self.man.total_contacts
+            self.man.step(near_callback, substeps, self.dt/substeps, log=False)
+        self.man.log_step()
+
+        self.prev_tick_contacts = self.tick_contacts
+        self.tick_contacts = float(self.man.total_contacts - start_contacts)/substeps
+        self.ticks += 1
+        self.substeps_taken += substeps
+
+    def get_substep_statistics(self):
+        """ Get the substeps taken compared to the fixed schedule of n substeps per timestep.
+
+        Returns:
+            dict with the timesteps, substeps taken, substeps of the fixed schedule, 
+            substeps saved and the number of fallbacks
+        """
+        fixed = self.ticks*self.n
+        return {'ticks':self.ticks,
+                'substeps':self.substeps_taken,
+                'fixed_substeps':fixed,
+                'saved':fixed - self.substeps_taken,
+                'fallbacks':self.fallbacks}
+
+    def physics_only_simulation(self):
+        """ Initialize and conduct a simulation. """
+
+        # Initialize the manager to be unique to the process.
+        self.setup_robot(ODEManager(near_callback, stepsize=self.dt/self.n, log_data=self.log_frames, run_num=self.run_num, eval_time=self.eval_time, max_joint_vel=self.genome.max_joint_vel,output_path=self.output_path+"/"+self.file_prefix,col_data=self,max_contacts=self.max_contacts,solver=self.solver,solver_iterations=self.solver_iterations,solver_sor=self.solver_sor))
+        man = self.man
+
         # If logging the output, tell manager to write the body type, dimensions, and position to the logging file.
         if self.log_frames:
             man.log_world_setup()
@@ -747,14 +915,14 @@ class Simulation(object):
         go_on, fit = self.simulate()
         while go_on:
             # Simulate physics
-            man.step(near_callback, self.n)
+            self.step_physics()
             self.com_evaluation.add_timestep()
             self.elapsed_time += self.dt
             go_on, fit = self.simulate()
 
         # Log the sensor data at the end of a run.
         if self.log_frames:
-            quadruped.log_sensor_data(self.file_prefix)
+            self.quadruped.log_sensor_data(self.file_prefix)
 
         return fit
 
@@ -773,3 +941,88 @@ class Simulation(object):
 
         # Conduct the evaluation
         return self.physics_only_simulation() 
+
+class BatchSimulation(object):
+    """ Simulate several quadrupeds side by side in a single ODE world. 
+
+    Each robot is built in its own collision space that is only collided against 
+    the shared floor and terrain, so the robots do not interact and one world step advances 
+    every individual.  Fitness is extracted per robot by a Simulation, exactly as 
+    in the single robot path.
+    """
+
+    def __init__(self, run_num=0, eval_time=10., dt=.02, n=4, file_prefix="", output_path="", max_contacts=-1, solver="step", solver_iterations=20, solver_sor=None):
+        """ Initialize the batch simulation class. """
+
+        # Settings for the simulation.
+        self.run_num = run_num
+        self.eval_time = eval_time
+        self.dt = dt            # Timestep for simulation.
+        self.n = n              # How many timesteps to simulate per callback.
+        self.file_prefix = file_prefix
+        self.output_path = output_path
+        self.max_contacts = max_contacts
+        self.solver = solver
+        self.solver_iterations = solver_iterations
+        self.solver_sor = solver_sor
+
+        # Manager owning the shared world and floor.
+        self.man = 0
+
+        # Per robot simulations and fitnesses.
+        self.simulations = []
+        self.fits = []
+
+    def advance_robot(self, i):
+        """ Run the control and fitness update for robot i. 
+
+        Returns:
+            True if the robot is still being evaluated
+        """
+        go_on, fit = self.simulations[i].simulate()
+
+        if not go_on:
+            self.fits[i] = fit
+            self.man.remove_sub_manager(self.simulations[i].man)
+        return go_on
+
+    def evaluate_individuals(self, genomes):
+        """ Evaluate a batch of individual solutions. 
+
+        Args:
+            genomes: genomes of the individuals to evaluate
+
+        Returns:
+            list of fitness values in the order of the genomes
+        """
+        self.man = ODEManager(near_callback, stepsize=self.dt/self.n, run_num=self.run_num, eval_time=self.eval_time, max_contacts=self.max_contacts, solver=self.solver, solver_iterations=self.solver_iterations, solver_sor=self.solver_sor)
+
+        self.simulations = []
+        self.fits = [0 for g in genomes]
+
+        # Create each robot in its own space within the shared world.
+        for genome in genomes:
+            simulation = Simulation(log_frames=0, run_num=self.run_num, eval_time=self.eval_time, dt=self.dt, n=self.n, file_prefix=self.file_prefix, output_path=self.output_path, max_contacts=self.max_contacts)
+            simulation.genome = genome
+            simulation.setup_robot(self.man.create_sub_manager(near_callback, max_joint_vel=genome.max_joint_vel, col_data=simulation))
+            self.simulations.append(simulation)
+
+        # Have a settling period to fall to the ground.
+        settle = 0.0
+        while settle < 1.0:
+            self.man.step(near_callback, self.n)
+            settle += self.dt
+
+        active = [i for i in range(len(genomes)) if self.advance_robot(i)]
+        while active:
+            # Simulate physics for every robot still being evaluated.
+            self.man.step(near_callback, self.n)
+            still_active = []
+            for i in active:
+                self.simulations[i].com_evaluation.add_timestep()
+                self.simulations[i].elapsed_time += self.dt
+                if self.advance_robot(i):
+                    still_active.append(i)
+            active = still_active
+
+        return self.fits
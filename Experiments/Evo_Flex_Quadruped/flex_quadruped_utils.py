@@ -1678,4 +1678,19 @@ class ControlForceHingeLowerActiveSpineEvolve(BaseEvolve):
         # Make the spine actively controlled
         self.make_actuated_spine()
 
-        self.map_genome()        
\ No newline at end of file
+        self.map_genome()        
+
+############################################################################################################
+# Experiment classes indexed by experiment number.
+
+experiment_classes = [
+    ControlForceSliderFlexEvolve, # Add Sliders to the Base Experiment - 0
+    ControlForceEvolve, # Base Experiment - 1 (Sliders fixed movement springiness)
+    ControlForceSpineFlexEvolve, # Spine flexibility, stiff sliders - 2
+    ControlForceSpineSliderFlexEvolve, # Spine and sliders flexible - 3
+    ControlForceSpineFlexNoSlidersEvolve, # Spine Flex and No Sliders - 4
+    ControlForceNoSlidersEvolve, # Base Experiment with no sliders - 5
+    ControlForceHingeLowerEvolve, # Evolve hinge joints on the lower legs - 6
+    ControlForceSpineFlexHingeLowerEvolve, # Evolve hinge joints and spine flexibility - 7
+    ControlForceHingeLowerActiveSpineEvolve # Evolve hinge joints and an actively controlled spine - 8
+]
@@ -2,6 +2,7 @@
     Manager implementation to create and manage an ODE instance.
 '''
 import math
+import numpy
 import ode
 
 from vector_ops import *
@@ -10,6 +11,11 @@ from placement import Placement
 ANG_TO_RAD = math.pi/180.
 RAD_TO_ANG = 180./math.pi
 
+# Collision category of the floor and terrain geoms.  Static geoms do not collide
+# with each other, so ODE drops floor/terrain pairs before the collision callback.
+STATIC_CATEGORY = 1
+STATIC_COLLIDE_BITS = 0xFFFFFFFF & ~STATIC_CATEGORY
+
 class Logger(object):
     """ Handle logging of objects to a file. """
 
@@ -95,6 +101,16 @@ class Logger(object):
 
             # Handle terrain
             for key, geom in self.man.terrain_geoms.iteritems():
+                if geom.shape == "trimesh":
+                    # Terrain meshes are logged as the boxes they were built from.
+                    for dim, pos in geom.mesh.boxes:
+                        f.write("scene_box, ")
+                        for p in list(pos)+list(dim):
+                            f.write(str(p)+", ")
+                        f.write("1.0,0.0,0.0,0.0\n")
+                        default_colors.append("0x000FFF")
+                    continue
+
                 f.write("scene_"+geom.shape+", ")
                 pos = list(geom.getPosition())
                 for p in pos:
@@ -147,32 +163,122 @@ class Logger(object):
         self.colors.append([i for i in self.man.current_colors])
         self.alphas.append([i for i in self.man.current_alphas])        
 
+class TerrainGrid(object):
+    """ Uniform grid over the x/z positions of the terrain geoms. """
+
+    def __init__(self,cell_size=2.):
+        """ Initialize the grid.
+
+        Args:
+            cell_size: width of a grid cell in the x and z directions
+        """
+        self.cell_size = cell_size
+        self.cells = {}
+        self.key_cells = {}
+
+    def get_cell(self,pos):
+        """ Get the cell containing a position. """
+        return (int(math.floor(pos[0]/self.cell_size)),int(math.floor(pos[2]/self.cell_size)))
+
+    def insert(self,key,pos):
+        """ Add (or move) a geom key at a position. """
+        self.remove(key)
+        cell = self.get_cell(pos)
+        self.cells.setdefault(cell,[]).append(key)
+        self.key_cells[key] = cell
+
+    def remove(self,key):
+        """ Remove a geom key from the grid if present. """
+        cell = self.key_cells.pop(key,None)
+        if cell is not None:
+            self.cells[cell].remove(key)
+            if not self.cells[cell]:
+                del self.cells[cell]
+
+    def clear(self):
+        """ Remove all keys from the grid. """
+        self.cells.clear()
+        self.key_cells.clear()
+
+    def query(self,pos,radius):
+        """ Get the keys in the cells overlapping the square of half width radius around pos.
+
+        Args:
+            pos: x,y,z center of the query
+            radius: half width of the query square
+        Returns:
+            list of keys, a superset of the geoms within radius in x/z
+        """
+        x0,z0 = self.get_cell((pos[0]-radius,0.,pos[2]-radius))
+        x1,z1 = self.get_cell((pos[0]+radius,0.,pos[2]+radius))
+        keys = []
+        if (x1-x0+1)*(z1-z0+1) > len(self.cells):
+            # Query covers more cells than are occupied, scan the occupied ones.
+            for (i,j),cell_keys in self.cells.iteritems():
+                if x0 <= i <= x1 and z0 <= j <= z1:
+                    keys.extend(cell_keys)
+        else:
+            for i in xrange(x0,x1+1):
+                for j in xrange(z0,z1+1):
+                    keys.extend(self.cells.get((i,j),()))
+        return keys
+
 class ODEManager:
     """An instance manager for ODE"""
 
-    def __init__(self, col_callback, stepsize=0.005,log_data=False,output_path="",gravity=-9.81,fluid_dynamics=0,run_num=0,erp=0.5,cfm=1E-4,max_joint_vel=-1,eval_time=0):
-        # Create a world object
-        self.world = ode.World()
-        self.world.setGravity((0,gravity,0) )
-        self.world.setERP(erp)
-        self.world.setCFM(cfm)
-        self.world.setContactMaxCorrectingVel(5.)
+    def __init__(self, col_callback, stepsize=0.005,log_data=False,output_path="",gravity=-9.81,fluid_dynamics=0,run_num=0,erp=0.5,cfm=1E-4,max_joint_vel=-1,eval_time=0,parent=None,col_data=None,max_contacts=-1,solver="step",solver_iterations=20,solver_sor=None):
+        """ Initialize the manager.
+
+        Args:
+            solver: "step" for the dense solver or "quickStep" for the iterative solver
+            solver_iterations: number of iterations for quickStep
+            solver_sor: successive over-relaxation parameter for quickStep (None keeps the ODE default)
+            max_contacts: maximum contacts kept per colliding geom pair (-1 for no limit)
+            parent: optional manager whose world, floor and contact group are shared.  The new
+                manager gets its own collision space that is only collided against the shared floor
+                and terrain.
+            col_data: state handed to the collision callback as the last element of its args tuple.
+        """
+        self.parent = parent
+
+        # Managers for robots sharing this world in their own collision spaces.
+        self.sub_managers = []
+
+        if parent is None:
+            # Create a world object
+            self.world = ode.World()
+            self.world.setGravity((0,gravity,0) )
+            self.world.setERP(erp)
+            self.world.setCFM(cfm)
+            self.world.setContactMaxCorrectingVel(5.)
+            self.set_solver(solver, solver_iterations, solver_sor)
+
+            # Create a space object
+            self.space = ode.Space()
+
+            # Create a plane geom which prevent the objects from falling forever
+            self.floor = ode.GeomPlane(self.space, (0,1,0), 0)
+            self.floor.setCategoryBits(STATIC_CATEGORY)
+            self.floor.setCollideBits(STATIC_COLLIDE_BITS)
+
+            # A joint group for the contact joints that are generated whenever
+            # two bodies collide
+            self.contactgroup = ode.JointGroup()
+        else:
+            # Share the physics world with the parent, keep collisions in a separate space.
+            self.world = parent.world
+            self.solver = parent.solver
+            self.world_step = parent.world_step
+            self.space = ode.SimpleSpace()
+            self.floor = parent.floor
+            self.contactgroup = parent.contactgroup
+            parent.sub_managers.append(self)
 
         self.output_path = output_path
 
         # Run Number
         self.run_num = run_num
 
-        # Create a space object
-        self.space = ode.Space()
-
-        # Create a plane geom which prevent the objects from falling forever
-        self.floor = ode.GeomPlane(self.space, (0,1,0), 0)
-
-        # A joint group for the contact joints that are generated whenever
-        # two bodies collide
-        self.contactgroup = ode.JointGroup()
-
         # A list of ODE Bodies
         self.bodies = {}
 
@@ -180,6 +286,7 @@ class ODEManager:
         self.fluid_dynamics=fluid_dynamics
         if(fluid_dynamics):
             self.surfaces = {}
+            self.surface_table = None
 
         # A list of geoms for the bodies
         self.geoms = {}
@@ -187,11 +294,23 @@ class ODEManager:
         # A dict of terrain geoms for the world.
         self.terrain_geoms = {}
 
+        # Spatial index over the terrain geoms and the keys currently enabled by
+        # toggle_terrain_enabled (None until the first toggle after terrain changes).
+        self.terrain_grid = TerrainGrid()
+        self.enabled_terrain = None
+
+        # Space the terrain geoms are created in.  Terrain is kept out of the robot
+        # space so it is only collided against robots, and a separate space can be
+        # shared with later managers through use_terrain_space.
+        self.own_terrain_space = ode.Space()
+        self.terrain_space = self.own_terrain_space
+
         # A list of joints in the world.
         self.joints = {}
 
         # Register the collision callback
         self.col_callback = col_callback
+        self.col_data = col_data
 
         # Set the stepsize for the instance.
         self.stepsize = stepsize
@@ -202,13 +321,25 @@ class ODEManager:
         # Create a maximum velocity that a joint is able to move in one step.
         self.max_joint_vel = (max_joint_vel if max_joint_vel > 0 else 36000.) * self.stepsize*ANG_TO_RAD
 
+        # Contact generation settings and surface templates by name.
+        # Template: (bounce, mu, mode, soft_erp, soft_cfm)
+        self.max_contacts = max_contacts
+        self.contact_surfaces = {}
+        self.set_contact_surface('default', bounce=0.2, mu=10.)
+
+        # Contact statistics to tune solver cost against gait fidelity.
+        self.step_contacts = 0
+        self.total_contacts = 0
+        self.max_step_contacts = 0
+        self.contact_steps = 0
+
         # Logging functionality
         self.log_data = log_data
         if self.log_data:
             self.logger = Logger(self,output_path=output_path,run_num=run_num,eval_time=eval_time,stepsize=self.stepsize)
             self.current_colors = []
             self.current_alphas = []
-            self.alpha_keys = {} # Index to keep track of the mapping from geom_keys to array position for alphas
+            self.alpha_keys = {} # Mapping from geom_keys to the (start, count) of their entries in the alphas
             # self.positions = []
             # self.quaternions = []
             # self.colors = []
@@ -257,13 +388,13 @@ class ODEManager:
                 self.create_surfaces(key,1.,active_surfaces)  
         else: 
             # Create a sphere geom for collision detection
-            geom = ode.GeomSphere(self.space, radius)
+            geom = ode.GeomSphere(self.terrain_space, radius)
             geom.setPosition((pos))
             geom.static = True
             geom.shape = "sphere"
             geom.color=[0.4,0.6,0.6,1.0]
             geom.radius = radius
-            self.terrain_geoms[key] = geom 
+            self.add_terrain_geom(key,geom)
 
         return key
 
@@ -471,13 +602,29 @@ class ODEManager:
             if(self.fluid_dynamics):
                 self.create_surfaces(key,amp_adj,active_surfaces)
         else:
-            geom = ode.GeomBox(self.space, lengths=(dim[0],dim[1],dim[2]))
+            geom = ode.GeomBox(self.terrain_space, lengths=(dim[0],dim[1],dim[2]))
             geom.setPosition((pos[0],pos[1],pos[2]))
             geom.static = True
             geom.shape = "box"
             geom.boxsize = (dim[0],dim[1],dim[2])
             geom.color=[0.1,0.6,0.6,1.0]
-            self.terrain_geoms[key] = geom 
+            self.add_terrain_geom(key,geom)
+
+        return key
+
+    def create_terrain_mesh(self,key,mesh):
+        """ Create a static triangle mesh geom as terrain.
+
+        Arguments:
+            key: number id to assign to the mesh
+            mesh: TerrainMesh providing the ODE mesh data and the boxes it was built from
+        """
+        geom = ode.GeomTriMesh(mesh.get_data(), self.terrain_space)
+        geom.static = True
+        geom.shape = "trimesh"
+        geom.mesh = mesh
+        geom.color=[0.1,0.6,0.6,1.0]
+        self.add_terrain_geom(key,geom,indexed=False)
 
         return key
 
@@ -512,15 +659,50 @@ class ODEManager:
             y = self.bodies[key].radius * 1.4472
             z = self.bodies[key].radius * 1.4472
 
-        surfaces = []
-        surfaces.append({'area':y*z, 'norm':[1,0,0], 'amp_adj':amp_adj, 'active':active['x']})
-        surfaces.append({'area':x*z, 'norm':[0,1,0], 'amp_adj':amp_adj, 'active':active['y']})
-        surfaces.append({'area':y*z, 'norm':[-1,0,0],'amp_adj':amp_adj, 'active':active['-x']})
-        surfaces.append({'area':x*z, 'norm':[0,-1,0],'amp_adj':amp_adj, 'active':active['-y']})
-        surfaces.append({'area':y*x, 'norm':[0,0,1], 'amp_adj':amp_adj, 'active':active['z']})
-        surfaces.append({'area':y*x, 'norm':[0,0,-1],'amp_adj':amp_adj, 'active':active['-z']})
+        # One row per face in the order x, y, -x, -y, z, -z.
+        self.surfaces[key] = {
+            'area':numpy.array([y*z, x*z, y*z, x*z, y*x, y*x]),
+            'norm':numpy.array([[1.,0.,0.],[0.,1.,0.],[-1.,0.,0.],[0.,-1.,0.],[0.,0.,1.],[0.,0.,-1.]]),
+            'amp_adj':numpy.array([amp_adj]*6,dtype=float),
+            'active':numpy.array([active[f] != 0 for f in ['x','y','-x','-y','z','-z']],dtype=float)}
+
+        # Stacked surface arrays are rebuilt on the next fluid step.
+        self.surface_table = None
+
+    def get_surface_table(self):
+        """ Stack the surfaces of every body for the batched fluid calculations.
+
+        Returns:
+            tuple of the body list, normals (bodies x 6 x 3), active area (bodies x 6) 
+            and amplitude adjustments (bodies x 6)
+        """
+        if self.surface_table is None:
+            keys = [k for k in self.surfaces if k in self.bodies]
+            self.surface_table = ([self.bodies[k] for k in keys],
+                numpy.array([self.surfaces[k]['norm'] for k in keys]).reshape(len(keys),6,3),
+                numpy.array([self.surfaces[k]['area']*self.surfaces[k]['active'] for k in keys]).reshape(len(keys),6),
+                numpy.array([self.surfaces[k]['amp_adj'] for k in keys]).reshape(len(keys),6))
+        return self.surface_table
 
-        self.surfaces[key] = surfaces
+    def get_surface_drag(self,vel,drag_coefficient):
+        """ Calculate the drag on every active surface.
+
+        Args:
+            vel: velocity of each body relative to the fluid (bodies x 3)
+            drag_coefficient: drag coefficient for the fluid
+        Returns:
+            world normals of the surfaces (bodies x 6 x 3) and the drag magnitude 
+            on each surface (bodies x 6), zero for surfaces facing away from the flow
+        """
+        bodies, norms, areas, amp_adj = self.get_surface_table()
+
+        # Reorient the normals to the rotation of each body in the world.
+        rots = numpy.array([b.getRotation() for b in bodies]).reshape(len(bodies),3,3)
+        adnorms = numpy.einsum('bij,bsj->bsi',rots,norms)
+
+        # Component of the velocity perpendicular to each surface, compensated for its size.
+        components = numpy.einsum('bsi,bi->bs',adnorms,vel)*drag_coefficient*areas
+        return adnorms, numpy.maximum(components,0.)
 
     def create_fixed(self,key,pos,bod):
         """ Create a fixed joint with the world.
@@ -1211,6 +1393,9 @@ class ODEManager:
         """ Delete the bodies held in the manager."""
         self.geoms.clear()
         self.bodies.clear()
+        if self.fluid_dynamics:
+            self.surfaces.clear()
+            self.surface_table = None
         if self.log_data:
             self.logger.writeFile()
             #self.dump_body_data(ind_num=self.run_num)
@@ -1218,25 +1403,91 @@ class ODEManager:
                 self.dump_joint_data(ind_num=self.run_num)
 
     def delete_terrain(self):
-        """ Delete the terrain geoms in the manager."""
-        self.terrain_geoms.clear()
+        """ Delete the terrain geoms in the manager.
+
+        Terrain in a shared space is only detached, it stays intact for other managers.
+        """
+        if self.terrain_space is not self.own_terrain_space:
+            self.terrain_space = self.own_terrain_space
+            self.terrain_geoms = {}
+            self.terrain_grid = TerrainGrid()
+        else:
+            self.terrain_geoms.clear()
+            self.terrain_grid.clear()
+        self.enabled_terrain = None
+
+    def use_terrain_space(self,space,geoms,grid):
+        """ Use terrain held in a separate space, e.g. one kept for a whole worker.
+
+        The terrain geoms are static, so the space can be collided against any world.
+        New terrain geoms are created in the space and added to geoms and grid.
+
+        Args:
+            space: ODE space holding the terrain geoms
+            geoms: dict of the terrain geoms in the space
+            grid: TerrainGrid over the terrain geoms
+        """
+        self.terrain_space = space
+        self.terrain_geoms = geoms
+        self.terrain_grid = grid
+        self.enabled_terrain = None
+
+    def add_terrain_geom(self,key,geom,indexed=True):
+        """ Add a static geom to the terrain and its spatial index.
+
+        Args:
+            key: key of the terrain geom
+            geom: positioned ODE geom
+            indexed: False for geoms spanning the terrain (meshes), which are
+                always enabled and skipped by toggle_terrain_enabled
+        """
+        geom.setCategoryBits(STATIC_CATEGORY)
+        geom.setCollideBits(STATIC_COLLIDE_BITS)
+        self.terrain_geoms[key] = geom
+        if indexed:
+            self.terrain_grid.insert(key,geom.getPosition())
+        else:
+            self.terrain_grid.remove(key)
+        self.enabled_terrain = None
 
     def toggle_terrain_enabled(self,threshold=5.):
         """ Enable/disable terrain geoms if they are within the threshold distance.
 
+        Only the geoms in the grid cells near body 0 and the geoms that were enabled
+        by the previous call are visited.  The first call after the terrain changes
+        visits every indexed geom.
+
         Args:
             threshold: distance by which to enable or disable a terrain geom.
         """
         b_pos = self.bodies[0].getPosition()
-        for k,g in self.terrain_geoms.iteritems():
-            g_pos = g.getPosition()
-            if dist3((b_pos),(g_pos)) <= threshold:
-                g.enable()
-                g.color = [0.4,0.4,0.4,1.0]
-            else:
+        if self.enabled_terrain is None:
+            candidates = self.terrain_grid.key_cells.keys()
+            previous = set()
+        else:
+            candidates = self.terrain_grid.query(b_pos,threshold)
+            previous = self.enabled_terrain
+
+        enabled = set()
+        for k in candidates:
+            g = self.terrain_geoms[k]
+            if dist3((b_pos),(g.getPosition())) <= threshold:
+                enabled.add(k)
+                if k not in previous:
+                    g.enable()
+                    g.color = [0.4,0.4,0.4,1.0]
+            elif self.enabled_terrain is None:
                 g.disable()
                 g.color = [0.2,0.2,0.2,1.0]
 
+        # Disable the geoms that left the threshold distance.
+        for k in previous - enabled:
+            g = self.terrain_geoms[k]
+            g.disable()
+            g.color = [0.2,0.2,0.2,1.0]
+
+        self.enabled_terrain = enabled
+
     def disable_terrain_geom(self,key):
         """ Disable a terrain geom. 
 
@@ -1244,6 +1495,8 @@ class ODEManager:
             key: key of the geom to disable.
         """
         self.terrain_geoms[key].disable()
+        if self.enabled_terrain is not None:
+            self.enabled_terrain.discard(key)
 
     def form_rotation(self,rot_deg):
         """ Form the rotation matrix for ode to apply to a body.
@@ -1304,21 +1557,111 @@ class ODEManager:
 
         self.bodies[key].setRotation(self.form_rotation(rot_deg))
     
+    def set_solver(self,solver="step",iterations=20,sor=None):
+        """ Select the solver used to step the world.
+
+        Args:
+            solver: "step" for the dense solver or "quickStep" for the iterative solver
+            iterations: number of iterations for quickStep
+            sor: successive over-relaxation parameter for quickStep, None keeps the ODE 
+                default.  Raises ValueError if the ODE bindings do not expose setQuickStepW.
+        """
+        if solver == "step":
+            self.world_step = self.world.step
+        elif solver == "quickStep":
+            self.world.setQuickStepNumIterations(iterations)
+            if sor is not None:
+                if not hasattr(self.world, 'setQuickStepW'):
+                    raise ValueError("The ODE bindings do not support setting the quickStep over-relaxation parameter.")
+                self.world.setQuickStepW(sor)
+            self.world_step = self.world.quickStep
+        else:
+            raise ValueError("Unknown solver: "+str(solver))
+        self.solver = solver
+
+    def create_sub_manager(self,col_callback,max_joint_vel=-1,col_data=None):
+        """ Create a manager for another robot in this world.
+
+        The robot only collides with the shared floor and terrain, so several non-interacting
+        robots can be advanced by a single world step.
+
+        Args:
+            col_callback: collision callback for the robot's space
+            max_joint_vel: maximum joint velocity for the robot
+            col_data: state handed to the robot's collision callback
+        Returns:
+            the new ODEManager
+        """
+        sub_man = ODEManager(col_callback, stepsize=self.stepsize, run_num=self.run_num, max_joint_vel=max_joint_vel, parent=self, col_data=col_data, max_contacts=self.max_contacts)
+        sub_man.contact_surfaces = dict(self.contact_surfaces)
+        return sub_man
+
+    def remove_sub_manager(self,sub_man):
+        """ Stop colliding a sub manager's space with the floor and terrain.
+
+        Args:
+            sub_man: manager previously returned by create_sub_manager
+        """
+        if sub_man in self.sub_managers:
+            self.sub_managers.remove(sub_man)
+
     # Step function for the manager.
-    def step_physics(self,callback):
-        self.space.collide((self.world,self.contactgroup), callback)
+    # The collision callback receives (world, contactgroup, col_data) as its args.
+    # stepsize overrides the manager stepsize for this step.
+    def step_physics(self,callback,stepsize=None):
+        self.space.collide((self.world,self.contactgroup,self.col_data), callback)
+
+        # Terrain is in its own space and collided against each robot space.  The
+        # floor in this space is skipped by ODE as both are static geoms.
+        if self.terrain_geoms:
+            ode.collide2(self.space, self.terrain_space, (self.world,self.contactgroup,self.col_data), callback)
+
+        # Robots in their own spaces only collide with the shared floor and terrain.
+        for sub_man in self.sub_managers:
+            ode.collide2(sub_man.space, self.floor, (self.world,self.contactgroup,sub_man.col_data), sub_man.col_callback)
+            if self.terrain_geoms:
+                ode.collide2(sub_man.space, self.terrain_space, (self.world,self.contactgroup,sub_man.col_data), sub_man.col_callback)
 
-        self.world.step(self.stepsize)
+        self.world_step(self.stepsize if stepsize is None else stepsize)
 
         self.contactgroup.empty()
 
+        self.record_contact_count()
+        for sub_man in self.sub_managers:
+            sub_man.record_contact_count()
+
     # Step the physics the defined number of times.
-    def step(self,callback, steps):
+    def step(self,callback, steps, stepsize=None, log=True):
         for i in range(steps):
-            self.step_physics(callback)
+            self.step_physics(callback, stepsize)
+        if log:
+            self.log_step()
+
+    def log_step(self):
+        """ Log the body data for the current step if logging is on. """
         if self.log_data:
             self.logger.log_body_data()
 
+    def get_body_states(self):
+        """ Capture the dynamic state of every body so a step can be undone.
+
+        Returns:
+            list of (body, position, quaternion, linear velocity, angular velocity)
+        """
+        return [(b, b.getPosition(), b.getQuaternion(), b.getLinearVel(), b.getAngularVel()) for b in self.bodies.itervalues()]
+
+    def set_body_states(self,states):
+        """ Restore body states captured with get_body_states.
+
+        Args:
+            states: list returned by get_body_states
+        """
+        for b, pos, quat, lin_vel, ang_vel in states:
+            b.setPosition(pos)
+            b.setQuaternion(quat)
+            b.setLinearVel(lin_vel)
+            b.setAngularVel(ang_vel)
+
     def get_body_key(self,body):
         """ Get the key of the body.
 
@@ -1396,7 +1739,8 @@ class ODEManager:
         if not self.log_data:
             return
 
-        self.current_alphas[self.alpha_keys[key]] = alpha
+        start,count = self.alpha_keys[key]
+        self.current_alphas[start:start+count] = [alpha]*count
 
     def log_world_setup(self):
         """ Log the initial configuration for the robot. """
@@ -1405,11 +1749,14 @@ class ODEManager:
         self.current_colors = ["0xFFFF00" for i in range(len(self.bodies))]
 
         # Initialize the alphas since we are logging.
-        self.current_alphas = [1.0 for i in range(len(self.geoms)+len(self.terrain_geoms))]
-        self.alpha_keys = dict(
-            {k:i for i,(k,v) in enumerate(self.geoms.iteritems())}.items() + 
-            {k:i+len(self.geoms) for i,(k,v) in enumerate(self.terrain_geoms.iteritems())}.items()
-            )
+        # Terrain meshes are logged as the boxes they were built from, one alpha per box.
+        self.alpha_keys = {k:(i,1) for i,k in enumerate(self.geoms.iterkeys())}
+        start = len(self.geoms)
+        for k,g in self.terrain_geoms.iteritems():
+            count = len(g.mesh.boxes) if g.shape == "trimesh" else 1
+            self.alpha_keys[k] = (start,count)
+            start += count
+        self.current_alphas = [1.0 for i in range(start)]
 
         self.logger.log_world_setup()
 
@@ -1421,9 +1768,20 @@ class ODEManager:
         """
         return True if ode.areConnected(b1,b2) else False
 
-    def generate_contacts(self,g1,g2):
-        """ Generate the contact points between two bodies. """
-        return ode.collide(g1,g2)
+    def generate_contacts(self,g1,g2,max_contacts=None):
+        """ Generate the contact points between two bodies. 
+
+        Args:
+            g1, g2: geoms to collide
+            max_contacts: maximum number of contacts to keep, defaults to the manager setting
+        Returns:
+            list of contacts
+        """
+        max_contacts = self.max_contacts if max_contacts is None else max_contacts
+        contacts = ode.collide(g1,g2)
+        if max_contacts > 0 and len(contacts) > max_contacts:
+            return contacts[:max_contacts]
+        return contacts
 
     def create_contact_joint(self,c):
         """ Create a contact joint between two objects. 
@@ -1433,6 +1791,80 @@ class ODEManager:
         """
         return ode.ContactJoint(self.world, self.contactgroup, c)
 
+    def set_contact_surface(self,name,bounce=0.2,mu=10.,soft_erp=-1,soft_cfm=-1):
+        """ Define a template of contact parameters for a type of surface.
+
+        Args:
+            name: name of the surface template
+            bounce: restitution of the contacts
+            mu: friction of the contacts
+            soft_erp: contact erp (-1 to use the world erp)
+            soft_cfm: contact cfm (-1 to use the world cfm)
+        """
+        mode = 0
+        if soft_erp != -1:
+            mode |= ode.ContactSoftERP
+        if soft_cfm != -1:
+            mode |= ode.ContactSoftCFM
+        self.contact_surfaces[name] = (bounce, mu, mode, soft_erp, soft_cfm)
+
+    def create_contact_joints(self,contacts,b1,b2,surface='default'):
+        """ Create contact joints for a batch of contacts between two bodies. 
+
+        Args:
+            contacts: contact points from generate_contacts
+            b1: body of the first collided geom (None for static geoms)
+            b2: body of the second collided geom (None for static geoms)
+            surface: name of the contact surface template to apply
+        """
+        bounce, mu, mode, soft_erp, soft_cfm = self.contact_surfaces[surface]
+        world = self.world
+        contactgroup = self.contactgroup
+        for c in contacts:
+            if mode:
+                c.setMode(mode)
+                if soft_erp != -1:
+                    c.setSoftERP(soft_erp)
+                if soft_cfm != -1:
+                    c.setSoftCFM(soft_cfm)
+            c.setBounce(bounce)
+            c.setMu(mu)
+            ode.ContactJoint(world, contactgroup, c).attach(b1, b2)
+        self.step_contacts += len(contacts)
+
+    def record_contact_count(self):
+        """ Fold the contacts created during the last step into the contact statistics. """
+        self.total_contacts += self.step_contacts
+        if self.step_contacts > self.max_step_contacts:
+            self.max_step_contacts = self.step_contacts
+        self.contact_steps += 1
+        self.step_contacts = 0
+
+    def get_contact_statistics(self):
+        """ Get the statistics on contacts created per step.
+
+        Returns:
+            dict with the number of steps, total, mean and max contacts per step
+        """
+        return {'steps':self.contact_steps,
+                'total':self.total_contacts,
+                'mean':float(self.total_contacts)/self.contact_steps if self.contact_steps > 0 else 0.,
+                'max':self.max_step_contacts}
+
+    def create_geom_table(self,surface='default'):
+        """ Precompute the data a collision callback needs for each body geom.
+
+        Args:
+            surface: name of the contact surface template for contacts with the geoms
+        Returns:
+            dict mapping a geom to (body key, body, is touch sensor, surface)
+        """
+        table = {}
+        for k,g in self.geoms.iteritems():
+            body = g.getBody()
+            table[g] = (k, body, hasattr(body,'touch'), surface)
+        return table
+
     def sim_fluid_dynamics(self):
         """ Simulate an aquatic environment.
 
@@ -1442,29 +1874,19 @@ class ODEManager:
         """
 
         drag_coefficient = .35
-        amp_adj = 1.
-
-        for body in self.bodies:
-            # Don't perform fluid dynamics for rays.
-            if self.bodies[body].type != "ray":
-                vel = self.bodies[body].getLinearVel()
-                rot = self.bodies[body].getRotation()
-
-                # Iterate through the 6 faces of a body (assuming box x,y,z parameters)
-                for i in xrange(6):
-                    if self.surfaces[body][i]['active'] != 0:
-                        area = self.surfaces[body][i]['area'] # Area of the surface
-                        norm = self.surfaces[body][i]['norm'] # Norm vector [x,y,z] of the surface
-                        amp_adj = self.surfaces[body][i]['amp_adj'] # Apply an amplitude adjustment for a body generating thrust
-
-                        adnorm = rotate3(rot,norm) # Reorient the normal to the bodies rotation in the world.
-
-                        component = adnorm[0]*vel[0]+adnorm[1]*vel[1]+adnorm[2]*vel[2]  # Get the component of force perpendicular to surface.
-                        component *= drag_coefficient*area  # Compensating for the size of the surface.
-                        if(component < 0):
-                            component = 0    # If less than zero, no drag force to apply (Surface is opposite to drag force.)
-                        force = self.world.impulseToForce(self.stepsize,[-component*adnorm[0]*amp_adj, -component*adnorm[1]*amp_adj, -component*adnorm[2]*amp_adj])
-                        self.bodies[body].addForce([force[0],force[1],force[2]])  # Add force to the body from calculated surface.
+
+        bodies, norms, areas, amp_adj = self.get_surface_table()
+        if not bodies:
+            return
+
+        vel = numpy.array([b.getLinearVel() for b in bodies])
+        adnorms, components = self.get_surface_drag(vel,drag_coefficient)
+
+        # Sum the drag opposing each surface into a single force per body.
+        # (Equivalent to world.impulseToForce on each surface impulse.)
+        forces = -numpy.einsum('bs,bsi->bi',components*amp_adj,adnorms)/self.stepsize
+        for body, force in zip(bodies,forces.tolist()):
+            body.addForce(force)
 
     def sim_flow_dynamics(self, vel):
         """ Simulate an aquatic environment.
@@ -1479,27 +1901,17 @@ class ODEManager:
 
         drag_coefficient = .1
 
-        for body in self.bodies:
-            if body.type != "ray":
-                body_vel = self.bodies[body].getLinearVel()
-                rot = self.bodies[body].getRotation()
-
-                vel_dif = [(v-b)*2. for v,b in zip(vel,body_vel)]
-
-                # Iterate through the 6 faces of a body (assuming box x,y,z parameters)
-                for i in xrange(6):
-                    if self.surfaces[body][i]['active'] != 0:
-                        area = self.surfaces[body][i]['area'] # Area of the surface
-                        norm = self.surfaces[body][i]['norm'] # Norm vector [x,y,z] of the surface
+        bodies, norms, areas, amp_adj = self.get_surface_table()
+        if not bodies:
+            return
 
-                        adnorm = rotate3(rot,norm) # Reorient the normal to the bodies rotation in the world.
+        vel_dif = (numpy.array(vel,dtype=float) - numpy.array([b.getLinearVel() for b in bodies]))*2.
+        adnorms, components = self.get_surface_drag(vel_dif,drag_coefficient)
 
-                        component = adnorm[0]*vel_dif[0]+adnorm[1]*vel_dif[1]+adnorm[2]*vel_dif[2]  # Get the component of force perpendicular to surface.
-                        component *= drag_coefficient*area  # Compensating for the size of the surface.
-                        if(component < 0):
-                            component = 0    # If less than zero, no drag force to apply (Surface is opposite to drag force.)
-                        force = self.world.impulseToForce(self.stepsize,[component*adnorm[0], component*adnorm[1], component*adnorm[2]])
-                        self.bodies[body].addForce([force[0],force[1],force[2]])  # Add force to the body from calculated surface.
+        # Sum the flow pushing on each surface into a single force per body.
+        forces = numpy.einsum('bs,bsi->bi',components,adnorms)/self.stepsize
+        for body, force in zip(bodies,forces.tolist()):
+            body.addForce(force)
 
     def add_impulse_to_body(self,key,impulse,vector=[0,1,0]):
         """ Add an impulse to a body.
@@ -2,36 +2,216 @@
     Create a set of random terrain in an ODE world.
 """
 
-from manager import ODEManager
+from manager import ODEManager, TerrainGrid
+import hashlib
 import math
+import ode
+
+# Terrain meshes built in this process, keyed by layout and parameters.  Building
+# the mesh data once lets every evaluation in a worker reuse it.
+mesh_cache = {}
+
+def checkered_boxes(height=1,width=1,grid_size=20):
+    """ Layout of the checkered boxes as a list of (dimensions, position). """
+    boxes = []
+    off = 0
+    for i in range(0-grid_size/2,grid_size/2):
+        off = 0 if off == 1 else 1
+        for j in range(0-grid_size/2,grid_size/2):
+            if off:
+                if not((i >= -2 and i < 2) and (j >= -2 and j < 2)):
+                    boxes.append(([width,height,width],[(i+width/2.),height/2.,j+width/2.]))
+                off = 0
+            else:
+                off = 1
+    return boxes
+
+def concentric_rings(height=1.,width=1.,num_rings=4,hill=False):
+    """ Layout of the concentric bumps (or hill if hill is set) as a list of (dimensions, position). """
+    boxes = []
+    bias = 2 # Initial ring placed bordering this.
+    for j in range(num_rings):
+        placement = 2+(bias-2)*width if hill else bias
+        elev = height/2. + height*j if hill else height/2.
+        for i in range(bias):
+            boxes.append(([width,height,1.],[(placement+width/2.),elev,i+1/2.]))
+            boxes.append(([width,height,1.],[(-placement-width/2.),elev,i+1./2.]))
+            boxes.append(([width,height,1.],[(placement+width/2.),elev,-i-1./2.]))
+            boxes.append(([width,height,1.],[(-placement-width/2.),elev,-i-1./2.]))
+            boxes.append(([1.,height,width],[i+1./2.,elev,placement+width/2.]))
+            boxes.append(([1.,height,width],[i+1./2.,elev,-placement-width/2.]))
+            boxes.append(([1.,height,width],[-i-1./2.,elev,placement+width/2.]))
+            boxes.append(([1.,height,width],[-i-1./2.,elev,-placement-width/2.]))
+        boxes.append(([width,height,width],[placement+width/2.,elev,placement+width/2.]))
+        boxes.append(([width,height,width],[-placement-width/2.,elev,placement+width/2.]))
+        boxes.append(([width,height,width],[-placement-width/2.,elev,-placement-width/2.]))
+        boxes.append(([width,height,width],[placement+width/2.,elev,-placement-width/2.]))
+        bias += 1 if hill else 2
+    return boxes
+
+class TerrainMesh(object):
+    """ Triangle mesh of the surface of a set of axis aligned boxes. """
+
+    def __init__(self, boxes):
+        """ Build the mesh.
+
+        Faces two boxes share exactly are left out, as they are inside the terrain.
+
+        Args:
+            boxes: list of (dimensions, position) of the boxes
+        """
+        self.boxes = boxes
+        self.vertices = []
+        self.faces = []
+        self.data = None
+
+        # Collect the box faces, cancelling a face against a coincident opposite one.
+        quads = {}
+        for dim, pos in boxes:
+            lo = [pos[a]-dim[a]/2. for a in range(3)]
+            hi = [pos[a]+dim[a]/2. for a in range(3)]
+            for axis in range(3):
+                u, v = (axis+1)%3, (axis+2)%3
+                rect = (round(lo[u],9),round(hi[u],9),round(lo[v],9),round(hi[v],9))
+                for sign, plane in ((-1,lo[axis]),(1,hi[axis])):
+                    face = (axis, round(plane,9), rect)
+                    if (face, -sign) in quads:
+                        del quads[(face, -sign)]
+                    else:
+                        quads[(face, sign)] = (axis, sign, plane, lo, hi)
+
+        vertex_ids = {}
+        for axis, sign, plane, lo, hi in quads.itervalues():
+            u, v = (axis+1)%3, (axis+2)%3
+            corners = [(lo[u],lo[v]),(hi[u],lo[v]),(hi[u],hi[v]),(lo[u],hi[v])]
+            if sign < 0:
+                corners.reverse()
+            ids = []
+            for cu, cv in corners:
+                p = [0.,0.,0.]
+                p[axis], p[u], p[v] = plane, cu, cv
+                p = tuple(p)
+                if p not in vertex_ids:
+                    vertex_ids[p] = len(self.vertices)
+                    self.vertices.append(p)
+                ids.append(vertex_ids[p])
+            # Counter-clockwise seen from outside so the normals point out of the terrain.
+            self.faces.append((ids[0],ids[1],ids[2]))
+            self.faces.append((ids[0],ids[2],ids[3]))
+
+    def get_data(self):
+        """ Get the ODE mesh data, building it on first use. """
+        if self.data is None:
+            self.data = ode.TriMeshData()
+            self.data.build(self.vertices, self.faces)
+        return self.data
+
+def get_terrain_mesh(layout, *args):
+    """ Get the mesh for a terrain layout from the cache, building it if needed.
+
+    Args:
+        layout: function returning the (dimensions, position) of the boxes
+        args: parameters of the layout
+    Returns:
+        TerrainMesh
+    """
+    key = (layout.__name__,) + args
+    if key not in mesh_cache:
+        mesh_cache[key] = TerrainMesh(layout(*args))
+    return mesh_cache[key]
+
+class WorkerTerrain(object):
+    """ Terrain geoms kept in their own spaces for the lifetime of a worker process.
+
+    Each evaluation builds a new manager; attaching it to this terrain reuses the
+    space built for the same content hash, so managers asking for different
+    terrain do not rebuild each other's.
+    """
+
+    def __init__(self):
+        """ Initialize with no terrain. """
+        # (space, geoms, grid) of each terrain by content hash.
+        self.terrains = {}
+
+    def attach(self, man, content_hash):
+        """ Make a manager use the worker terrain.
+
+        Args:
+            man: manager to attach
+            content_hash: hash of the parameters of the terrain the manager needs
+        Returns:
+            True if the terrain is new and has to be built into the manager
+        """
+        terrain = self.terrains.get(content_hash)
+        rebuild = terrain is None
+        if rebuild:
+            terrain = (ode.Space(), {}, TerrainGrid())
+            self.terrains[content_hash] = terrain
+        else:
+            # Undo any culling done while the previous manager was attached.
+            for g in terrain[1].itervalues():
+                g.enable()
+        man.use_terrain_space(*terrain)
+        return rebuild
+
+# Terrain shared by the evaluations run in this process.
+worker_terrain = WorkerTerrain()
 
 class Terrain(object):
     """ Create terrain for an ODE world. """
 
-    def __init__(self, man):
-        """ Initialize the terrain class. """
+    def __init__(self, man, mesh=False, persistent=False):
+        """ Initialize the terrain class.
+
+        Args:
+            man: manager to add the terrain to
+            mesh: build each terrain as a single triangle mesh geom instead of one box geom per tile
+            persistent: keep the terrain in the worker's terrain space so later managers
+                asking for the same terrain reuse it instead of building it again
+        """
         self.man = man
+        self.mesh = mesh
+        self.persistent = persistent
+
+        # Layouts added so far as (layout, args).
+        self.layouts = []
+
+    def add_boxes(self, layout, *args):
+        """ Add the boxes of a layout to the world, as box geoms or as one mesh geom.
+
+        Args:
+            layout: function returning the (dimensions, position) of the boxes
+            args: parameters of the layout
+        """
+        self.layouts.append((layout, args))
+        layouts = self.layouts[-1:]
+        if self.persistent:
+            # The worker terrain is keyed by all the layouts added to the manager,
+            # and a new terrain space starts empty, so it gets every layout.
+            description = ([(l.__name__, a) for l, a in self.layouts], self.mesh)
+            content_hash = hashlib.sha1(repr(description)).hexdigest()
+            if not worker_terrain.attach(self.man, content_hash):
+                return
+            layouts = self.layouts
+
+        for layout, args in layouts:
+            # Keys continue after the terrain already added so layouts do not overwrite each other.
+            first = len(self.man.terrain_geoms)
+            if self.mesh:
+                self.man.create_terrain_mesh(first,get_terrain_mesh(layout,*args))
+            else:
+                for k, (dim, pos) in enumerate(layout(*args)):
+                    self.man.create_box(first+k,dim,pos,terrain=True)
 
     def add_checkered_boxes(self,height=1,width=1,grid_size=20):
-        """ Add checkered boxes to the world. 
-        
+        """ Add checkered boxes to the world.
+
         Args:
             height: height of the boxes to generate
             width: width of the boxes to generate
             grid_size: size of the grid to generate boxes for.
         """
-        k = 0
-        off = 0
-        for i in range(0-grid_size/2,grid_size/2):
-            off = 0 if off == 1 else 1
-            for j in range(0-grid_size/2,grid_size/2):
-                if off:
-                    if not((i >= -2 and i < 2) and (j >= -2 and j < 2)):
-                        self.man.create_box(k,[width,height,width],[(i+width/2.),height/2.,j+width/2.],terrain=True)
-                        k += 1
-                    off = 0
-                else:
-                    off = 1
+        self.add_boxes(checkered_boxes,height,width,grid_size)
 
     def add_concentric_bumps(self, height=1., width=1., num_rings=4):
         """ Add a concentric pattern of rings around the starting location.
@@ -41,37 +221,8 @@ class Terrain(object):
             width:  width of the rings
             num_rings: number of rings to create
         """
-        bias = 2 # Initial ring placed bordering this.
-
-        k = 0
-        for j in range(num_rings):
-            for i in range(bias):
-                self.man.create_box(k,[width,height,1.],[(bias+width/2.),height/2.,i+1/2.],terrain=True)
-                k += 1
-                self.man.create_box(k,[width,height,1.],[(-bias-width/2.),height/2.,i+1./2.],terrain=True)
-                k += 1
-                self.man.create_box(k,[width,height,1.],[(bias+width/2.),height/2.,-i-1./2.],terrain=True)
-                k += 1
-                self.man.create_box(k,[width,height,1.],[(-bias-width/2.),height/2.,-i-1./2.],terrain=True)
-                k += 1
-                self.man.create_box(k,[1.,height,width],[i+1./2.,height/2.,bias+width/2.],terrain=True)
-                k += 1
-                self.man.create_box(k,[1.,height,width],[i+1./2.,height/2.,-bias-width/2.],terrain=True)
-                k += 1
-                self.man.create_box(k,[1.,height,width],[-i-1./2.,height/2.,bias+width/2.],terrain=True)
-                k += 1
-                self.man.create_box(k,[1.,height,width],[-i-1./2.,height/2.,-bias-width/2.],terrain=True)
-                k += 1
-            self.man.create_box(k,[width,height,width],[bias+width/2.,height/2.,bias+width/2.],terrain=True)
-            k += 1
-            self.man.create_box(k,[width,height,width],[-bias-width/2.,height/2.,bias+width/2.],terrain=True)
-            k += 1
-            self.man.create_box(k,[width,height,width],[-bias-width/2.,height/2.,-bias-width/2.],terrain=True)
-            k += 1
-            self.man.create_box(k,[width,height,width],[bias+width/2.,height/2.,-bias-width/2.],terrain=True)
-            k += 1
-            bias += 2
-        
+        self.add_boxes(concentric_rings,height,width,num_rings,False)
+
     def add_concentric_hill(self, height=1., width=1., num_rings=4):
         """ Add a concentrically increasing hill around the start location.
 
@@ -80,36 +231,4 @@ class Terrain(object):
             width:  width of the rings
             num_rings: number of rings to create
         """
-        bias = 2 # Initial ring placed bordering this.
-
-        k = 0
-        for j in range(num_rings):
-            placement = 2+(bias-2)*width
-            elev = height/2. + height*j
-            for i in range(bias):
-                self.man.create_box(k,[width,height,1.],[(placement+width/2.),elev,i+1/2.],terrain=True)
-                k += 1
-                self.man.create_box(k,[width,height,1.],[(-placement-width/2.),elev,i+1./2.],terrain=True)
-                k += 1
-                self.man.create_box(k,[width,height,1.],[(placement+width/2.),elev,-i-1./2.],terrain=True)
-                k += 1
-                self.man.create_box(k,[width,height,1.],[(-placement-width/2.),elev,-i-1./2.],terrain=True)
-                k += 1
-                self.man.create_box(k,[1.,height,width],[i+1./2.,elev,placement+width/2.],terrain=True)
-                k += 1
-                self.man.create_box(k,[1.,height,width],[i+1./2.,elev,-placement-width/2.],terrain=True)
-                k += 1
-                self.man.create_box(k,[1.,height,width],[-i-1./2.,elev,placement+width/2.],terrain=True)
-                k += 1
-                self.man.create_box(k,[1.,height,width],[-i-1./2.,elev,-placement-width/2.],terrain=True)
-                k += 1
-            self.man.create_box(k,[width,height,width],[placement+width/2.,elev,placement+width/2.],terrain=True)
-            k += 1
-            self.man.create_box(k,[width,height,width],[-placement-width/2.,elev,placement+width/2.],terrain=True)
-            k += 1
-            self.man.create_box(k,[width,height,width],[-placement-width/2.,elev,-placement-width/2.],terrain=True)
-            k += 1
-            self.man.create_box(k,[width,height,width],[placement+width/2.,elev,-placement-width/2.],terrain=True)
-            k += 1
-            bias += 1 
-            
+        self.add_boxes(concentric_rings,height,width,num_rings,True)